@@ -1,8 +1,14 @@
+import io
+
+import matplotlib.pyplot as plt
 import streamlit as st
 import requests
 import time
 import pandas as pd
 
+from merkle_tree import verify_proof
+from node_client import NodeClient
+
 
 # Data for the proposals
 
@@ -28,10 +34,30 @@ proposals = [
     {"title": "Best Sleeping Position", "description": "What is your favourite position for a nice nap?", "status": "active", "options": ["On the side", "On the back", "On the other side", "On the stomach"]},
     {"title": "Best Colour from the Rainbow", "description": "Choose your favourite colour from the rainbow.", "status": "active", "options": ["Coca-Cola", "Pepsi", "Sprite", "Dr Pepper"]}
 ]
+
+# Node client, shared by every session of the dashboard
+
+@st.cache_resource
+def get_client():
+    """
+    One client, and so one connection pool and tally cache, for every session of the dashboard.
+    """
+    return NodeClient()
+
+def fetch_tallies(topics):
+    """
+    Votes of all the given proposals, empty while no node is reachable.
+    """
+    try:
+        return get_client().tallies(str(topic).replace(" ", "") for topic in topics)
+    except requests.RequestException:
+        return {}
+
 # Home page
 
 def home_page():
     st.title("Proposals")
+    tallies = fetch_tallies(proposal["title"] for proposal in proposals)
 
     num_columns = 3
     num_proposals = len(proposals)
@@ -53,6 +79,8 @@ def home_page():
 
                 st.markdown(f"<h4 style='margin-top:-20px;'>{proposal['title']}</h2>", unsafe_allow_html=True)
                 st.markdown(proposal["description"])
+                votes = sum(tallies.get(proposal["title"].replace(" ", ""), {}).values())
+                st.caption(f"{votes} votes")
 
                 st.button("Vote", key=proposal["title"], on_click=load_proposal_page, args=(proposal,), type="primary", use_container_width=True)
 
@@ -66,22 +94,27 @@ def load_proposal_page(proposal):
     st.rerun()
 
 
-def refresh_votes(topic):
-    topic = str(topic).replace(" ", "")
-    print('topic', topic)
-    response = requests.get(f"http://127.0.0.1:8000/votes/{topic}").json()
-    print('response', response)
-
-    results = {option: 0 for option in st.session_state.current_proposal["options"]}
-    votes_amount = 0
-    if "response" in response.keys():
-        for option in response["response"].keys():
-            results[option] = response["response"][option]
-            votes_amount += response["response"][option]
-    print('votes_amount1', votes_amount)
-    st.session_state.votes_amount = votes_amount
-    st.session_state.current_proposal["results"] = results
-    st.rerun()
+@st.cache_data(max_entries=256)
+def render_results(results):
+    """
+    PNG bar chart of the ``(option, votes)`` pairs, rendered once per distinct result.
+    """
+    df = pd.DataFrame({"votes": [votes for _, votes in results]}, index=[option for option, _ in results])
+    figure = df.plot.barh().figure
+    image = io.BytesIO()
+    figure.savefig(image, format="png", bbox_inches="tight")
+    plt.close(figure)
+    return image.getvalue()
+
+
+def show_results(placeholder, proposal, votes):
+    results = {option: 0 for option in proposal["options"]}
+    results.update(votes)
+    if sum(results.values()) == 0:
+        placeholder.write("No votes yet")
+        return
+
+    placeholder.image(render_results(tuple(results.items())))
 
 # Proposal detail and voting form
 
@@ -105,50 +138,72 @@ def proposal_page():
     else:
         st.error("Voting is over, sorry")
 
-    if "results" in proposal:
-        st.subheader("Voting Results")
-        if st.button("Refresh votes", type="secondary"):
-            refresh_votes(proposal['title'])
-        if st.session_state.votes_amount == 0:
-            st.write("No votes yet")
-            return
-
-
-        votes = []
-        index = []
-        for option, count in proposal["results"].items():
-            votes.append(count)
-            index.append(option)
-        df = pd.DataFrame({"votes": votes}, index=index)
+    with st.expander("Verify a vote"):
+        tx_hash = st.text_input("Transaction hash")
+        if st.button("Verify") and tx_hash:
+            verify_vote(tx_hash)
 
-        st.pyplot(df.plot.barh().figure,)
+    # The results follow the votes as they come in. The stream also yields on the node's keepalives, every
+    # second, and drawing them is where Streamlit stops this loop to rerun the page when the user does something
+    st.subheader("Voting Results")
+    placeholder = st.empty()
+    try:
+        for votes in get_client().stream_tallies(str(proposal['title']).replace(" ", "")):
+            show_results(placeholder, proposal, votes)
+    except requests.RequestException:
+        placeholder.error("Lost the connection to the node", icon="🚨")
 
 
 # Replace it with something real, now its just simulation of the voting
 
 def send_vote(topic, vote):
     topic = str(topic).replace(" ", "")
-    response = requests.get(f"http://127.0.0.1:8000/vote/{topic}/{vote}").json()
+    try:
+        response = get_client().vote(topic, vote)
+    except requests.RequestException:
+        response = {"error": "No node reachable, please try again later."}
 
     if "error" in response.keys():
         error = st.error(response["error"], icon="🚨")
         time.sleep(2)
         error.empty()
-        response = requests.get(f"http://127.0.0.1:8000/votes/{topic}").json()
     else:
         st.success("Vote registered successfully")
-    print('response', response)
-
-    results = {option: 0 for option in st.session_state.current_proposal["options"]}
-    votes_amount = 0
-    if "response" in response.keys():
-        for option in response["response"].keys():
-            results[option] = response["response"][option]
-            votes_amount += response["response"][option]
-    print('votes_amount', votes_amount)
-    st.session_state.votes_amount = votes_amount
-    st.session_state.current_proposal["results"] = results
-    st.rerun()
+        # The hash is what "Verify a vote" asks for once the vote is in a block
+        st.caption("Your transaction hash, keep it to verify your vote later")
+        st.code(response["tx_hash"], language=None)
+
+
+# Check the merkle proof of a vote ourselves. A block hash is the merkle root of its transactions, so the proof
+# only means something once a second node confirms that block, the node that sent the proof could have made it up
+
+def verify_vote(tx_hash):
+    try:
+        response = get_client().proof(tx_hash)
+    except requests.RequestException:
+        response = {"error": "No node reachable, please try again later."}
+
+    if "error" in response.keys():
+        st.error(response["error"], icon="🚨")
+        return
+
+    proof = response["response"]
+    if not verify_proof(tx_hash, proof["proof"], proof["block_hash"]):
+        st.error("The proof does not match the block hash", icon="🚨")
+        return
+
+    try:
+        confirmed = any(other.get("response", {}).get("block_hash") == proof["block_hash"]
+                        for other in get_client().get_from_others(f"/proof/{tx_hash}"))
+    except requests.RequestException:
+        confirmed = False
+
+    if confirmed:
+        st.success(f"Vote included in block {proof['height']} ({proof['block_hash'][:16]}...), "
+                   "confirmed by a second node")
+    else:
+        st.warning(f"The proof matches block {proof['height']} ({proof['block_hash'][:16]}...), but no other "
+                   "node confirmed that block, so the vote is only as trustworthy as this node", icon="⚠️")
 
 
 # App function to control page rendering
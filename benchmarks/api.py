@@ -0,0 +1,193 @@
+"""
+Latency of the /vote and /votes endpoints under concurrent clients.
+
+A small network of nodes runs in a child process with the web server of the first node, the clients
+run in this process. ``thread`` is the old setup, uvicorn on its own loop in a thread calling into the
+community across threads. Loop errors counts what asyncio reported going wrong in the node
+process, like tasks created on one loop and awaited on the other. ``loop`` serves the app as a task on the ipv8 loop, see ``server.serve``.
+Every client casts a vote on a fresh topic and then reads the votes of that topic.
+Afterwards votes are cast one per request and through /votes/batch, and 20 tallies are read one
+per request and through /tallies.
+
+Run from the repository root with ``python -m benchmarks.api``.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import uvicorn
+from ipv8.peer import Peer
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+import server
+from blockchain import MyCommunity, MyCommunitySettings
+
+
+def connect(nodes):
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+            node.overlay.add_member(other.my_peer.mid)
+
+
+class ErrorCounter(logging.Handler):
+    """
+    Counts the errors asyncio logs, like tasks that ended up on the wrong loop.
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+async def run_nodes(mode, node_count, ports, stop):
+    logging.getLogger().setLevel(logging.WARNING)
+    loop_errors = ErrorCounter()
+    logging.getLogger('asyncio').addHandler(loop_errors)
+    logging.getLogger('asyncio').propagate = False
+    nodes = [MockIPv8('curve25519', MyCommunity, MyCommunitySettings(block_log_dir=None))
+             for _ in range(node_count)]
+    connect(nodes)
+    for node in nodes:
+        node.overlay.register_task('check_txs', node.overlay.block_creation, interval=0.1)
+
+    # The endpoints look the community up the way they would on a real IPv8 instance
+    server.app.ipv8_instance = SimpleNamespace(overlays=[nodes[0].overlay])
+    sock = server.bind_socket('127.0.0.1', 8000)
+    web_server = uvicorn.Server(uvicorn.Config(server.app, log_level='warning'))
+    if mode == 'thread':
+        threading.Thread(target=lambda: asyncio.run(web_server.serve(sockets=[sock])), daemon=True).start()
+    else:
+        asyncio.ensure_future(web_server.serve(sockets=[sock]))
+    while not web_server.started:
+        await asyncio.sleep(0.01)
+    ports.put(sock.getsockname()[1])
+
+    while not stop.is_set():
+        await asyncio.sleep(0.1)
+    web_server.should_exit = True
+    await asyncio.sleep(0.2)
+    for node in nodes:
+        try:
+            await node.stop()
+        except ValueError:
+            # Tasks the web server thread registered belong to its loop and cannot be awaited from here
+            loop_errors.count += 1
+    ports.put(loop_errors.count)
+
+
+def serve_nodes(mode, node_count, ports, stop):
+    asyncio.run(run_nodes(mode, node_count, ports, stop))
+
+
+async def client(http, number, requests, latencies, errors):
+    for i in range(requests):
+        topic = f'topic{number}-{i}'
+        for path, timings in ((f'/vote/{topic}/yes', latencies['vote']), (f'/votes/{topic}', latencies['votes'])):
+            start = time.perf_counter()
+            try:
+                response = await http.get(path)
+                ok = response.json().get('status_code') == 200
+            except httpx.HTTPError:
+                ok = False
+            timings.append(time.perf_counter() - start)
+            errors[path.split('/')[1]] += not ok
+
+
+async def load(port, clients, requests):
+    latencies = {'vote': [], 'votes': []}
+    errors = {'vote': 0, 'votes': 0}
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=30) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[client(http, number, requests, latencies, errors) for number in range(clients)])
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+async def compare_batch(port, votes, batch_size, topics=20, reads=50):
+    """
+    Seconds to cast votes one per request and in batches, and to read tallies one topic per request and
+    all topics in one request.
+    """
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=30) as http:
+        start = time.perf_counter()
+        for i in range(votes):
+            await http.get(f'/vote/single{i}/yes')
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for first in range(0, votes, batch_size):
+            batch = [{'topic': f'batch{i}', 'vote': 'yes'} for i in range(first, min(first + batch_size, votes))]
+            await http.post('/votes/batch', json={'votes': batch})
+        batched = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(reads):
+            for i in range(topics):
+                await http.get(f'/votes/single{i}')
+        per_topic = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(reads):
+            await http.get('/tallies', params={'topics': ','.join(f'single{i}' for i in range(topics))})
+        tallies = time.perf_counter() - start
+    return single, batched, per_topic / reads, tallies / reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=5)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--requests', type=int, default=100, help='votes per client')
+    parser.add_argument('--batch-votes', type=int, default=2000, help='votes cast one by one and in batches')
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f'{args.nodes} nodes, {args.requests} votes and reads per client')
+    print(' mode    clients | endpoint  requests/s  p50 ms  p95 ms  p99 ms  errors  loop errors')
+    context = multiprocessing.get_context('spawn')
+    for mode in ('thread', 'loop'):
+        for clients in args.clients:
+            ports, stop = context.Queue(), context.Event()
+            process = context.Process(target=serve_nodes, args=(mode, args.nodes, ports, stop))
+            process.start()
+            latencies, errors, elapsed = asyncio.run(load(ports.get(), clients, args.requests))
+            stop.set()
+            loop_errors = ports.get()
+            process.join()
+
+            for endpoint, timings in latencies.items():
+                quantiles = statistics.quantiles(timings, n=100)
+                print(f'{mode:>6}  {clients:>7} | {endpoint:>8}  {len(timings) / elapsed:>10.1f}  '
+                      f'{quantiles[49] * 1000:>6.1f}  {quantiles[94] * 1000:>6.1f}  {quantiles[98] * 1000:>6.1f}'
+                      f'  {errors[endpoint]:>6}  {loop_errors:>11}')
+
+
+    ports, stop = context.Queue(), context.Event()
+    process = context.Process(target=serve_nodes, args=('loop', args.nodes, ports, stop))
+    process.start()
+    single, batched, per_topic, tallies = asyncio.run(compare_batch(ports.get(), args.batch_votes, args.batch_size))
+    stop.set()
+    ports.get()
+    process.join()
+    print(f'{args.batch_votes} votes: {args.batch_votes / single:.0f} votes/s one per request, '
+          f'{args.batch_votes / batched:.0f} votes/s in batches of {args.batch_size}')
+    print(f'20 tallies: {per_topic * 1000:.1f} ms with one request per topic, {tallies * 1000:.1f} ms with /tallies')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Restart time of a node with a large on-disk block log.
+
+Writes a chain of 5-vote blocks to a temporary ``BlockLog`` and times reopening it, and
+``MyCommunity.load_chain`` rebuilding the chain index, transaction index and tallies from it.
+
+Run from the repository root with ``python -m benchmarks.block_log``.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from ipv8.test.mocking.endpoint import internet
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+from block import Block
+from block_log import BlockLog
+from blockchain import MyCommunity, MyCommunitySettings
+from chain_store import GENESIS_HASH
+from transaction import Transaction
+
+
+def write_log(path: str, length: int) -> None:
+    log = BlockLog(path)
+    previous_hash = GENESIS_HASH
+    for i in range(length):
+        block = Block(previous_hash)
+        for j in range(5):
+            block.add_transaction(Transaction(os.urandom(20), f'topic{j}', 'yes'))
+        block.update_tree()
+        log.append(block)
+        previous_hash = block.get_merkle_hash()
+    log.close()
+
+
+async def load(path: str):
+    """
+    Time ``MyCommunity.load_chain`` on the log, returns the loaded chain height and the seconds it took.
+    """
+    node = MockIPv8('curve25519', MyCommunity, MyCommunitySettings(block_log_dir=None))
+    community = node.overlay
+    community.block_log = BlockLog(path)
+    try:
+        start = time.perf_counter()
+        community.load_chain()
+        return community.chain.height, time.perf_counter() - start
+    finally:
+        await node.stop()
+        internet.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=20_000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.blocks')
+        start = time.perf_counter()
+        write_log(path, args.blocks)
+        print(f'wrote {args.blocks} blocks ({os.path.getsize(path) / 1e6:.1f} MB) '
+              f'in {time.perf_counter() - start:.2f} s')
+
+        start = time.perf_counter()
+        log = BlockLog(path)
+        log.close()
+        print(f'offset index rebuilt in {time.perf_counter() - start:.3f} s')
+
+        height, elapsed = asyncio.run(load(path))
+        print(f'chain of height {height}, indexes and tallies rebuilt in {elapsed:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Bytes on the wire and propagation time of a new block, full versus compact relay.
+
+Every node already holds the block's transactions in its mempool, except for a ``--missing`` share that is
+left out at random on every receiver. One node then seals the block and broadcasts it, and the run ends
+once every node added it to its chain. Links get a simulated one-way latency.
+``full`` sends the BlockMessage with every transaction, ``compact`` sends a CompactBlock of short ids
+and lets receivers ask for the transactions they miss.
+
+Run from the repository root with ``python -m benchmarks.block_relay``.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.peer import Peer
+from ipv8.test.mocking.endpoint import MockEndpoint, internet
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+from blockchain import MyCommunity, MyCommunitySettings
+from transaction import Transaction
+
+sent_bytes = 0
+
+
+def patch_endpoint(latency):
+    send = MockEndpoint.send
+
+    def delayed_send(self, socket_address, packet):
+        global sent_bytes
+        sent_bytes += len(packet)
+        asyncio.get_running_loop().call_later(latency, send, self, socket_address, packet)
+
+    MockEndpoint.send = delayed_send
+
+
+def connect(nodes):
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+
+
+def make_transactions(count):
+    txs = []
+    for i in range(count):
+        key = default_eccrypto.generate_key('curve25519')
+        tx = Transaction(Peer(key).mid, f'topic{i}', 'yes', public_key=default_eccrypto.key_to_bin(key.pub()))
+        tx.signature = default_eccrypto.create_signature(key, tx.get_tx_bytes())
+        txs.append(tx)
+    return txs
+
+
+async def relay(node_count, txs, missing, compact, timeout=60):
+    global sent_bytes
+    settings = MyCommunitySettings(block_log_dir=None, compact_blocks=compact)
+    nodes = [MockIPv8('curve25519', MyCommunity, settings) for _ in range(node_count)]
+    connect(nodes)
+    producer = nodes[0].overlay
+    for node in nodes:
+        for tx in txs:
+            if node.overlay is producer or random.random() >= missing:
+                node.overlay.mempool.add(tx)
+
+    sent_bytes = 0
+    start = time.perf_counter()
+    for tx in txs:
+        producer.current_block.add_transaction(producer.mempool.remove(tx.get_tx_hash()))
+    producer.finalize_and_broadcast_block()
+    while any(node.overlay.chain.height < 0 for node in nodes):
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError('the block did not reach every node')
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    result = (sent_bytes, elapsed)
+
+    for node in nodes:
+        await node.stop()
+    internet.clear()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=20)
+    parser.add_argument('--txs', type=int, nargs='+', default=[5, 50, 200], help='transactions per block')
+    parser.add_argument('--missing', type=float, default=0.05, help='share of txs missing from a mempool')
+    parser.add_argument('--latency', type=float, default=0.005, help='one-way link latency in seconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    patch_endpoint(args.latency)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f'{args.nodes} nodes, {args.missing:.0%} of the txs missing per mempool, {args.latency * 1000:.0f} ms links')
+    for count in args.txs:
+        txs = make_transactions(count)
+        for name, compact in [('full', False), ('compact', True)]:
+            runs = [asyncio.run(relay(args.nodes, txs, args.missing, compact)) for _ in range(args.repeat)]
+            size = sum(run[0] for run in runs) / len(runs)
+            elapsed = sum(run[1] for run in runs) / len(runs)
+            print(f'{count:>4} txs, {name:>7}: {size / 1024:8.1f} KiB on the wire, '
+                  f'{elapsed * 1000:6.1f} ms until every node has the block')
+
+
+if __name__ == '__main__':
+    main()
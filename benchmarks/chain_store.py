@@ -0,0 +1,83 @@
+"""
+Block ingest time as the chain grows.
+
+Replays the stateful part of ``MyCommunity.receive_block`` (parent lookup, duplicate check, append)
+against the old list scan and against ``ChainStore``.
+
+Run from the repository root with ``python -m benchmarks.chain_store``.
+"""
+import argparse
+import time
+from hashlib import sha256
+
+from block import Block
+from chain_store import GENESIS_HASH, ChainStore
+
+
+def make_chain(length: int):
+    blocks = []
+    previous_hash = GENESIS_HASH
+    for i in range(length):
+        block_hash = sha256(str(i).encode()).hexdigest()
+        blocks.append(Block(previous_hash, block_hash))
+        previous_hash = block_hash
+    return blocks
+
+
+def ingest_list(blocks, window):
+    chain = []
+    timings = []
+    start = time.perf_counter()
+    for i, block in enumerate(blocks, 1):
+        if block.previous_hash != GENESIS_HASH and block.previous_hash not in [b.get_merkle_hash() for b in chain]:
+            raise RuntimeError('unknown parent')
+        if block.merkle_hash in [b.get_merkle_hash() for b in chain]:
+            continue
+        chain.append(block)
+        if i % window == 0:
+            now = time.perf_counter()
+            timings.append((i, (now - start) / window))
+            start = now
+    return timings
+
+
+def ingest_store(blocks, window):
+    chain = ChainStore()
+    timings = []
+    start = time.perf_counter()
+    for i, block in enumerate(blocks, 1):
+        if block.previous_hash not in chain:
+            raise RuntimeError('unknown parent')
+        if block.merkle_hash in chain:
+            continue
+        chain.add(block)
+        if i % window == 0:
+            now = time.perf_counter()
+            timings.append((i, (now - start) / window))
+            start = now
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=100_000)
+    parser.add_argument('--window', type=int, default=10_000)
+    parser.add_argument('--list-limit', type=int, default=10_000,
+                        help='stop the (quadratic) list baseline after this many blocks')
+    args = parser.parse_args()
+
+    blocks = make_chain(args.blocks)
+    list_window = max(1, min(args.window, args.list_limit) // 5)
+    list_timings = ingest_list(blocks[:args.list_limit], list_window)
+    store_timings = ingest_store(blocks, args.window)
+
+    print('list scan')
+    for height, per_block in list_timings:
+        print(f'  height {height:>7}: {per_block * 1e6:10.2f} us/block')
+    print('ChainStore')
+    for height, per_block in store_timings:
+        print(f'  height {height:>7}: {per_block * 1e6:10.2f} us/block')
+
+
+if __name__ == '__main__':
+    main()
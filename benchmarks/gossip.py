@@ -0,0 +1,95 @@
+"""
+Packets and votes per second while gossiping a voting spike.
+
+Every node casts ``--votes`` votes at once and the run ends when the network has been quiet for a moment.
+``single`` is today's path, every vote goes out as its own Transaction message (``tx_batch_window=0``).
+``batched`` lets the outbox pack the votes heading to the same peer into TransactionBatch messages.
+Votes per second counts every vote a node accepted into its mempool, summed over the nodes.
+
+Run from the repository root with ``python -m benchmarks.gossip``.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from ipv8.peer import Peer
+from ipv8.test.mocking.endpoint import MockEndpoint, internet
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+from blockchain import MyCommunity, MyCommunitySettings
+
+packets = 0
+sent_bytes = 0
+
+
+def count_packets():
+    send = MockEndpoint.send
+
+    def counting_send(self, socket_address, packet):
+        global packets, sent_bytes
+        packets += 1
+        sent_bytes += len(packet)
+        send(self, socket_address, packet)
+
+    MockEndpoint.send = counting_send
+
+
+def connect(nodes):
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+
+
+async def spike(node_count, votes, window, quiet=0.2):
+    global packets, sent_bytes
+    settings = dict(block_log_dir=None, tx_batch_window=window)
+    nodes = [MockIPv8('curve25519', MyCommunity, MyCommunitySettings(**settings)) for _ in range(node_count)]
+    connect(nodes)
+    packets = sent_bytes = 0
+
+    start = time.perf_counter()
+    for node in nodes:
+        for i in range(votes):
+            node.overlay.create_transaction(f'topic{i}', 'yes')
+
+    last_packets = -1
+    last_change = time.perf_counter()
+    while time.perf_counter() - last_change < quiet:
+        await asyncio.sleep(0.01)
+        if packets != last_packets:
+            last_packets = packets
+            last_change = time.perf_counter()
+    elapsed = last_change - start
+
+    accepted = sum(len(node.overlay.mempool) for node in nodes)
+    result = (packets, sent_bytes, accepted, elapsed)
+    for node in nodes:
+        await node.stop()
+    internet.clear()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=20)
+    parser.add_argument('--votes', type=int, default=50, help='votes cast by every node')
+    parser.add_argument('--window', type=float, default=0.01, help='flush window of the batched run')
+    args = parser.parse_args()
+
+    count_packets()
+    # Every received transaction is logged, which would dominate the run time
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f'{args.nodes} nodes, {args.votes} votes each')
+    for name, window in [('single', 0), ('batched', args.window)]:
+        sent, size, accepted, elapsed = asyncio.run(spike(args.nodes, args.votes, window))
+        print(f'{name:>8}: {sent} packets ({sent / elapsed:.0f} packets/s, {size / sent:.0f} bytes/packet), '
+              f'{accepted} votes accepted in {elapsed:.2f} s ({accepted / elapsed:.0f} votes/s)')
+
+
+if __name__ == '__main__':
+    main()
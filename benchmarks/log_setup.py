@@ -0,0 +1,94 @@
+"""
+Time a log call takes on the calling thread, writing synchronously versus through ``setup_logging``'s queue.
+
+Every run logs ``--lines`` tx_received trace events, the most frequent line a node writes. ``sync`` formats and
+writes the JSON line in the call, like the node did before logging went through a queue, ``queue`` is
+``setup_logging`` as the node uses it. With ``--stall`` the disk blocks for that many milliseconds every
+``--stall-every`` lines, which a synchronous call pays for and a queued one does not.
+
+Run from the repository root with ``python -m benchmarks.log_setup``.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from log_setup import JsonFormatter, setup_logging, stop_listener
+
+
+class StallingFileHandler(logging.FileHandler):
+    def __init__(self, path, stall, every):
+        super().__init__(path, mode='w')
+        self.stall = stall
+        self.every = every
+        self.lines = 0
+
+    def emit(self, record):
+        super().emit(record)
+        self.lines += 1
+        if self.stall and self.lines % self.every == 0:
+            time.sleep(self.stall)
+
+
+def log_lines(count):
+    logger = logging.getLogger('voting.trace')
+    start = time.perf_counter()
+    for _ in range(count):
+        logger.info('[Node %s] received transaction from %s', 'c0ffee', 'beef',
+                    extra={'event': 'tx_received', 'node': 'c0ffee', 'tx': 'ab' * 32, 'peer': 'beef'})
+    return (time.perf_counter() - start) / count
+
+
+def reset(root):
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run_sync(path, count, stall, every):
+    root = logging.getLogger()
+    reset(root)
+    handler = StallingFileHandler(path, stall, every)
+    handler.setFormatter(JsonFormatter())
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    elapsed = log_lines(count)
+    reset(root)
+    return elapsed
+
+
+def run_queue(path, count, stall, every):
+    defaults = logging.logThreads, logging.logProcesses, logging.logMultiprocessing
+    listener = setup_logging(None, console=False)
+    # Same file handler as the sync run, so both pay the same stalls
+    handler = StallingFileHandler(path, stall, every)
+    handler.setFormatter(JsonFormatter())
+    listener.handlers = (handler,)
+    elapsed = log_lines(count)
+    stop_listener(listener)
+    handler.close()
+    reset(logging.getLogger())
+    logging.logThreads, logging.logProcesses, logging.logMultiprocessing = defaults
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=50_000)
+    parser.add_argument('--stall', type=float, default=5.0, help='milliseconds the disk blocks for')
+    parser.add_argument('--stall-every', type=int, default=1000, help='lines between two stalls')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.log')
+        for stall in (0, args.stall / 1000):
+            label = f'{stall * 1000:g} ms stall every {args.stall_every} lines' if stall else 'no stalls'
+            sync = run_sync(path, args.lines, stall, args.stall_every)
+            queued = run_queue(path, args.lines, stall, args.stall_every)
+            print(f'{label:>30}: sync {sync * 1e6:6.2f} us/line, queue {queued * 1e6:6.2f} us/line '
+                  f'({sync / queued:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Membership traffic of the old PeersMessage flooding versus digest anti-entropy.
+
+Nodes are simulated in process, each connected to ``--degree`` random neighbours and knowing only them
+at the start. Flooding sends every member id once over every link in both directions, so its message
+count is exact: n * (sum of the degrees). Anti-entropy runs rounds in which every node reconciles with
+one random neighbour through the same Membership exchange the community uses, until everyone knows
+everyone, and then reports one more round to show the steady state cost.
+
+Run from the repository root with ``python -m benchmarks.membership``.
+"""
+import argparse
+import os
+import random
+
+from ipv8.messaging.serialization import default_serializer
+
+from membership import Membership, MembershipDigest, MembershipMembers
+from packing import split_by_size
+
+MID_SIZE = 20
+# A PeersMessage carried a mid and a ttl
+PEERS_MESSAGE_SIZE = 2 + MID_SIZE + 8
+
+
+def make_graph(n, degree):
+    neighbours = [set() for _ in range(n)]
+    for node in range(n):
+        # A ring keeps the graph connected, the random links make it an expander
+        neighbours[node].add((node + 1) % n)
+        neighbours[(node + 1) % n].add(node)
+        while len(neighbours[node]) < min(degree, n - 1):
+            other = random.randrange(n)
+            if other != node:
+                neighbours[node].add(other)
+                neighbours[other].add(node)
+    return [sorted(links) for links in neighbours]
+
+
+def size(payload):
+    return len(default_serializer.pack_serializable(payload))
+
+
+def exchange(initiator, responder):
+    """
+    One anti-entropy exchange, returns the messages and bytes it took.
+    """
+    digest = MembershipDigest(initiator.digest())
+    messages, sent = 1, size(digest)
+
+    for update in responder.bucket_updates(responder.differing_buckets(digest.digests)):
+        messages, sent = messages + 1, sent + size(update)
+
+        missing = initiator.missing_from(update.buckets, update.members)
+        for member in update.members:
+            initiator.add(member)
+        for part in split_by_size(missing, [len(member) + 2 for member in missing], overhead=2):
+            reply = MembershipMembers(part)
+            messages, sent = messages + 1, sent + size(reply)
+            for member in part:
+                responder.add(member)
+    return messages, sent
+
+
+def anti_entropy(n, degree, buckets, max_rounds=100):
+    graph = make_graph(n, degree)
+    mids = [os.urandom(MID_SIZE) for _ in range(n)]
+    nodes = [Membership(buckets) for _ in range(n)]
+    for node, links in enumerate(graph):
+        for member in [node] + links:
+            nodes[node].add(mids[member])
+
+    messages = sent = rounds = 0
+    while any(len(node) < n for node in nodes) and rounds < max_rounds:
+        rounds += 1
+        for node, links in enumerate(graph):
+            round_messages, round_bytes = exchange(nodes[node], nodes[random.choice(links)])
+            messages, sent = messages + round_messages, sent + round_bytes
+
+    steady_messages = steady_bytes = 0
+    for node, links in enumerate(graph):
+        round_messages, round_bytes = exchange(nodes[node], nodes[random.choice(links)])
+        steady_messages, steady_bytes = steady_messages + round_messages, steady_bytes + round_bytes
+    return rounds, messages, sent, steady_messages, steady_bytes, sum(len(links) for links in graph)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--degree', type=int, default=20, help='neighbours per node')
+    parser.add_argument('--buckets', type=int, default=64)
+    args = parser.parse_args()
+
+    for n in args.nodes:
+        rounds, messages, sent, steady_messages, steady_bytes, degrees = anti_entropy(n, args.degree, args.buckets)
+        flood_messages = n * degrees
+        flood_bytes = flood_messages * PEERS_MESSAGE_SIZE
+        print(f'{n:>5} nodes | flooding: {flood_messages:>10,} messages {flood_bytes / 1e6:9.2f} MB'
+              f' | anti-entropy: converged in {rounds} rounds, {messages:>8,} messages {sent / 1e6:7.2f} MB,'
+              f' then {steady_messages:,} messages {steady_bytes / 1e6:.2f} MB per round')
+
+
+if __name__ == '__main__':
+    main()
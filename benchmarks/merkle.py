@@ -0,0 +1,79 @@
+"""
+MerkleTree against IncrementalMerkleTree.
+
+``build`` adds n leaves and asks for the root once, which is what a block does when it is sealed.
+``live root`` asks for the root after every leaf, which the old class can only answer with a full rebuild.
+
+Run from the repository root with ``python -m benchmarks.merkle``.
+"""
+import argparse
+import os
+import time
+from hashlib import sha256
+
+from merkle_tree import IncrementalMerkleTree, MerkleTree
+
+
+def build_old(leaves):
+    tree = MerkleTree()
+    for leaf in leaves:
+        tree.add_leaf(leaf)
+    tree.recalculate_tree()
+    return tree.get_root_hash()
+
+
+def live_old(leaves):
+    tree = MerkleTree()
+    for leaf in leaves:
+        tree.add_leaf(leaf)
+        tree.recalculate_tree()
+    return tree.get_root_hash()
+
+
+def build_new(leaves, hex_compat):
+    tree = IncrementalMerkleTree(hex_compat)
+    for leaf in leaves:
+        tree.add_leaf(leaf)
+    return tree.get_root_hash()
+
+
+def live_new(leaves, hex_compat):
+    tree = IncrementalMerkleTree(hex_compat)
+    for leaf in leaves:
+        tree.add_leaf(leaf)
+        tree.get_root_hash()
+    return tree.get_root_hash()
+
+
+def timed(function, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 100, 1_000, 10_000, 100_000])
+    parser.add_argument('--live-limit', type=int, default=2_000,
+                        help='largest size for the (quadratic) live root run of MerkleTree')
+    args = parser.parse_args()
+
+    print(f'{"leaves":>8} {"":>10} {"MerkleTree":>12} {"hex compat":>12} {"binary":>12}')
+    for size in args.sizes:
+        leaves = [sha256(os.urandom(16)).hexdigest() for _ in range(size)]
+        assert build_old(leaves) == build_new(leaves, True)
+
+        old = timed(build_old, leaves)
+        print(f'{size:>8} {"build":>10} {old * 1e3:10.3f}ms {timed(build_new, leaves, True) * 1e3:10.3f}ms '
+              f'{timed(build_new, leaves, False) * 1e3:10.3f}ms')
+
+        old = f'{timed(live_old, leaves, repeat=1) * 1e3:10.3f}ms' if size <= args.live_limit else f'{"-":>12}'
+        print(f'{size:>8} {"live root":>10} {old} {timed(live_new, leaves, True) * 1e3:10.3f}ms '
+              f'{timed(live_new, leaves, False) * 1e3:10.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
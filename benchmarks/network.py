@@ -0,0 +1,317 @@
+"""
+End-to-end benchmark of a network of nodes under a vote workload, with machine-readable results.
+
+``--nodes`` communities run in this process on ipv8's mock endpoints, fully connected. Votes are cast
+through ``create_transaction`` (or ``create_transactions`` for the ``batch`` workload) on random nodes:
+
+- ``steady``: ``--rate`` votes per second for ``--duration`` seconds,
+- ``burst``: the same number of votes all at once,
+- ``batch``: the same number of votes all at once, ``--batch-size`` votes per call.
+
+A vote is confirmed at a node once it is in a block on that node's chain. The run reports the latency until
+the first node and until every node confirmed each vote, confirmed votes per second, and per node the bytes
+and packets sent and the CPU time its event loop callbacks took. CPU spent in the signature verification
+pools is only known in total. ``--set name=value`` overrides any ``MyCommunitySettings`` field.
+
+The results are printed, and written as JSON with ``--output``. ``--compare`` takes such a file, for example
+from another commit, and prints how the headline numbers changed.
+
+Run from the repository root with ``python -m benchmarks.network``.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from ipv8.peer import Peer
+from ipv8.test.mocking.endpoint import internet
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+from blockchain import MyCommunity, MyCommunitySettings
+from transaction import Transaction
+
+current_node = contextvars.ContextVar('current_node', default=None)
+
+
+class CpuMeter:
+    """
+    Adds up the CPU time of event loop callbacks per node.
+
+    Every node is created and driven inside its own context, which the tasks and callbacks it schedules
+    inherit, so the context of a callback tells which node it runs for.
+    """
+
+    def __init__(self, count):
+        self.cpu = [0.0] * count
+        self.other = 0.0
+        self._run = asyncio.events.Handle._run
+
+    def reset(self):
+        self.cpu = [0.0] * len(self.cpu)
+        self.other = 0.0
+
+    def __enter__(self):
+        run = self._run
+
+        def metered_run(handle):
+            node = handle._context.get(current_node)
+            start = time.thread_time()
+            try:
+                run(handle)
+            finally:
+                if node is None:
+                    self.other += time.thread_time() - start
+                else:
+                    self.cpu[node] += time.thread_time() - start
+
+        asyncio.events.Handle._run = metered_run
+        return self
+
+    def __exit__(self, *exc_info):
+        asyncio.events.Handle._run = self._run
+
+
+def metered_send(endpoint, socket_address, packet):
+    """
+    MockEndpoint.send that counts what a node sends and delivers it in the context of the receiving node.
+    """
+    if not endpoint.is_open():
+        return
+    endpoint.sent_packets += 1
+    endpoint.sent_bytes += len(packet)
+    receiver = internet.get(socket_address)
+    if receiver is None:
+        return
+    asyncio.get_running_loop().call_soon(receiver.notify_listeners, (endpoint.wan_address, packet),
+                                         context=receiver.context.copy())
+
+
+def make_nodes(count, settings):
+    nodes = []
+    for i in range(count):
+        context = contextvars.copy_context()
+        context.run(current_node.set, i)
+        node = context.run(MockIPv8, 'curve25519', MyCommunity, MyCommunitySettings(**settings))
+        node.context = context
+        node.endpoint.context = context
+        node.endpoint.sent_packets = node.endpoint.sent_bytes = 0
+        node.endpoint.send = lambda address, packet, endpoint=node.endpoint: metered_send(endpoint, address, packet)
+        nodes.append(node)
+
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+            node.overlay.add_member(other.my_peer.mid)
+    return nodes
+
+
+def track_confirmations(nodes, confirmed):
+    """
+    Record when every node first has each transaction in a block on its chain.
+    """
+    for i, node in enumerate(nodes):
+        def timed_store_block(block, resolved=None, store_block=node.overlay.store_block, i=i):
+            added = store_block(block, resolved)
+            if added:
+                now = time.perf_counter()
+                for tx_hash in block.tx_hashes():
+                    confirmed.setdefault(tx_hash, {}).setdefault(i, now)
+            return added
+
+        node.overlay.store_block = timed_store_block
+
+
+async def drive(nodes, workload, rate, duration, batch_size, submitted):
+    """
+    Cast the votes of a workload and record when each was submitted.
+    """
+    votes = int(rate * duration)
+    voters = [random.randrange(len(nodes)) for _ in range(votes)]
+    start = time.perf_counter()
+    if workload == 'batch':
+        ballots = {}
+        for i, voter in enumerate(voters):
+            ballots.setdefault(voter, []).append((f'topic{i}', 'yes'))
+        for voter, ballot in ballots.items():
+            node = nodes[voter]
+            for first in range(0, len(ballot), batch_size):
+                now = time.perf_counter()
+                for topic, _ in ballot[first:first + batch_size]:
+                    submitted[Transaction(node.my_peer.mid, topic, 'yes').get_tx_hash()] = now
+                node.context.run(node.overlay.create_transactions, ballot[first:first + batch_size])
+        return
+
+    for i, voter in enumerate(voters):
+        if workload == 'steady':
+            await asyncio.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        node = nodes[voter]
+        submitted[Transaction(node.my_peer.mid, f'topic{i}', 'yes').get_tx_hash()] = time.perf_counter()
+        node.context.run(node.overlay.create_transaction, f'topic{i}', 'yes')
+
+
+def percentiles(values):
+    if len(values) < 2:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': max(values, default=None)}
+    # Interpolates between the samples, the default method extrapolates past the largest one for small runs
+    quantiles = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': quantiles[49], 'p95': quantiles[94], 'p99': quantiles[98], 'max': max(values)}
+
+
+async def run(args, settings):
+    logging.getLogger().setLevel(logging.WARNING)
+    random.seed(args.seed)
+    submitted, confirmed = {}, {}
+
+    with CpuMeter(args.nodes) as meter:
+        nodes = make_nodes(args.nodes, settings)
+        track_confirmations(nodes, confirmed)
+        for node in nodes:
+            node.context.run(node.overlay.register_task, 'check_txs', node.overlay.block_creation,
+                             interval=node.overlay.block_check_interval)
+
+        meter.reset()
+        cpu_start, start = time.process_time(), time.perf_counter()
+        await drive(nodes, args.workload, args.rate, args.duration, args.batch_size, submitted)
+
+        end = time.perf_counter() + args.drain
+        while (sum(len(confirmed.get(tx_hash, ())) == args.nodes for tx_hash in submitted) < len(submitted)
+               and time.perf_counter() < end):
+            await asyncio.sleep(0.05)
+        cpu = time.process_time() - cpu_start
+
+        first, everywhere, last = [], [], start
+        for tx_hash, at in submitted.items():
+            times = confirmed.get(tx_hash, {})
+            if times:
+                first.append(min(times.values()) - at)
+            if len(times) == args.nodes:
+                everywhere.append(max(times.values()) - at)
+                last = max(last, max(times.values()))
+        elapsed = last - start
+
+        node_results = [{'id': node.my_peer.mid.hex()[:8],
+                         'bytes_sent': node.endpoint.sent_bytes,
+                         'packets_sent': node.endpoint.sent_packets,
+                         'cpu': meter.cpu[i],
+                         'chain_height': node.overlay.chain.height}
+                        for i, node in enumerate(nodes)]
+        for node in nodes:
+            await node.stop()
+        internet.clear()
+
+    return {'submitted': len(submitted),
+            'confirmed': len(everywhere),
+            'elapsed': elapsed,
+            'tps': len(everywhere) / elapsed if elapsed > 0 else 0.0,
+            'latency': {'first': percentiles(first), 'all': percentiles(everywhere)},
+            'totals': {'bytes_sent': sum(node['bytes_sent'] for node in node_results),
+                       'packets_sent': sum(node['packets_sent'] for node in node_results),
+                       'cpu_nodes': sum(meter.cpu),
+                       'cpu_other': cpu - sum(meter.cpu)},
+            'nodes': node_results}
+
+
+def parse_setting(assignment):
+    name, _, value = assignment.partition('=')
+    kind = MyCommunitySettings.__annotations__.get(name)
+    if kind is None:
+        raise argparse.ArgumentTypeError(f'unknown setting {name}')
+    if kind is bool:
+        return name, value.lower() in ('1', 'true', 'yes')
+    if kind in (int, float, str):
+        return name, kind(value)
+    return name, None if value.lower() == 'none' else value
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def headline(results):
+    latency = results['latency']['all']
+    return {'votes/s': results['tps'],
+            'p50 latency s': latency['p50'],
+            'p95 latency s': latency['p95'],
+            'MB sent': results['totals']['bytes_sent'] / 1e6,
+            'CPU s': results['totals']['cpu_nodes'] + results['totals']['cpu_other']}
+
+
+def report(results):
+    params = results['params']
+    print(f"{params['nodes']} nodes, {params['workload']} workload of {results['submitted']} votes")
+    print(f"confirmed everywhere: {results['confirmed']}/{results['submitted']} "
+          f"in {results['elapsed']:.2f} s, {results['tps']:.1f} votes/s")
+    for name, latency in results['latency'].items():
+        if latency['p50'] is not None:
+            print(f"latency until {name:>5}: p50 {latency['p50']:.3f} s  p95 {latency['p95']:.3f} s  "
+                  f"p99 {latency['p99']:.3f} s  max {latency['max']:.3f} s")
+    totals = results['totals']
+    print(f"sent {totals['bytes_sent'] / 1e6:.2f} MB in {totals['packets_sent']} packets, "
+          f"CPU {totals['cpu_nodes']:.2f} s on the nodes' callbacks and {totals['cpu_other']:.2f} s elsewhere")
+    print('node      height  bytes sent  packets     CPU')
+    for node in results['nodes']:
+        print(f"{node['id']}  {node['chain_height']:>6}  {node['bytes_sent']:>10}  {node['packets_sent']:>7}  "
+              f"{node['cpu']:>5.2f} s")
+
+
+def compare(results, baseline):
+    print(f"compared with {baseline.get('commit') or 'baseline'}:")
+    before, after = headline(baseline), headline(results)
+    for name, value in after.items():
+        old = before.get(name)
+        if value is None or not old:
+            print(f'{name:>14}: {old} -> {value}')
+        else:
+            print(f'{name:>14}: {old:.3f} -> {value:.3f} ({(value - old) / old * 100:+.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--workload', choices=['steady', 'burst', 'batch'], default='steady')
+    parser.add_argument('--rate', type=float, default=200, help='votes per second')
+    parser.add_argument('--duration', type=float, default=5, help='seconds of votes')
+    parser.add_argument('--batch-size', type=int, default=100, help='votes per call for the batch workload')
+    parser.add_argument('--drain', type=float, default=30, help='seconds to wait for confirmations afterwards')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--set', type=parse_setting, action='append', default=[], metavar='NAME=VALUE',
+                        help='override a MyCommunitySettings field')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results to compare with')
+    args = parser.parse_args()
+
+    settings = {'block_log_dir': None, **dict(args.set)}
+    results = {'benchmark': 'network',
+               'commit': git_commit(),
+               'timestamp': datetime.now(timezone.utc).isoformat(),
+               'python': platform.python_version(),
+               'params': {'nodes': args.nodes, 'workload': args.workload, 'rate': args.rate,
+                          'duration': args.duration, 'batch_size': args.batch_size, 'seed': args.seed},
+               'settings': settings}
+    results.update(asyncio.run(run(args, settings)))
+
+    report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
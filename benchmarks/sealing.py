@@ -0,0 +1,111 @@
+"""
+Confirmed votes per second and confirmation latency for different block sealing policies.
+
+A network of nodes gets a steady stream of votes, spread over random nodes, and a vote counts as
+confirmed once it is in a block on the chain of the first node. Each policy row sets the maximum
+transactions per block, the maximum time a block stays open and the leader check interval.
+The first row is the old behaviour: 5 transactions per block, checked every 5 seconds.
+
+Run from the repository root with ``python -m benchmarks.sealing``.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+from ipv8.peer import Peer
+from ipv8.test.mocking.endpoint import internet
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+from blockchain import MyCommunity, MyCommunitySettings
+from transaction import Transaction
+
+# (max txs, max latency, check interval, adaptive)
+POLICIES = [
+    (5, 5.0, 5.0, False),
+    (5, 0.5, 0.1, False),
+    (50, 0.5, 0.1, False),
+    (200, 0.5, 0.1, False),
+    (200, 2.0, 0.1, False),
+    (200, 0.5, 0.1, True),
+]
+
+
+def connect(nodes):
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+            node.overlay.add_member(other.my_peer.mid)
+
+
+async def run(node_count, rate, duration, max_txs, max_latency, interval, adaptive, drain=30.0):
+    settings = MyCommunitySettings(block_log_dir=None, block_max_txs=max_txs, block_max_latency=max_latency,
+                                   block_check_interval=interval, block_adaptive=adaptive)
+    nodes = [MockIPv8('curve25519', MyCommunity, settings) for _ in range(node_count)]
+    connect(nodes)
+
+    submitted = {}
+    confirmed = {}
+    observer = nodes[0].overlay
+    store_block = observer.store_block
+
+    def timed_store_block(block, resolved=None):
+        added = store_block(block, resolved)
+        if added:
+            now = time.perf_counter()
+            for tx_hash in block.tx_hashes():
+                confirmed.setdefault(tx_hash, now)
+        return added
+
+    observer.store_block = timed_store_block
+    for node in nodes:
+        node.overlay.register_task('check_txs', node.overlay.block_creation, interval=interval)
+
+    start = time.perf_counter()
+    for i in range(int(rate * duration)):
+        await asyncio.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        node = random.choice(nodes).overlay
+        submitted[Transaction(node.my_peer.mid, f'topic{i}', 'yes').get_tx_hash()] = time.perf_counter()
+        node.create_transaction(f'topic{i}', 'yes')
+
+    end = time.perf_counter() + drain
+    while len(confirmed.keys() & submitted.keys()) < len(submitted) and time.perf_counter() < end:
+        await asyncio.sleep(0.05)
+
+    latencies = [confirmed[tx_hash] - at for tx_hash, at in submitted.items() if tx_hash in confirmed]
+    last = max((confirmed[tx_hash] for tx_hash in submitted if tx_hash in confirmed), default=start)
+    for node in nodes:
+        await node.stop()
+    internet.clear()
+    return len(submitted), latencies, last - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=200, help='votes submitted per second')
+    parser.add_argument('--duration', type=float, default=5, help='seconds of submitting votes')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f'{args.nodes} nodes, {args.rate:.0f} votes/s for {args.duration:.0f} s')
+    print('max txs  max latency  interval  adaptive | confirmed  votes/s  p50 latency  p95 latency')
+    for max_txs, max_latency, interval, adaptive in POLICIES:
+        sent, latencies, elapsed = asyncio.run(run(args.nodes, args.rate, args.duration,
+                                                   max_txs, max_latency, interval, adaptive))
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=20)
+            p50, p95 = statistics.median(latencies), quantiles[18]
+        else:
+            p50 = p95 = float('nan')
+        print(f'{max_txs:>7}  {max_latency:>10.1f}s  {interval:>7.1f}s  {str(adaptive):>8} | '
+              f'{len(latencies):>4}/{sent:<4}  {len(latencies) / elapsed:>7.1f}  {p50:>10.2f}s  {p95:>10.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Time for a fresh node to catch up with a long chain.
+
+Source nodes are loaded with the same chain of signed one-vote blocks, then an empty node joins and
+synchronizes over ipv8's mock endpoints, with a simulated one-way link latency.
+``headers first`` is the HeadersRequest / BlocksRequest protocol with parallel downloads from every source.
+``one by one`` is the old catch up path: the new node only hears of the tip and walks back with one
+BlockRequest per block, so it is run on a shorter chain.
+
+Run from the repository root with ``python -m benchmarks.sync``.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.peer import Peer
+from ipv8.test.mocking.endpoint import MockEndpoint, internet
+from ipv8.test.mocking.ipv8 import MockIPv8
+
+from block import Block
+from blockchain import BlockMessage, MyCommunity, MyCommunitySettings
+from chain_store import GENESIS_HASH
+from transaction import Transaction
+
+
+def add_latency(latency):
+    send = MockEndpoint.send
+
+    def delayed_send(self, socket_address, packet):
+        asyncio.get_running_loop().call_later(latency, send, self, socket_address, packet)
+
+    MockEndpoint.send = delayed_send
+
+
+def make_chain(length):
+    voters = [default_eccrypto.generate_key('curve25519') for _ in range(16)]
+    blocks = []
+    previous_hash = GENESIS_HASH
+    for i in range(length):
+        key = voters[i % len(voters)]
+        tx = Transaction(Peer(key).mid, f'topic{i}', 'yes', public_key=default_eccrypto.key_to_bin(key.pub()))
+        tx.signature = default_eccrypto.create_signature(key, tx.get_tx_bytes())
+        block = Block(previous_hash)
+        block.add_transaction(tx)
+        block.update_tree()
+        blocks.append(block)
+        previous_hash = block.get_merkle_hash()
+    return blocks
+
+
+def make_node(**settings):
+    return MockIPv8('curve25519', MyCommunity, MyCommunitySettings(block_log_dir=None, **settings))
+
+
+def connect(nodes):
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+
+
+async def wait_for_height(community, height, timeout):
+    start = time.perf_counter()
+    while community.chain.height < height:
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f'stuck at height {community.chain.height} of {height}')
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start
+
+
+async def headers_first(blocks, sources, timeout):
+    nodes = [make_node() for _ in range(sources)]
+    for node in nodes:
+        for block in blocks:
+            node.overlay.store_block(block)
+    joiner = make_node(sync_peers=sources)
+    connect(nodes + [joiner])
+
+    start = time.perf_counter()
+    joiner.overlay.register_task('sync_chain', joiner.overlay.sync_chain, interval=1.0)
+    await wait_for_height(joiner.overlay, len(blocks) - 1, timeout)
+    elapsed = time.perf_counter() - start
+
+    for node in nodes + [joiner]:
+        await node.stop()
+    internet.clear()
+    return elapsed
+
+
+async def one_by_one(blocks, timeout):
+    source = make_node()
+    for block in blocks:
+        source.overlay.store_block(block)
+    joiner = make_node(orphan_pool_size=len(blocks))
+    connect([source, joiner])
+
+    tip = BlockMessage(blocks[-1].merkle_hash, blocks[-1], 0)
+    tip.public_key = source.overlay.my_public_key_bin
+    tip.signature = default_eccrypto.create_signature(source.my_peer.key, tip.get_block_bytes())
+
+    start = time.perf_counter()
+    source.overlay.ez_send(source.overlay.get_peers()[0], tip)
+    await wait_for_height(joiner.overlay, len(blocks) - 1, timeout)
+    elapsed = time.perf_counter() - start
+
+    await source.stop()
+    await joiner.stop()
+    internet.clear()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=10_000)
+    parser.add_argument('--legacy-blocks', type=int, default=500)
+    parser.add_argument('--sources', type=int, nargs='+', default=[1, 3])
+    parser.add_argument('--latency', type=float, default=0.005, help='one-way link latency in seconds')
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    add_latency(args.latency)
+    blocks = make_chain(args.blocks)
+    # The sync log lines would dominate the run time
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for sources in args.sources:
+        elapsed = asyncio.run(headers_first(blocks, sources, args.timeout))
+        print(f'headers first, {sources} source(s): {len(blocks)} blocks in {elapsed:.2f} s '
+              f'({len(blocks) / elapsed:.0f} blocks/s)')
+
+    legacy = blocks[:args.legacy_blocks]
+    elapsed = asyncio.run(one_by_one(legacy, args.timeout))
+    print(f'one by one: {len(legacy)} blocks in {elapsed:.2f} s ({len(legacy) / elapsed:.0f} blocks/s, '
+          f'{len(blocks) / len(legacy) * elapsed:.1f} s extrapolated to {len(blocks)} blocks)')
+
+
+if __name__ == '__main__':
+    main()
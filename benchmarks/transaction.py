@@ -0,0 +1,82 @@
+"""
+Cost of the transaction hashing in the ``on_transaction`` hot path, before and after memoization.
+
+Every received transaction is hashed for the duplicate check, packed for the signature check and hashed
+again for the mempool insert (and once more when it is added to a block). The ``before`` numbers re-pack
+a copy for every call like ``Transaction`` used to, ``after`` uses the cached bytes and hash.
+
+Run from the repository root with ``python -m benchmarks.transaction``.
+"""
+import argparse
+import os
+import time
+from hashlib import sha256
+
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.messaging.serialization import default_serializer
+
+from transaction import Transaction
+
+
+def uncached_bytes(tx: Transaction) -> bytes:
+    return default_serializer.pack_serializable(Transaction(tx.sender, tx.topic, tx.vote))
+
+
+def uncached_hash(tx: Transaction) -> str:
+    return sha256(uncached_bytes(tx)).hexdigest()
+
+
+def hot_path_before(tx, key, verify):
+    uncached_hash(tx)
+    if verify:
+        default_eccrypto.is_valid_signature(key, uncached_bytes(tx), tx.signature)
+    uncached_hash(tx)
+    uncached_bytes(tx)
+    uncached_hash(tx)
+
+
+def hot_path_after(tx, key, verify):
+    tx.get_tx_hash()
+    if verify:
+        default_eccrypto.is_valid_signature(key, tx.get_tx_bytes(), tx.signature)
+    tx.get_tx_hash()
+    tx.get_tx_bytes()
+    tx.get_tx_hash()
+
+
+def run(path, txs, key, verify):
+    start = time.perf_counter()
+    for tx in txs:
+        path(tx, key, verify)
+    return (time.perf_counter() - start) / len(txs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--txs', type=int, default=20_000)
+    parser.add_argument('--curve', default='medium', help='ipv8 key strength used to sign the votes')
+    args = parser.parse_args()
+
+    key = default_eccrypto.generate_key(args.curve)
+    public_key = key.pub()
+    public_bin = default_eccrypto.key_to_bin(public_key)
+
+    def make_txs(count):
+        txs = []
+        for i in range(count):
+            tx = Transaction(os.urandom(20), f'topic{i % 20}', 'yes', public_key=public_bin)
+            tx.signature = default_eccrypto.create_signature(key, tx.get_tx_bytes())
+            # Received transactions start without a cache
+            txs.append(default_serializer.unpack_serializable(Transaction, default_serializer.pack_serializable(tx))[0])
+        return txs
+
+    for verify, count in ((False, args.txs), (True, max(1, args.txs // 10))):
+        before = run(hot_path_before, make_txs(count), public_key, verify)
+        after = run(hot_path_after, make_txs(count), public_key, verify)
+        label = 'with signature check' if verify else 'hashing only'
+        print(f'{label:>22}: before {before * 1e6:8.2f} us/tx, after {after * 1e6:8.2f} us/tx '
+              f'({before / after:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Signature verification throughput of SignatureVerifier with 1, 2, 4 and 8 workers.
+
+A burst of signed votes is pushed through the verifier the way ``on_transaction`` does it, one
+``verify`` call per incoming transaction, and the time until every result is back is measured.
+
+Run from the repository root with ``python -m benchmarks.verification``.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+
+from transaction import Transaction
+from verification import SignatureVerifier
+
+
+def make_checks(count, curve):
+    checks = []
+    keys = [default_eccrypto.generate_key(curve) for _ in range(16)]
+    for i in range(count):
+        key = keys[i % len(keys)]
+        tx = Transaction(os.urandom(20), f'topic{i}', 'yes')
+        checks.append((default_eccrypto.key_to_bin(key.pub()), tx.get_tx_bytes(),
+                       default_eccrypto.create_signature(key, tx.get_tx_bytes())))
+    return checks
+
+
+async def run(checks, workers, executor, batch_size):
+    verifier = SignatureVerifier(workers, executor, batch_size)
+    if verifier.executor is not None:
+        # Start the pool before timing, process pools fork lazily
+        await asyncio.gather(*[verifier.verify(*check) for check in checks[:workers * batch_size]])
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[verifier.verify(*check) for check in checks])
+    elapsed = time.perf_counter() - start
+    verifier.shutdown()
+
+    assert all(results)
+    return len(checks) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--txs', type=int, default=4_000)
+    parser.add_argument('--curve', default='medium', help='ipv8 key strength used to sign the votes')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--executors', nargs='+', default=['thread', 'process'])
+    args = parser.parse_args()
+
+    checks = make_checks(args.txs, args.curve)
+    inline = asyncio.run(run(checks, 0, 'thread', args.batch_size))
+    print(f'{"inline":>8}: {inline:10.0f} tx/s')
+    for executor in args.executors:
+        for workers in (1, 2, 4, 8):
+            throughput = asyncio.run(run(checks, workers, executor, args.batch_size))
+            print(f'{executor:>8} x{workers}: {throughput:10.0f} tx/s ({throughput / inline:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,55 @@
-from typing import List
+from hashlib import sha256
+from typing import List, Optional
 
 from ipv8.messaging.lazy_payload import VariablePayload
 
-from merkle_tree import MerkleTree
+from merkle_tree import IncrementalMerkleTree
 from transaction import Transaction
 
+# Every transaction adds three length prefixed entries to a block: the transaction, its signature and public key
+ENTRY_OVERHEAD = 3 * 2
+
 
 class Block(VariablePayload):
-    format_list = ['varlenHutf8', 'varlenHutf8', 'varlenH-list']
-    names = ['previous_hash', 'merkle_hash', 'transactions']
+    format_list = ['varlenHutf8', 'varlenHutf8', 'varlenH-list', 'varlenH-list', 'varlenH-list']
+    names = ['previous_hash', 'merkle_hash', 'transactions', 'signatures', 'public_keys']
 
-    def __init__(self, previous_hash: str = '', merkle_hash: str = None, transactions: List[bytes] = None):
+    def __init__(self, previous_hash: str = '', merkle_hash: str = None, transactions: List[bytes] = None,
+                 signatures: List[bytes] = None, public_keys: List[bytes] = None):
         # super().__init__()
         self.previous_hash = previous_hash
         self.transactions = [] if transactions is None else transactions
-        self.merkle_tree = MerkleTree()
+        # Signature and public key of every transaction, so peers that never saw a tx can still verify it
+        self.signatures = [] if signatures is None else signatures
+        self.public_keys = [] if public_keys is None else public_keys
+        # Filled while the block is built, blocks in the chain drop it, see MyCommunity.store_block
+        self.merkle_tree: Optional[IncrementalMerkleTree] = IncrementalMerkleTree()
         self.merkle_hash = '' if merkle_hash is None else merkle_hash
+        # Serialized size of the transaction entries
+        self.size = sum(map(len, self.transactions)) + sum(map(len, self.signatures)) \
+            + sum(map(len, self.public_keys)) + ENTRY_OVERHEAD * len(self.transactions)
 
     def add_transaction(self, transaction: Transaction):
         # We serialize the transaction before appending it to the array
         # because there seems to be an ipv8 problem when it tries to serialize the whole array
-        self.transactions.append(transaction.get_tx_bytes())
+        tx_bytes = transaction.get_tx_bytes()
+        self.transactions.append(tx_bytes)
+        self.signatures.append(transaction.signature)
+        self.public_keys.append(transaction.public_key)
+        self.size += len(tx_bytes) + len(transaction.signature) + len(transaction.public_key) + ENTRY_OVERHEAD
         self.merkle_tree.add_leaf(transaction.get_tx_hash())
 
+    def tx_hashes(self) -> List[str]:
+        """
+        Hashes of the transactions, in block order.
+
+        The serialized transactions in a block are exactly the bytes their hash is taken over.
+        """
+        return [sha256(tx_bytes).hexdigest() for tx_bytes in self.transactions]
+
     def set_transactions(self, transactions: List[bytes]):
         self.transactions = transactions
 
-    def is_full(self) -> bool:
-        return len(self.transactions) >= 5
-
     def update_tree(self):
         self.merkle_tree.recalculate_tree()
         self.merkle_hash = self.merkle_tree.get_root_hash()
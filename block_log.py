@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterator, List
+
+from ipv8.messaging.serialization import default_serializer
+
+from block import Block
+
+MAGIC = b'VBLK'
+VERSION = 2  # Version 2 blocks carry the transaction signatures
+HEADER = MAGIC + bytes([VERSION])
+RECORD_HEADER = struct.Struct('>II')  # payload length, crc32 of the payload
+
+
+class BlockLog:
+    """
+    Append-only on-disk log of blocks.
+
+    Every record is a length and checksum header followed by the ipv8 serialization of a ``Block``.
+    Opening the log scans the record headers into an offset index and cuts off a torn or corrupt tail,
+    which is what a crash in the middle of ``append`` leaves behind.
+    Reads go through a memory map of the file so random access does not need a seek and read per block.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.offsets: List[int] = []
+        self._map = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path) or os.path.getsize(path) < len(HEADER):
+            with open(path, 'wb') as f:
+                f.write(HEADER)
+
+        self._file = open(path, 'r+b')
+        header = self._file.read(len(HEADER))
+        if header[:len(MAGIC)] != MAGIC:
+            self._file.close()
+            raise ValueError(f'{path} is not a block log')
+        if header[len(MAGIC)] != VERSION:
+            self._file.close()
+            raise ValueError(f'{path} is a version {header[len(MAGIC)]} block log, expected version {VERSION}')
+
+        end = self._build_index()
+        if end < os.path.getsize(path):
+            self._close_map()
+            self._file.truncate(end)
+        self._file.seek(end)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __iter__(self) -> Iterator[Block]:
+        for i in range(len(self.offsets)):
+            yield self.read(i)
+
+    def _build_index(self) -> int:
+        """
+        Fill the offset index and return the end of the last intact record.
+        """
+        self._remap()
+        data = self._map
+        size = len(data)
+        offset = len(HEADER)
+        while offset + RECORD_HEADER.size <= size:
+            length, checksum = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > size or zlib.crc32(data[start:start + length]) != checksum:
+                break
+            self.offsets.append(offset)
+            offset = start + length
+        return offset
+
+    def _remap(self) -> None:
+        self._close_map()
+        self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def append(self, block: Block) -> int:
+        """
+        Write a block at the end of the log and return its index.
+        """
+        payload = default_serializer.pack_serializable(block)
+        offset = self._file.tell()
+        self._file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.offsets.append(offset)
+        return len(self.offsets) - 1
+
+    def read(self, index: int) -> Block:
+        offset = self.offsets[index]
+        if self._map is None or offset + RECORD_HEADER.size > len(self._map):
+            self._remap()
+        length, _ = RECORD_HEADER.unpack_from(self._map, offset)
+        start = offset + RECORD_HEADER.size
+        if start + length > len(self._map):
+            self._remap()
+        return default_serializer.unpack_serializable(Block, self._map[start:start + length])[0]
+
+    def close(self) -> None:
+        self._close_map()
+        self._file.close()
@@ -1,4 +1,6 @@
-from ipv8.messaging.payload_dataclass import dataclass
+from typing import List
+
+from ipv8.messaging.payload_dataclass import dataclass, type_from_format
 
 from block import Block
 
@@ -11,3 +13,26 @@ class BlockRequest:
 @dataclass(msg_id=5)
 class BlockResponse:
     block: Block
+
+
+@dataclass(msg_id=6)
+class HeadersRequest:
+    locator: type_from_format('varlenH-list')  # utf-8 encoded block hashes, see ChainStore.locator
+    max_headers: int
+
+
+@dataclass(msg_id=7)
+class HeadersResponse:
+    start_hash: str
+    hashes: type_from_format('varlenH-list')  # binary hashes of the blocks that follow start_hash
+    tip_height: int
+
+
+@dataclass(msg_id=8)
+class BlocksRequest:
+    hashes: type_from_format('varlenH-list')  # binary block hashes
+
+
+@dataclass(msg_id=9)
+class BlocksResponse:
+    blocks: List[Block]
@@ -1,31 +1,65 @@
+import asyncio
 import binascii
+import itertools
 import logging
-import random as random
+import os
+import time
 import random as random2
 import sys
 
-from collections import defaultdict
-from datetime import time
-from typing import Dict
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 from ipv8.community import Community, CommunitySettings
 from ipv8.lazy_community import lazy_wrapper
 from ipv8.messaging.payload_dataclass import dataclass
 from ipv8.messaging.serialization import default_serializer
+from ipv8.peerdiscovery.network import PeerObserver
 from ipv8.types import Peer
 
 from block import Block
-from block_request import BlockRequest, BlockResponse
-from transaction import Transaction
+from block_log import BlockLog
+from block_request import (BlockRequest, BlockResponse, BlocksRequest, BlocksResponse, HeadersRequest,
+                           HeadersResponse)
+from chain_store import ChainStore
+from compact_block import (BlockTransactionsRequest, BlockTransactionsResponse, CompactBlock, PartialBlock,
+                           block_transactions, compact_ids, mempool_index, pack_indexes, unpack_indexes)
+from key_cache import KeyCache
+from leader_schedule import LeaderSchedule
+from membership import Membership, MembershipBuckets, MembershipDigest, MembershipMembers
+from mempool import Mempool
+from metrics_registry import MetricsRegistry, timed_handler
+from merkle_tree import IncrementalMerkleTree
+from orphan_pool import OrphanPool
+from outbox import TransactionOutbox
+from packing import MAX_MESSAGE_SIZE, split_by_size
+from sealing import SealingPolicy
+from seen_filter import SeenFilter
+from sync import ChainSync
+from tally_feed import TallyFeed
+from transaction import BATCH_ITEM_OVERHEAD, BATCH_OVERHEAD, Transaction, TransactionBatch
+from verification import SignatureVerifier
 
 # Amount of peers to send message to
 k = 2
 
-logfile = 'logfile.log'
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s',handlers=[
-        logging.StreamHandler(),  # Log to stdout
-        logging.FileHandler(logfile, mode='w')  # Log to a file
-    ])
+# Block hashes that fit in one HeadersResponse, every binary hash takes 34 bytes
+HEADERS_PER_MESSAGE = (MAX_MESSAGE_SIZE - 100) // 34
+
+# Subsystem loggers, see log_setup.setup_logging for their levels and handlers
+logger = logging.getLogger('voting')
+tx_logger = logging.getLogger('voting.tx')
+block_logger = logging.getLogger('voting.block')
+sync_logger = logging.getLogger('voting.sync')
+# Trace events with structured fields, what the metrics scripts read
+trace_logger = logging.getLogger('voting.trace')
+
+
+@lru_cache(maxsize=4096)
+def hex_id(mid: bytes) -> str:
+    return binascii.hexlify(mid).decode()
+
 
 @dataclass(msg_id=2)
 class BlockMessage:
@@ -39,16 +73,122 @@ class BlockMessage:
         return default_serializer.pack_serializable(self.block)
 
 
-@dataclass(msg_id=3)
-class PeersMessage:
-    mid: bytes
-    ttl: int = 3
+class MyCommunitySettings(CommunitySettings):
+    block_log_dir: Optional[str] = 'data'
+    """Directory of the on-disk block log, ``None`` keeps the chain in memory only."""
+
+    block_log_fsync: bool = False
+    """Fsync the block log after every block instead of leaving it to the OS."""
+
+    proof_cache_size: int = 128
+    """Number of recent block merkle trees kept around to answer inclusion proofs."""
+
+    membership_interval: float = 5.0
+    """Seconds between two membership digest exchanges with a random peer."""
+
+    membership_buckets: int = 64
+    """Number of buckets in a membership digest, at most 256. More buckets mean a longer digest but smaller diffs."""
+
+    leader_epoch_length: int = 100
+    """Number of heights whose leaders are drawn at once from the same membership and seed."""
+
+    leader_seed_blocks: int = 3
+    """Number of block hashes before an epoch that seed its leader schedule."""
+
+    leader_timeout: float = 10.0
+    """Seconds without a new block after which the next member may seal the height, so a leader that left stalls
+    the chain for that long instead of for good."""
+
+    block_max_txs: int = 200
+    """Number of transactions after which the leader seals its block, at most 255."""
+
+    block_max_bytes: int = 60_000
+    """Size of the transactions in a block after which it is sealed, keeps a block within one UDP datagram."""
+
+    block_max_latency: float = 2.0
+    """Seconds a block may stay open before the leader seals it with the transactions it has."""
+
+    block_adaptive: bool = False
+    """Follow the mempool depth with the number of transactions per block, up to block_max_txs."""
+
+    block_check_interval: float = 0.5
+    """Seconds between two checks of the leader for transactions to put in a block."""
+
+    mempool_capacity: int = 10_000
+    """Number of pending transactions kept, the oldest ones are dropped beyond that."""
+
+    mempool_max_age: float = 600.0
+    """Seconds a transaction may wait for a block before it is dropped."""
+
+    orphan_pool_size: int = 256
+    """Number of blocks with an unknown parent kept until the parent arrives."""
+
+    orphan_max_age: float = 120.0
+    """Seconds a block with an unknown parent is kept."""
+
+    block_request_timeout: float = 5.0
+    """Seconds before a missing block is requested again."""
+
+    sync_interval: float = 5.0
+    """Seconds between asking peers if they have blocks we are missing."""
+
+    sync_peers: int = 3
+    """Number of peers asked for headers, and so downloaded from, at the same time."""
+
+    sync_headers_per_request: int = 2000
+    """Maximum number of block hashes a peer sends in reply to one headers request."""
+
+    sync_blocks_per_request: int = 16
+    """Number of blocks asked for in one blocks request."""
+
+    sync_requests_per_peer: int = 4
+    """Number of blocks requests that may be outstanding to a peer at the same time."""
+
+    key_cache_size: int = 4096
+    """Number of parsed public keys kept for signature checks."""
+
+    verify_workers: int = 2
+    """Size of the pool that verifies transaction signatures, 0 verifies them inline on the event loop."""
+
+    verify_executor: str = 'thread'
+    """Pool type used for signature verification, ``'thread'`` or ``'process'``."""
+
+    verify_batch_size: int = 32
+    """Number of signatures handed to the pool at once."""
+
+    verify_batch_delay: float = 0.002
+    """Seconds to wait for a batch to fill up before verifying it anyway."""
+
+    compact_blocks: bool = True
+    """Announce new blocks by the short ids of their transactions instead of sending them in full."""
+
+    compact_block_timeout: float = 2.0
+    """Seconds to wait for the missing transactions of a compact block before asking for the full block."""
+
+    tx_batch_window: float = 0.01
+    """Seconds outbound transactions wait to be sent together with others to the same peer, 0 disables batching."""
 
+    tx_batch_max_size: int = MAX_MESSAGE_SIZE
+    """Payload bytes of one transaction batch, a batch is sent as soon as it is full."""
 
-class MyCommunity(Community):
+    tally_feed_window: float = 0.1
+    """Seconds vote count changes are collected before they are pushed to tally subscribers, 0 pushes every change."""
+
+    seen_filter_capacity: int = 100_000
+    """Number of gossip messages remembered per generation of the seen-message filter."""
+
+    seen_filter_error_rate: float = 0.001
+    """False positive rate of the seen-message filter, a false positive drops a new message."""
+
+    seen_filter_window: float = 60.0
+    """Seconds after which the seen-message filter starts forgetting messages."""
+
+
+class MyCommunity(Community, PeerObserver):
     community_id = b'harbourspaceuniverse'
+    settings_class = MyCommunitySettings
 
-    def __init__(self, settings: CommunitySettings) -> None:
+    def __init__(self, settings: MyCommunitySettings) -> None:
         super().__init__(settings)
         self.counter = 1
         self.max_messages = 5
@@ -58,24 +198,145 @@ class MyCommunity(Community):
         self.votes = {}
         self.voted = {}
 
-        self.pending_txs: Dict[str, Transaction] = {}
-        self.finalized_txs: Dict[str, Transaction] = {}
+        self.mempool = Mempool(settings.mempool_capacity, settings.mempool_max_age)
+        self.finalized_txs: Dict[str, Transaction] = {}  # transactions on the best chain
+        self.vote_locations: Dict[Tuple[bytes, str], str] = {}  # (sender, topic) -> tx hash on the best chain
+        # Transactions taken out of the mempool into the block this node is building, their votes are pending
+        self.block_txs = Mempool(capacity=sys.maxsize)
+        # (hash, signature) of txs waiting for their signature check, a forged copy must not hold up the real one
+        self.verifying_txs = set()
+        self.validating_blocks = set()  # Hashes of blocks whose transactions are being validated
+        self.orphans = OrphanPool(settings.orphan_pool_size, settings.orphan_max_age)
+        self.requested_blocks: Dict[str, float] = {}  # block hash -> time we last asked for it
+        self.compact_blocks = settings.compact_blocks
+        self.compact_block_timeout = settings.compact_block_timeout
+        # compact blocks waiting for transactions, with the peer that sent them and when
+        self.partial_blocks: Dict[str, Tuple[PartialBlock, Peer, float]] = {}
+        self.block_request_timeout = settings.block_request_timeout
+        self.sync = ChainSync(settings.sync_blocks_per_request, settings.sync_requests_per_peer,
+                              settings.block_request_timeout)
+        self.sync_interval = settings.sync_interval
+        self.sync_peers = settings.sync_peers
+        self.sync_headers_per_request = settings.sync_headers_per_request
+        # How many block transactions could be taken from the mempool instead of being verified again
+        self.block_validation_stats = {'blocks': 0, 'txs': 0, 'mempool_hits': 0, 'verified': 0}
+        # Gossip that was seen recently, checked before anything else so duplicates cost no crypto
+        self.seen = SeenFilter(settings.seen_filter_capacity, settings.seen_filter_error_rate,
+                               settings.seen_filter_window)
+        self.duplicate_stats = {'transactions': 0, 'blocks': 0}
+        self.outbox = TransactionOutbox(self.send_transactions, settings.tx_batch_window, settings.tx_batch_max_size)
+        self.tally_feed = TallyFeed(self.get_tallies, settings.tally_feed_window)
+
+        self.key_cache = KeyCache(settings.key_cache_size, self.crypto)
+        self.my_public_key_bin = self.crypto.key_to_bin(self.my_peer.key.pub())
+        self.my_id = hex_id(self.my_peer.mid)
+        self.verifier = SignatureVerifier(settings.verify_workers, settings.verify_executor,
+                                          settings.verify_batch_size, settings.verify_batch_delay, self.key_cache)
 
         self.balances = defaultdict(lambda: 1000)
-        self.blocks = []  # List to store finalized blocks
+        self.chain = ChainStore()  # Finalized blocks indexed by hash
+        self.tx_locations: Dict[str, Tuple[str, int]] = {}  # tx hash -> (best chain block hash, leaf index)
+        self.merkle_trees = OrderedDict()  # LRU of block hash -> merkle tree, for inclusion proofs
+        self.proof_cache_size = settings.proof_cache_size
         self.current_block = Block('0')  # Current working block
-
-        self.known_peers_mid = set()
-
-        self.add_message_handler(Transaction, self.on_transaction)
-        self.add_message_handler(BlockMessage, self.receive_block)
-        self.add_message_handler(PeersMessage, self.receive_peers)
-        self.add_message_handler(BlockRequest, self.on_block_request)
-        self.add_message_handler(BlockResponse, self.on_block_response)
+        self.block_opened_at = 0.0  # when the first transaction went into the current block
+        self.sealing = SealingPolicy(settings.block_max_txs, settings.block_max_bytes, settings.block_max_latency,
+                                     settings.block_adaptive)
+        self.block_check_interval = settings.block_check_interval
+
+        # Known members, kept in sync by anti-entropy, and the leaders of the current epoch drawn from them
+        self.membership = Membership(settings.membership_buckets)
+        self.membership_interval = settings.membership_interval
+        self.leaders = LeaderSchedule(settings.leader_epoch_length, settings.leader_seed_blocks)
+        self.leader_timeout = settings.leader_timeout
+        self.tip_changed_at = time.monotonic()
+
+        self.block_log = None
+        if settings.block_log_dir is not None:
+            path = os.path.join(settings.block_log_dir, f'{self.get_peer_id(self.my_peer)}.blocks')
+            try:
+                self.block_log = BlockLog(path, fsync=settings.block_log_fsync)
+            except ValueError as e:
+                # Logs of an older version hold blocks without the signatures of their transactions, which can
+                # not be recovered. The file is left alone and the chain is synced from peers into memory.
+                block_logger.error('[Node %s] %s. Move the file away to start a new block log, until then the chain '
+                                   'is kept in memory only', self.my_id, e)
+            else:
+                self.load_chain()
+
+        self.metrics = MetricsRegistry()
+        self.create_metrics()
+
+        handlers = [(Transaction, self.on_transaction),
+                    (TransactionBatch, self.on_transaction_batch),
+                    (BlockMessage, self.receive_block),
+                    (CompactBlock, self.on_compact_block),
+                    (BlockTransactionsRequest, self.on_block_transactions_request),
+                    (BlockTransactionsResponse, self.on_block_transactions_response),
+                    (MembershipDigest, self.on_membership_digest),
+                    (MembershipBuckets, self.on_membership_buckets),
+                    (MembershipMembers, self.on_membership_members),
+                    (BlockRequest, self.on_block_request),
+                    (BlockResponse, self.on_block_response),
+                    (HeadersRequest, self.on_headers_request),
+                    (HeadersResponse, self.on_headers_response),
+                    (BlocksRequest, self.on_blocks_request),
+                    (BlocksResponse, self.on_blocks_response)]
+        for payload_class, handler in handlers:
+            histogram = self.metrics.histogram('voting_handler_seconds',
+                                               'Seconds from receiving a message until its handler finished.',
+                                               {'message': payload_class.__name__})
+            self.add_message_handler(payload_class, timed_handler(histogram, handler))
+        self.network.add_peer_observer(self)
+
+    def create_metrics(self) -> None:
+        """
+        Create the metrics of the node, the ones kept elsewhere already are read when the metrics are collected.
+        """
+        metrics = self.metrics
+        self.txs_received = metrics.counter('voting_transactions_received_total',
+                                            'Transactions received from peers, duplicates included.')
+        self.txs_verified = metrics.counter('voting_transactions_verified_total',
+                                            'Received transactions with a valid signature.')
+        dropped = 'voting_transactions_dropped_total'
+        dropped_help = 'Transactions dropped, by reason.'
+        metrics.counter(dropped, dropped_help, {'reason': 'duplicate'},
+                        fn=lambda: self.duplicate_stats['transactions'])
+        self.txs_invalid = metrics.counter(dropped, dropped_help, {'reason': 'invalid_signature'})
+        self.txs_double_vote = metrics.counter(dropped, dropped_help, {'reason': 'double_vote'})
+        metrics.counter(dropped, dropped_help, {'reason': 'evicted'}, fn=lambda: self.mempool.evicted)
+        metrics.counter(dropped, dropped_help, {'reason': 'expired'}, fn=lambda: self.mempool.expired)
+        metrics.gauge('voting_mempool_transactions', 'Transactions waiting for a block.', fn=lambda: len(self.mempool))
+        metrics.gauge('voting_chain_height', 'Height of the best chain.', fn=lambda: self.chain.height)
+        metrics.gauge('voting_peers', 'Connected peers.', fn=lambda: len(self.get_peers()))
+        self.blocks_sealed = metrics.counter('voting_blocks_sealed_total', 'Blocks this node sealed.')
+        self.block_seal_time = metrics.histogram('voting_block_seal_seconds',
+                                                 'Seconds a block stayed open before this node sealed it.')
+        self.blocks_accepted = metrics.counter('voting_blocks_accepted_total', 'Blocks of peers added to the chain.')
+        metrics.counter('voting_blocks_duplicate_total', 'Block announcements that were seen before.',
+                        fn=lambda: self.duplicate_stats['blocks'])
+        stats = self.block_validation_stats
+        metrics.counter('voting_blocks_validated_total', 'Blocks of peers whose transactions were validated.',
+                        fn=lambda: stats['blocks'])
+        validated = 'voting_block_transactions_validated_total'
+        validated_help = 'Transactions of validated blocks, by whether they were taken from the mempool or verified.'
+        metrics.counter(validated, validated_help, {'source': 'mempool'}, fn=lambda: stats['mempool_hits'])
+        metrics.counter(validated, validated_help, {'source': 'verified'}, fn=lambda: stats['verified'])
+        rejected = 'voting_blocks_rejected_total'
+        rejected_help = 'Blocks of peers rejected by validation, by reason.'
+        self.blocks_rejected = {reason: metrics.counter(rejected, rejected_help, {'reason': reason})
+                                for reason in ('malformed', 'merkle_root', 'repeated_tx', 'finalized_tx',
+                                               'double_vote', 'invalid_signature')}
+        # Time spent on this node only, the delay from the leader sealing a block until a node accepts it shows in
+        # the block_sealed and block_accepted trace events, see log_analysis.LogStats.latencies
+        self.block_acceptance = metrics.histogram('voting_block_acceptance_seconds',
+                                                  'Seconds from receiving a block to accepting it on this node: the '
+                                                  'signature and transaction checks, and for a compact block '
+                                                  'fetching the transactions missing from the mempool.')
 
     def started(self) -> None:
-        logging.info('Community started')
-        self.known_peers_mid.add(self.my_peer.mid)
+        logger.info('Community started')
+        self.add_member(self.my_peer.mid)
 
         # Testing purpose
         # if id == 1:
@@ -83,26 +344,243 @@ class MyCommunity(Community):
         # self.register_task("tx_create", self.create_transaction, delay=7, interval=random_transaction_interval)
 
         # random_check_interval = random.randint(5, 10)
-        self.register_task("check_txs", self.block_creation, delay=7, interval=5)
+        self.register_task("check_txs", self.block_creation, delay=7, interval=self.block_check_interval)
+
+        self.register_task("membership", self.exchange_membership, delay=5, interval=self.membership_interval)
+
+        self.register_task("sync_chain", self.sync_chain, delay=3, interval=self.sync_interval)
+
+    @property
+    def blocks(self):
+        return self.chain.blocks
+
+    def load_chain(self) -> None:
+        """
+        Rebuild the chain, transaction index, finalized transactions and tallies from the block log.
+        """
+        for block in self.block_log:
+            block.merkle_tree = None
+            tip_hash = self.chain.tip_hash
+            if self.chain.add(block):
+                self.follow_best_chain(tip_hash)
+
+        if len(self.block_log):
+            block_logger.info('[Node %s] loaded %d blocks from disk', self.my_id, len(self.block_log))
+        self.current_block.previous_hash = self.chain.tip_hash
+
+    def store_block(self, block: Block, resolved: Optional[List[Tuple[str, Transaction]]] = None) -> bool:
+        """
+        Add a block to the chain and, if it is new, to the block log.
+
+        ``resolved`` are the (hash, transaction) pairs of the block, if the caller already has them.
+        """
+        tip_hash = self.chain.tip_hash
+        if not self.chain.add(block):
+            return False
+        if self.block_log is not None:
+            self.block_log.append(block)
+        # Trees only live in the bounded cache, get_proof rebuilds the others when it needs them
+        if block.merkle_tree is not None and len(block.merkle_tree) == len(block.transactions):
+            self.cache_merkle_tree(block.get_merkle_hash(), block.merkle_tree)
+        block.merkle_tree = None
+        self.follow_best_chain(tip_hash, resolved)
+        return True
+
+    def follow_best_chain(self, old_tip_hash: str, resolved: Optional[List[Tuple[str, Transaction]]] = None) -> None:
+        """
+        Bring the finalized transactions, transaction index and tallies from the chain that ended at
+        ``old_tip_hash`` to the best chain, after a block was added.
+
+        A block on a side branch changes nothing. When a branch overtakes the best chain, the blocks that left
+        it are disconnected, their transactions go back to the mempool, and the blocks of the branch are
+        connected. ``resolved`` belongs to the block at the new tip.
+        """
+        if self.chain.tip_hash == old_tip_hash:
+            return
+        self.tip_changed_at = time.monotonic()
+        disconnected = self.chain.branch(old_tip_hash)
+        fork_height = self.chain.height_of(old_tip_hash) - len(disconnected)
+        for block_hash in disconnected:
+            self.disconnect_block(self.chain.get(block_hash))
+        if disconnected:
+            block_logger.info('[Node %s] switched to a branch at height %d, %d blocks left the best chain',
+                              self.my_id, fork_height, len(disconnected))
+
+        for block_hash in self.chain.main_chain_hashes(fork_height + 1, self.chain.height - fork_height):
+            self.connect_block(self.chain.get(block_hash), resolved if block_hash == self.chain.tip_hash else None)
+
+    def connect_block(self, block: Block, resolved: Optional[List[Tuple[str, Transaction]]] = None) -> None:
+        """
+        Finalize the transactions of a block that joined the best chain.
+
+        Pending votes the block contains leave the mempool or the open block, other votes are counted and win
+        against a conflicting pending vote.
+        """
+        if resolved is None:
+            resolved = self.resolve_transactions(block)[0]
+        block_hash = block.get_merkle_hash()
+        for i, (tx_hash, tx) in enumerate(resolved):
+            if self.mempool.remove(tx_hash) is None and self.block_txs.remove(tx_hash) is None:
+                for pool in (self.mempool, self.block_txs):
+                    conflict = pool.vote_of(tx.sender, tx.topic)
+                    if conflict is not None:
+                        self.uncount_vote(pool.remove(conflict))
+                self.count_vote(tx)
+            self.finalized_txs[tx_hash] = tx
+            self.tx_locations[tx_hash] = (block_hash, i)
+            self.vote_locations[(tx.sender, tx.topic)] = tx_hash
+
+    def disconnect_block(self, block: Block) -> None:
+        """
+        Return the transactions of a block that left the best chain to the mempool, their votes stay counted
+        as pending votes.
+        """
+        for tx_hash in reversed(block.tx_hashes()):
+            tx = self.finalized_txs.pop(tx_hash)
+            self.tx_locations.pop(tx_hash, None)
+            self.vote_locations.pop((tx.sender, tx.topic), None)
+            self.add_to_mempool(tx)
+
+    def cache_merkle_tree(self, block_hash: str, tree: IncrementalMerkleTree) -> None:
+        self.merkle_trees[block_hash] = tree
+        self.merkle_trees.move_to_end(block_hash)
+        while len(self.merkle_trees) > self.proof_cache_size:
+            self.merkle_trees.popitem(last=False)
+
+    def get_proof(self, tx_hash: str) -> Dict:
+        """
+        Merkle inclusion proof of a finalized transaction.
+        """
+        if tx_hash not in self.tx_locations:
+            return {"error": "Transaction not found in a block"}
+        block_hash, index = self.tx_locations[tx_hash]
+
+        tree = self.merkle_trees.get(block_hash)
+        if tree is None:
+            tree = IncrementalMerkleTree()
+            for leaf in self.chain.get(block_hash).tx_hashes():
+                tree.add_leaf(leaf)
+        self.cache_merkle_tree(block_hash, tree)
+
+        return {"tx_hash": tx_hash,
+                "block_hash": block_hash,
+                "height": self.chain.height_of(block_hash),
+                "leaf_index": index,
+                "merkle_hash": tree.get_root_hash(),
+                "proof": tree.get_proof(index)}
+
+    def count_vote(self, tx: Transaction) -> bool:
+        """
+        Count the vote of a transaction, unless its sender already voted on the topic.
+        """
+        if tx.sender not in self.voted.keys():
+            self.voted[tx.sender] = {}
 
-        self.register_task("send_peers", self.send_peers, delay=5)
+        if tx.topic in self.voted[tx.sender].keys():
+            return False
+
+        self.voted[tx.sender][tx.topic] = True
+
+        if tx.topic not in self.votes.keys():
+            self.votes[tx.topic] = {}
+
+        if tx.vote not in self.votes[tx.topic].keys():
+            self.votes[tx.topic][tx.vote] = 0
+
+        self.votes[tx.topic][tx.vote] += 1
+        self.tally_feed.changed(tx.topic)
+        return True
+
+    def get_gossip_stats(self) -> Dict:
+        return {"duplicates": dict(self.duplicate_stats),
+                "checked": self.seen.checked,
+                "filter_bytes": self.seen.memory}
+
+    def uncount_vote(self, tx: Transaction) -> None:
+        """
+        Take back the vote of a transaction that left the mempool without being finalized.
+        """
+        topics = self.voted.get(tx.sender, {})
+        if topics.pop(tx.topic, None) is None:
+            return
+        if not topics:
+            del self.voted[tx.sender]
+        if self.votes.get(tx.topic, {}).get(tx.vote):
+            self.votes[tx.topic][tx.vote] -= 1
+            self.tally_feed.changed(tx.topic)
+
+    def add_to_mempool(self, tx: Transaction) -> None:
+        for evicted in self.mempool.add(tx):
+            self.uncount_vote(evicted)
+
+    def on_peer_added(self, peer: Peer) -> None:
+        pass
+
+    def on_peer_removed(self, peer: Peer) -> None:
+        self.sync.remove_peer(peer)
+
+    async def unload(self) -> None:
+        self.network.remove_peer_observer(self)
+        self.outbox.clear()
+        self.tally_feed.clear()
+        self.verifier.shutdown()
+        if self.block_log is not None:
+            self.block_log.close()
+        await super().unload()
 
     def peers_found(self):
         return len(self.get_peers()) > 0
 
     def get_peer_id(self, peer: Peer = None) -> str:
-        return binascii.hexlify(peer.mid).decode()
+        return hex_id(peer.mid)
+
+    def trace(self, event: str, message: str, *args, **fields) -> None:
+        """
+        Log a trace event of this node, with its fields as structured data.
+        """
+        if trace_logger.isEnabledFor(logging.INFO):
+            trace_logger.info('[Node %s] ' + message, self.my_id, *args,
+                              extra={'event': event, 'node': self.my_id, **fields})
 
     def get_votes(self, topic: str) -> Dict:
         if topic in self.votes.keys():
             return self.votes[topic]
         return {"error": "Topic not found"}
 
+    def get_tallies(self, topics: List[str]) -> Dict[str, Dict]:
+        """
+        Votes of every given topic, topics nobody voted on have no votes.
+        """
+        return {topic: self.votes.get(topic, {}) for topic in topics}
+
     def create_transaction(self, topic: str = '', option: str = '') -> None:
         if not self.peers_found():
-            logging.info(f'[Node {self.get_peer_id(self.my_peer)}] No peers found')
+            tx_logger.info('[Node %s] No peers found', self.my_id)
             return  {"error": "No peers found"}
 
+        receiver_peer = random2.choice([i for i in self.get_peers()])
+        return self.cast_vote(topic, option, receiver_peer)
+
+    def create_transactions(self, votes: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Cast many (topic, option) votes in one pass. They all go to the same peer, so the outbox packs them
+        into as few TransactionBatch messages as fit, and are sent right away.
+        """
+        if not self.peers_found():
+            tx_logger.info('[Node %s] No peers found', self.my_id)
+            return [{"error": "No peers found"}] * len(votes)
+
+        receiver_peer = random2.choice([i for i in self.get_peers()])
+        results = [self.cast_vote(topic, option, receiver_peer) for topic, option in votes]
+        self.outbox.flush_peer(receiver_peer)
+        return results
+
+    def cast_vote(self, topic: str, option: str, receiver_peer: Peer) -> Dict:
+        """
+        Vote on a topic and send the transaction to a peer.
+
+        Returns the votes of the topic and the hash of the transaction, which proves the vote once it is in a block.
+        """
         if not topic or not option:
             return {"error": "Missing information"}
 
@@ -122,136 +600,416 @@ class MyCommunity(Community):
             self.votes[topic][option] = 0
 
         self.votes[topic][option] += 1
-
-        # logging.info(f'[Node {self.get_peer_id(self.my_peer)}] Creating transaction')
-        receiver_peer = random2.choice([i for i in self.get_peers()])
+        self.tally_feed.changed(topic)
 
         # Record the timestamp just before sending the transaction
         # send_time = time.time()
 
         tx = Transaction(self.my_peer.mid, topic, option)
-        tx.public_key = self.crypto.key_to_bin(self.my_peer.key.pub())
+        tx.public_key = self.my_public_key_bin
         tx.signature = self.crypto.create_signature(self.my_peer.key, tx.get_tx_bytes())
-        self.pending_txs[tx.get_tx_hash()] = tx
-        self.ez_send(receiver_peer, tx)
+        self.trace('tx_created', 'created transaction on %s', topic, tx=tx.get_tx_hash())
+        self.add_to_mempool(tx)
+        self.outbox.add(receiver_peer, tx)
         self.counter += 1
 
-        return self.votes[topic]
+        return {"votes": self.votes[topic], "tx_hash": tx.get_tx_hash()}
 
     def block_creation(self):
-        # WIP: use hash of 2 or 3 previous block as seed
-        random.seed(len(self.blocks))
-        selected_peer_mid = random.choice(list(self.known_peers_mid))
-
-        if not selected_peer_mid == self.my_peer.mid:
+        for tx in self.mempool.expire():
+            self.uncount_vote(tx)
+
+        # Every leader_timeout without a new block the height passes to the next member
+        attempt = int((time.monotonic() - self.tip_changed_at) // self.leader_timeout)
+        leader = self.leaders.leader_for(self.chain.height + 1, self.chain.hash_at, attempt) == self.my_peer.mid
+        # Build on top of the best chain we know of, and only while it is our turn
+        if self.current_block.previous_hash != self.chain.tip_hash or (self.current_block.transactions and not leader):
+            self.reopen_block()
+        if not leader:
             return
 
-        for tx_hash in list(self.pending_txs.keys()):
-            tx = self.pending_txs.pop(tx_hash)
-            self.finalized_txs[tx_hash] = tx
-            self.current_block.add_transaction(tx)
-
-            if self.current_block.is_full():
-                logging.info(f'[Node {self.get_peer_id(self.my_peer)}] is creating a block {len(self.blocks)}')
-                self.finalize_and_broadcast_block()
+        self.sealing.observe(len(self.mempool))
+        full = False
+        while self.mempool and not full:
+            tx_hash, tx = self.mempool.peek_oldest()
+            if not self.sealing.fits(self.current_block, tx):
+                full = True
                 break
+            self.mempool.pop_oldest()
+            self.block_txs.add(tx)
+            if not self.current_block.transactions:
+                self.block_opened_at = time.time()
+            self.current_block.add_transaction(tx)
+            full = self.sealing.is_full(self.current_block)
+
+        if self.current_block.transactions and (full or self.sealing.is_due(self.block_opened_at)):
+            block_logger.info('[Node %s] is creating a block %d', self.my_id, self.chain.height + 1)
+            self.block_seal_time.observe(time.time() - self.block_opened_at)
+            self.blocks_sealed.inc()
+            self.finalize_and_broadcast_block()
+
+    def reopen_block(self) -> None:
+        """
+        Start a new block on the tip and return the transactions of the open block to the mempool.
+
+        Transactions a block of a peer finalized meanwhile already left the open block, the others are taken
+        again when this node seals the next block.
+        """
+        for tx_hash, tx in list(self.block_txs.items()):
+            self.block_txs.remove(tx_hash)
+            self.add_to_mempool(tx)
+        self.current_block = Block(self.chain.tip_hash)
+
+    def send_transactions(self, peer: Peer, txs: List[Transaction]) -> None:
+        if len(txs) == 1:
+            self.ez_send(peer, txs[0])
+        else:
+            self.ez_send(peer, TransactionBatch(txs))
 
     @lazy_wrapper(Transaction)
     async def on_transaction(self, peer: Peer, tx: Transaction) -> None:
-        my_id = self.get_peer_id(self.my_peer)
-        logging.info(f'[Node {my_id}] received transaction from {self.get_peer_id(peer)}')
-
-        tx_hash = tx.get_tx_hash()
-        # if we already have this tx we do nothing
-        if tx_hash in self.finalized_txs or tx_hash in self.pending_txs:
+        await self.process_transactions(peer, [tx])
+
+    @lazy_wrapper(TransactionBatch)
+    async def on_transaction_batch(self, peer: Peer, batch: TransactionBatch) -> None:
+        await self.process_transactions(peer, batch.transactions)
+
+    async def process_transactions(self, peer: Peer, txs: List[Transaction]) -> None:
+        """
+        Verify, count and gossip on the transactions of one message, their signatures are checked together.
+        """
+        peer_id = self.get_peer_id(peer)
+        new = []
+        self.txs_received.inc(len(txs))
+        for tx in txs:
+            tx_hash = tx.get_tx_hash()
+            # Only a tx whose signature checked out is remembered, the hash and public key are not signed and a
+            # tampered copy must not make the real one look like a duplicate
+            if self.seen.check(tx_hash.encode() + tx.signature):
+                self.duplicate_stats['transactions'] += 1
+                continue
+
+            self.trace('tx_received', 'received transaction from %s', peer_id, peer=peer_id, tx=tx_hash)
+            # if we already have this tx we do nothing
+            if (tx_hash in self.finalized_txs or tx_hash in self.mempool or tx_hash in self.block_txs
+                    or (tx_hash, tx.signature) in self.verifying_txs):
+                continue
+            self.verifying_txs.add((tx_hash, tx.signature))
+            new.append((tx_hash, tx))
+        if not new:
             return
 
         # if the signature of tx is not valid we do nothing
-        if not self.crypto.is_valid_signature(self.crypto.key_from_public_bin(tx.public_key), tx.get_tx_bytes(),
-                                            tx.signature):
-            logging.info(f'[Node {my_id}]: tx signature incorrect')
-            return
+        try:
+            results = await asyncio.gather(*[self.verifier.verify(tx.public_key, tx.get_tx_bytes(), tx.signature)
+                                             for _, tx in new])
+        finally:
+            self.verifying_txs.difference_update((tx_hash, tx.signature) for tx_hash, tx in new)
 
-        logging.info(f'[Node {my_id}]: tx signature correct')
+        peers = self.get_peers()
+        for (tx_hash, tx), valid in zip(new, results):
+            if not valid:
+                self.txs_invalid.inc()
+                tx_logger.info('[Node %s]: tx signature incorrect', self.my_id)
+                continue
+
+            self.txs_verified.inc()
+            self.seen.add(tx_hash.encode() + tx.signature)
+            tx_logger.debug('[Node %s]: tx signature correct', self.my_id)
+
+            if not self.count_vote(tx):
+                self.txs_double_vote.inc()
+                continue
+
+            self.add_to_mempool(tx)
+            if tx.ttl > 0:
+                tx.ttl -= 1
+                # push gossip to k random peers, the outbox packs what goes to the same peer together
+                for peer in random2.sample(peers, min(k, len(peers))):
+                    self.outbox.add(peer, tx)
 
-        if tx.sender not in self.voted.keys():
-            self.voted[tx.sender] = {}
+    @lazy_wrapper(BlockRequest)
+    async def on_block_request(self, peer: Peer, block_request: BlockRequest) -> None:
+        block_logger.info('[Node %s]: received block request with hash %s from %s',
+                          self.my_id, block_request.block_hash, self.get_peer_id(peer))
+        block = self.chain.get(block_request.block_hash)
+        if block is not None:
+            self.ez_send(peer, BlockResponse(block))
 
-        if tx.topic in self.voted[tx.sender].keys():
+    @lazy_wrapper(BlockResponse)
+    async def on_block_response(self, peer: Peer, block_response: BlockResponse) -> None:
+        block_logger.info('[Node %s]: received block response with hash %s from %s',
+                          self.my_id, block_response.block.merkle_hash, self.get_peer_id(peer))
+        block = block_response.block
+        self.requested_blocks.pop(block.merkle_hash, None)
+        if block.merkle_hash in self.partial_blocks:
+            # The fallback for a compact block we could not rebuild
+            await self.complete_compact_block(block.merkle_hash, block, fallback=False)
+            return
+        if block.merkle_hash in self.chain:
             return
 
-        self.voted[tx.sender][tx.topic] = True
-
-        if tx.topic not in self.votes.keys():
-            self.votes[tx.topic] = {}
+        if block.previous_hash not in self.chain:
+            # We are catching up, keep it until its ancestors arrive
+            self.orphans.add(block)
+            self.request_block(peer, self.orphans.root_parent(block.previous_hash))
+            return
 
-        if tx.vote not in self.votes[tx.topic].keys():
-            self.votes[tx.topic][tx.vote] = 0
+        if await self.accept_block(block):
+            await self.connect_orphans(block.merkle_hash)
 
-        self.votes[tx.topic][tx.vote] += 1
+    def request_block(self, peer: Peer, block_hash: str) -> None:
+        """
+        Ask a peer for a block, unless we already asked someone recently.
+        """
+        now = time.time()
+        if now - self.requested_blocks.get(block_hash, 0) < self.block_request_timeout:
+            return
+        if len(self.requested_blocks) > self.orphans.max_size:
+            self.requested_blocks = {requested: at for requested, at in self.requested_blocks.items()
+                                     if now - at < self.block_request_timeout}
+        self.requested_blocks[block_hash] = now
+        self.ez_send(peer, BlockRequest(block_hash))
+
+    async def connect_orphans(self, block_hash: str) -> None:
+        """
+        Attach the orphans that were waiting for a block, and then the orphans waiting for those.
+        """
+        parents = [block_hash]
+        while parents:
+            for orphan in self.orphans.pop_children(parents.pop()):
+                if await self.accept_block(orphan):
+                    parents.append(orphan.merkle_hash)
+
+    def resolve_transactions(self, block: Block) -> Tuple[List[Tuple[str, Transaction]], List[Transaction]]:
+        """
+        The (hash, transaction) pairs of a block, and the transactions among them that are not in the mempool.
+
+        Transactions in the mempool or the open block were verified when they arrived and are reused as they
+        are, the others are unpacked with the signature and public key the block carries for them.
+        """
+        resolved = []
+        unseen = []
+        for i, tx_hash in enumerate(block.tx_hashes()):
+            tx = self.mempool.get(tx_hash)
+            if tx is None:
+                tx = self.block_txs.get(tx_hash)
+            if tx is None:
+                tx = self.serializer.unpack_serializable(Transaction, block.transactions[i])[0]
+                tx.signature = block.signatures[i]
+                tx.public_key = block.public_keys[i]
+                unseen.append(tx)
+            resolved.append((tx_hash, tx))
+        return resolved, unseen
+
+    def in_ancestry(self, tx_hash: Optional[str], fork_height: int) -> bool:
+        """
+        Whether a transaction is in a block of the best chain at or below ``fork_height``.
+        """
+        location = self.tx_locations.get(tx_hash)
+        return location is not None and self.chain.height_of(location[0]) <= fork_height
+
+    def reject_block(self, reason: str, message: str) -> None:
+        self.blocks_rejected[reason].inc()
+        block_logger.info('[Node %s]: %s', self.my_id, message)
+
+    async def validate_block(self, block: Block) -> Optional[List[Tuple[str, Transaction]]]:
+        """
+        Resolve and validate the transactions of a block.
+
+        A transaction may not repeat a transaction or a vote of the block itself or of its ancestors, which are
+        the best chain up to where the block's branch forks off and the blocks of that branch. Only the
+        transactions that are not in the mempool have their signatures verified, all at once.
+        Returns the (hash, transaction) pairs of the block, or None if the block is invalid.
+        """
+        if not len(block.transactions) == len(block.signatures) == len(block.public_keys):
+            self.reject_block('malformed', 'block transactions and signatures do not match')
+            return None
+
+        resolved, unseen = self.resolve_transactions(block)
+        tree = IncrementalMerkleTree()
+        for tx_hash, _ in resolved:
+            tree.add_leaf(tx_hash)
+        if tree.get_root_hash() != block.merkle_hash:
+            self.reject_block('merkle_root', 'block merkle hash incorrect')
+            return None
+
+        # Transactions and votes of the branch between the best chain and the parent, if it is on a side branch
+        branch = self.chain.branch(block.previous_hash)
+        fork_height = self.chain.height_of(block.previous_hash) - len(branch)
+        branch_txs, votes = set(), set()
+        for branch_hash in branch:
+            for tx_hash, tx in self.resolve_transactions(self.chain.get(branch_hash))[0]:
+                branch_txs.add(tx_hash)
+                votes.add((tx.sender, tx.topic))
+
+        # A pending vote loses against a conflicting vote in a block, see connect_block
+        block_txs = set()
+        for tx_hash, tx in resolved:
+            vote = (tx.sender, tx.topic)
+            if tx_hash in block_txs:
+                self.reject_block('repeated_tx', 'block contains the same tx twice')
+                return None
+            if tx_hash in branch_txs or self.in_ancestry(tx_hash, fork_height):
+                self.reject_block('finalized_tx', 'block contains an already finalized tx')
+                return None
+            if vote in votes or self.in_ancestry(self.vote_locations.get(vote), fork_height):
+                self.reject_block('double_vote', 'block contains a double vote')
+                return None
+            block_txs.add(tx_hash)
+            votes.add(vote)
+
+        results = await asyncio.gather(*[self.verifier.verify(tx.public_key, tx.get_tx_bytes(), tx.signature)
+                                         for tx in unseen])
+        if not all(results):
+            self.reject_block('invalid_signature', 'block contains a tx with an incorrect signature')
+            return None
+
+        stats = self.block_validation_stats
+        stats['blocks'] += 1
+        stats['txs'] += len(resolved)
+        stats['mempool_hits'] += len(resolved) - len(unseen)
+        stats['verified'] += len(unseen)
+        block_logger.debug('[Node %s]: block txs validated, %d/%d taken from the mempool',
+                           self.my_id, len(resolved) - len(unseen), len(resolved))
+
+        self.cache_merkle_tree(block.get_merkle_hash(), tree)
+        return resolved
+
+    async def accept_block(self, block: Block) -> bool:
+        """
+        Validate the transactions of a block whose parent we know and add it to the chain.
+        """
+        block_hash = block.get_merkle_hash()
+        if block_hash in self.validating_blocks:
+            return False
+
+        self.validating_blocks.add(block_hash)
+        try:
+            resolved = await self.validate_block(block)
+        finally:
+            self.validating_blocks.discard(block_hash)
+        if resolved is None or not self.store_block(block, resolved):
+            return False
+        self.blocks_accepted.inc()
+        self.trace('block_accepted', 'accepted block %s', block_hash, block=block_hash,
+                   height=self.chain.height_of(block_hash), txs=len(block.transactions))
+        return True
+
+    def get_sync_status(self) -> Dict:
+        return self.sync.progress(self.chain.height)
+
+    def sync_chain(self) -> None:
+        """
+        Ask peers for the headers of blocks we miss and keep the block downloads going.
+        """
+        self.sync.expire()
+        peers = self.get_peers()
+        if not peers:
+            return
 
-        self.pending_txs[tx_hash] = tx
-        if tx.ttl > 0:
-            tx.ttl -= 1
-            # push gossip to k random peers
-            get_peers_to_distribute = random2.sample(self.get_peers(), min(k, len(self.get_peers())))
-            for peer in get_peers_to_distribute:
-                self.ez_send(peer, tx)
+        if self.sync.wants_headers(self.chain.height) or not self.sync.syncing:
+            self.request_headers(random2.sample(peers, min(self.sync_peers, len(peers))))
+        self.schedule_block_downloads()
 
-    @lazy_wrapper(BlockRequest)
-    async def on_block_request(self, peer: Peer, block_request: BlockRequest) -> None:
-        my_id = self.get_peer_id(self.my_peer)
-        logging.info(
-            f'[Node {my_id}]: received block request with hash {block_request.block_hash} from {self.get_peer_id(peer)}')
-        for block in self.blocks:
-            if block.merkle_hash == block_request.block_hash:
-                self.ez_send(peer, BlockResponse(block))
+        if self.sync.syncing:
+            status = self.get_sync_status()
+            sync_logger.info('[Node %s] syncing, at height %d of %d (%.1f%%)', self.my_id, status["height"],
+                             status["target_height"], status["progress"] * 100)
 
-    @lazy_wrapper(BlockResponse)
-    async def on_block_response(self, peer: Peer, block_response: BlockResponse) -> None:
-        my_id = self.get_peer_id(self.my_peer)
-        logging.info(
-            f'[Node {my_id}]: received block response with hash {block_response.block.merkle_hash} from {self.get_peer_id(peer)}')
-        for i, block in enumerate(self.blocks):
-            if block.merkle_hash == block_response.block.previous_hash:
-                self.blocks.insert(i + 1, block_response.block)
-                return
+    def request_headers(self, peers) -> None:
+        locator = self.chain.locator()
+        if self.sync.last_header is not None and self.sync.last_header not in self.chain:
+            locator.insert(0, self.sync.last_header)
+        self.sync.headers_requested_at = time.time()
 
-    @lazy_wrapper(BlockMessage)
-    async def receive_block(self, peer: Peer, payload: BlockMessage) -> None:
-        logging.info(f'[Node {self.get_peer_id(self.my_peer)}] ----------on block----------')
+        request = HeadersRequest([block_hash.encode() for block_hash in locator], self.sync_headers_per_request)
+        for peer in peers:
+            self.ez_send(peer, request)
 
-        # stateless check
-        my_id = self.get_peer_id(self.my_peer)
-        if not self.crypto.is_valid_signature(self.crypto.key_from_public_bin(payload.public_key),
-                                            payload.get_block_bytes(), payload.signature):
-            logging.info(f'[Node {my_id}]: block signature incorrect')
+    def schedule_block_downloads(self) -> None:
+        # Blocks that arrive before their parent wait in the orphan pool, never request more than fit in it
+        budget = self.orphans.max_size - len(self.orphans) - len(self.sync.in_flight)
+        if budget <= 0:
             return
-        logging.info(f'[Node {my_id}]: block signature correct')
-
-        if payload.block.previous_hash not in [block.get_merkle_hash() for block in self.blocks]:
-            logging.info(f'[Node {my_id}]: requesting prev block')
-            # we don't know the prev block so we should request it
-            self.ez_send(peer, BlockRequest(payload.block.previous_hash))
+        peers = [peer for peer in self.get_peers() if peer in self.sync.headers]
+        for peer, hashes in self.sync.next_requests(peers, limit=budget):
+            self.ez_send(peer, BlocksRequest([bytes.fromhex(block_hash) for block_hash in hashes]))
+
+    @lazy_wrapper(HeadersRequest)
+    async def on_headers_request(self, peer: Peer, request: HeadersRequest) -> None:
+        # Continue from the newest block of the locator that is on our best chain
+        start_hash = next((block_hash.decode() for block_hash in request.locator
+                           if self.chain.is_on_main_chain(block_hash.decode())), None)
+        if start_hash is None:
             return
 
-        # stateful check
-        # If the block is already in our chain we do nothing
-        if payload.hash in [block.get_merkle_hash() for block in self.blocks]:
-            logging.info(f'[Node {my_id}]: block already known')
+        count = min(request.max_headers, self.sync_headers_per_request)
+        hashes = self.chain.main_chain_hashes(self.chain.height_of(start_hash) + 1, count)
+        for i in range(0, max(len(hashes), 1), HEADERS_PER_MESSAGE):
+            chunk = hashes[i:i + HEADERS_PER_MESSAGE]
+            self.ez_send(peer, HeadersResponse(start_hash, [bytes.fromhex(block_hash) for block_hash in chunk],
+                                               self.chain.height))
+            if chunk:
+                start_hash = chunk[-1]
+
+    @lazy_wrapper(HeadersResponse)
+    async def on_headers_response(self, peer: Peer, response: HeadersResponse) -> None:
+        hashes = [block_hash.hex() for block_hash in response.hashes]
+        self.sync.add_headers(peer, response.start_hash, hashes, response.tip_height, self.chain.height_of,
+                              lambda block_hash: block_hash in self.chain or block_hash in self.orphans)
+
+        # The last chunk of a reply, ask the same peer for more right away if it has them
+        if len(hashes) < HEADERS_PER_MESSAGE and response.tip_height > self.sync.header_height:
+            self.request_headers([peer])
+        self.schedule_block_downloads()
+
+    @lazy_wrapper(BlocksRequest)
+    async def on_blocks_request(self, peer: Peer, request: BlocksRequest) -> None:
+        blocks = [self.chain.get(block_hash.hex()) for block_hash in request.hashes]
+        blocks = [block for block in blocks if block is not None]
+        sizes = [len(self.serializer.pack_serializable(block)) for block in blocks]
+        for group in split_by_size(blocks, sizes, overhead=2):
+            self.ez_send(peer, BlocksResponse(group))
+
+    @lazy_wrapper(BlocksResponse)
+    async def on_blocks_response(self, peer: Peer, response: BlocksResponse) -> None:
+        for block in response.blocks:
+            block_hash = block.merkle_hash
+            if block_hash not in self.sync.in_flight:
+                continue
+            self.sync.block_received(block_hash)
+            if block_hash in self.chain or block_hash in self.orphans:
+                continue
+
+            if block.previous_hash in self.chain:
+                if await self.accept_block(block):
+                    await self.connect_orphans(block_hash)
+            else:
+                # Its parent is still on its way, possibly from another peer
+                self.orphans.add(block)
+        self.schedule_block_downloads()
 
+    @lazy_wrapper(BlockMessage)
+    async def receive_block(self, peer: Peer, payload: BlockMessage) -> None:
+        if self.seen.check(payload.hash.encode() + payload.signature):
+            self.duplicate_stats['blocks'] += 1
             return
 
-        # Check block transactions and remove them from pending_txs list
-        block_transactions = [self.serializer.unpack_serializable(Transaction, tx)[0] for tx in
-                            payload.block.transactions]
+        block_logger.debug('[Node %s] ----------on block----------', self.my_id)
 
-        # TODO: We should validate transactions at this point?
-        for tx in block_transactions:
-            tx_hash = tx.get_tx_hash()
-            self.finalized_txs[tx_hash] = self.pending_txs.pop(tx_hash)
+        # Blocks we already have or hold on to as orphans were already verified
+        if payload.hash in self.chain or payload.hash in self.orphans:
+            return
 
-        self.blocks.append(payload.block)
+        received_at = time.perf_counter()
+        # stateless check
+        if not self.is_valid_block_signature(payload):
+            return
+        self.seen.add(payload.hash.encode() + payload.signature)
+        if not await self.process_block(peer, payload):
+            return
+        self.block_acceptance.observe(time.perf_counter() - received_at)
 
         if payload.ttl > 0:
             payload.ttl -= 1
@@ -260,41 +1018,172 @@ class MyCommunity(Community):
             for peer in get_peers_to_distribute:
                 self.ez_send(peer, payload)
 
+    def is_valid_block_signature(self, payload: BlockMessage) -> bool:
+        if not self.key_cache.is_valid_signature(payload.public_key, payload.get_block_bytes(), payload.signature):
+            block_logger.info('[Node %s]: block signature incorrect', self.my_id)
+            return False
+        block_logger.debug('[Node %s]: block signature correct', self.my_id)
+        return True
+
+    async def process_block(self, peer: Peer, payload: BlockMessage) -> bool:
+        """
+        Add a block with a verified signature to the chain, or to the orphan pool if its parent is missing.
+
+        Returns True if the block was added to the chain and should be passed on.
+        """
+        if payload.block.previous_hash not in self.chain:
+            block_logger.info('[Node %s]: requesting prev block', self.my_id)
+            # we don't know the prev block so we keep this one aside and request the missing ancestor
+            self.orphans.add(payload.block)
+            self.request_block(peer, self.orphans.root_parent(payload.block.previous_hash))
+            return False
+
+        # Validate the block transactions and move them from the mempool to finalized_txs
+        if not await self.accept_block(payload.block):
+            return False
+        await self.connect_orphans(payload.hash)
+        return True
+
+    @lazy_wrapper(CompactBlock)
+    async def on_compact_block(self, peer: Peer, compact: CompactBlock) -> None:
+        if self.seen.check(compact.hash.encode() + compact.signature):
+            self.duplicate_stats['blocks'] += 1
+            return
+        if compact.hash in self.chain or compact.hash in self.orphans or compact.hash in self.partial_blocks:
+            return
+
+        partial = PartialBlock(compact, mempool_index(itertools.chain(self.mempool.items(), self.block_txs.items())))
+        missing = partial.missing
+        block_logger.info('[Node %s]: compact block with %d txs, %d missing from the mempool',
+                          self.my_id, len(partial.transactions), len(missing))
+
+        self.partial_blocks[compact.hash] = (partial, peer, time.perf_counter())
+        while len(self.partial_blocks) > self.orphans.max_size:
+            self.drop_partial_block(next(iter(self.partial_blocks)))
+        if not missing:
+            await self.complete_compact_block(compact.hash)
+            return
+
+        self.ez_send(peer, BlockTransactionsRequest(compact.hash, pack_indexes(missing)))
+        self.register_task(f'compact_block_{compact.hash}', self.request_full_block, compact.hash,
+                           delay=self.compact_block_timeout)
+
+    def request_full_block(self, block_hash: str) -> None:
+        if block_hash in self.partial_blocks:
+            self.request_block(self.partial_blocks[block_hash][1], block_hash)
+
+    def drop_partial_block(self, block_hash: str) -> None:
+        self.partial_blocks.pop(block_hash, None)
+        self.cancel_pending_task(f'compact_block_{block_hash}')
+
+    @lazy_wrapper(BlockTransactionsRequest)
+    async def on_block_transactions_request(self, peer: Peer, request: BlockTransactionsRequest) -> None:
+        block = self.chain.get(request.hash)
+        if block is None:
+            return
+        txs = block_transactions(block, unpack_indexes(request.indexes))
+        overhead = BATCH_OVERHEAD + len(request.hash) + 2
+        for group in split_by_size(txs, [tx.get_size() + BATCH_ITEM_OVERHEAD for tx in txs], overhead=overhead):
+            self.ez_send(peer, BlockTransactionsResponse(request.hash, group))
+
+    @lazy_wrapper(BlockTransactionsResponse)
+    async def on_block_transactions_response(self, peer: Peer, response: BlockTransactionsResponse) -> None:
+        entry = self.partial_blocks.get(response.hash)
+        if entry is None:
+            return
+        partial = entry[0]
+        partial.fill(response.transactions)
+        if not partial.missing:
+            await self.complete_compact_block(response.hash)
+
+    async def complete_compact_block(self, block_hash: str, block: Block = None, fallback: bool = True) -> None:
+        """
+        Check and add a compact block once all its transactions are known, then pass the compact block on.
+
+        If the rebuilt block does not match the signature, some short id matched the wrong transaction and the
+        full block is requested instead. ``block`` is that full block, if it came in.
+        """
+        partial, peer, received_at = self.partial_blocks[block_hash]
+        compact = partial.compact
+        payload = BlockMessage(block_hash, partial.to_block() if block is None else block, compact.ttl,
+                               compact.signature, compact.public_key)
+        if not self.is_valid_block_signature(payload):
+            if fallback:
+                self.cancel_pending_task(f'compact_block_{block_hash}')
+                self.request_block(peer, block_hash)
+            else:
+                self.drop_partial_block(block_hash)
+            return
+
+        self.drop_partial_block(block_hash)
+        self.seen.add(compact.hash.encode() + compact.signature)
+        if not await self.process_block(peer, payload):
+            return
+        self.block_acceptance.observe(time.perf_counter() - received_at)
+
+        if compact.ttl > 0:
+            compact.ttl -= 1
+            for peer in random2.sample(self.get_peers(), min(k, len(self.get_peers()))):
+                self.ez_send(peer, compact)
+
     def finalize_and_broadcast_block(self):
         self.current_block.update_tree()
         new_block_hash = self.current_block.get_merkle_hash()
         # logging.info(f'New block hash: {new_block_hash}')
-        # self.blocks.append(self.current_block)
+        # Normally every tx is in block_txs, the block itself covers txs that were added to it directly
+        self.store_block(self.current_block, self.resolve_transactions(self.current_block)[0])
+        self.trace('block_sealed', 'sealed block %s', new_block_hash, block=new_block_hash,
+                   height=self.chain.height, txs=len(self.current_block.transactions))
 
         self.broadcast_block(new_block_hash, self.current_block)
         self.current_block = Block(new_block_hash)
 
     def broadcast_block(self, block_hash: str, block: Block):
         blockMessage = BlockMessage(block_hash, block)
-        blockMessage.public_key = self.crypto.key_to_bin(self.my_peer.key.pub())
+        blockMessage.public_key = self.my_public_key_bin
         # should we sigh the hash of tx or the whole tx?
         blockMessage.signature = self.crypto.create_signature(self.my_peer.key, blockMessage.get_block_bytes())
 
+        if self.compact_blocks:
+            # Peers rebuild the block from their mempool, the signature still covers the full block
+            blockMessage = CompactBlock(block.previous_hash, block_hash, compact_ids(block),
+                                        signature=blockMessage.signature, public_key=blockMessage.public_key)
+
         for peer in self.get_peers():
             self.ez_send(peer, blockMessage)
 
-    def send_peers(self) -> None:
+    def add_member(self, mid: bytes) -> bool:
+        # The only place members are added, which keeps the leader schedule in step with the membership
+        if len(mid) != len(self.my_peer.mid) or not self.membership.add(mid):
+            return False
+        self.leaders.add_member(mid)
+        return True
+
+    def exchange_membership(self) -> None:
+        """
+        Start an anti-entropy round: send our membership digest to a random peer.
+        """
         peers = self.get_peers()
-        peerMessage = PeersMessage(self.my_peer.mid)
-
         for peer in peers:
-            self.ez_send(peer, peerMessage)
-
-    @lazy_wrapper(PeersMessage)
-    def receive_peers(self, peer: Peer, payload: PeersMessage) -> None:
-        if payload.mid not in self.known_peers_mid:
-
-            self.known_peers_mid.add(payload.mid)
-
-            self.known_peers_mid = set(sorted(list(self.known_peers_mid)))
-
-            peers = self.get_peers()
-            peerMessage = PeersMessage(payload.mid, payload.ttl - 1)
-
-            for peer in peers:
-                self.ez_send(peer, peerMessage)
\ No newline at end of file
+            self.add_member(peer.mid)
+        if peers:
+            self.ez_send(random2.choice(peers), MembershipDigest(self.membership.digest()))
+
+    @lazy_wrapper(MembershipDigest)
+    async def on_membership_digest(self, peer: Peer, payload: MembershipDigest) -> None:
+        self.add_member(peer.mid)
+        for update in self.membership.bucket_updates(self.membership.differing_buckets(payload.digests)):
+            self.ez_send(peer, update)
+
+    @lazy_wrapper(MembershipBuckets)
+    async def on_membership_buckets(self, peer: Peer, payload: MembershipBuckets) -> None:
+        missing = self.membership.missing_from(payload.buckets, payload.members)
+        for member in payload.members:
+            self.add_member(member)
+        for chunk in split_by_size(missing, [len(member) + 2 for member in missing], overhead=2):
+            self.ez_send(peer, MembershipMembers(chunk))
+
+    @lazy_wrapper(MembershipMembers)
+    async def on_membership_members(self, peer: Peer, payload: MembershipMembers) -> None:
+        for member in payload.members:
+            self.add_member(member)
@@ -0,0 +1,151 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from block import Block
+
+GENESIS_HASH = '0'
+
+
+class ChainStore:
+    """
+    Block storage indexed by merkle hash.
+
+    Every known block is kept in a hash -> (block, height) index so lookups and parent checks are O(1).
+    The best chain is kept as a list of hashes by height, which makes the tip and height lookups O(1) as well.
+    The genesis block is virtual: it has hash '0' and height -1, so the first real block has height 0.
+    """
+
+    def __init__(self):
+        self._index: Dict[str, Tuple[Block, int]] = {}
+        self._main: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, block_hash: str) -> bool:
+        return block_hash == GENESIS_HASH or block_hash in self._index
+
+    def __iter__(self) -> Iterator[Block]:
+        return iter(self.blocks)
+
+    @property
+    def blocks(self) -> List[Block]:
+        return [self._index[block_hash][0] for block_hash in self._main]
+
+    @property
+    def height(self) -> int:
+        """
+        Height of the tip, -1 when the chain only holds genesis.
+        """
+        return len(self._main) - 1
+
+    @property
+    def tip_hash(self) -> str:
+        return self._main[-1] if self._main else GENESIS_HASH
+
+    @property
+    def tip(self) -> Optional[Block]:
+        return self._index[self._main[-1]][0] if self._main else None
+
+    def get(self, block_hash: str) -> Optional[Block]:
+        entry = self._index.get(block_hash)
+        return entry[0] if entry else None
+
+    def height_of(self, block_hash: str) -> Optional[int]:
+        if block_hash == GENESIS_HASH:
+            return -1
+        entry = self._index.get(block_hash)
+        return entry[1] if entry else None
+
+    def get_parent(self, block: Block) -> Optional[Block]:
+        return self.get(block.previous_hash)
+
+    def block_at(self, height: int) -> Optional[Block]:
+        """
+        Block of the best chain at the given height.
+        """
+        if 0 <= height < len(self._main):
+            return self._index[self._main[height]][0]
+        return None
+
+    def hash_at(self, height: int) -> str:
+        """
+        Hash of the best chain block at the given height, genesis below height 0.
+        """
+        return self._main[height] if 0 <= height < len(self._main) else GENESIS_HASH
+
+    def main_chain_hashes(self, start_height: int, count: int) -> List[str]:
+        """
+        Hashes of up to count blocks of the best chain, starting at the given height.
+        """
+        return self._main[max(start_height, 0):max(start_height, 0) + count]
+
+    def is_on_main_chain(self, block_hash: str) -> bool:
+        height = self.height_of(block_hash)
+        return height is not None and (height == -1 or self._main[height] == block_hash)
+
+    def branch(self, block_hash: str) -> List[str]:
+        """
+        Hashes of a known block and its ancestors that are not on the best chain, newest first.
+
+        The parent of the last one is where the branch forks off the best chain, empty if the block is on it.
+        """
+        hashes = []
+        while not self.is_on_main_chain(block_hash):
+            hashes.append(block_hash)
+            block_hash = self._index[block_hash][0].previous_hash
+        return hashes
+
+    def locator(self) -> List[str]:
+        """
+        Hashes of the best chain going back from the tip in growing steps, ending with genesis.
+
+        A peer can find the last block we have in common with it from this in O(log n) hashes.
+        """
+        hashes = []
+        height = self.height
+        step = 1
+        while height >= 0:
+            hashes.append(self._main[height])
+            if len(hashes) >= 10:
+                step *= 2
+            height -= step
+        hashes.append(GENESIS_HASH)
+        return hashes
+
+    def has_parent(self, block: Block) -> bool:
+        return block.previous_hash in self
+
+    def add(self, block: Block) -> bool:
+        """
+        Add a block whose parent is already known.
+
+        Returns False if the block is already stored or its parent is unknown.
+        If the block makes a side branch longer than the best chain, the best chain is switched to that branch.
+        """
+        block_hash = block.get_merkle_hash()
+        if block_hash in self._index:
+            return False
+
+        parent_height = self.height_of(block.previous_hash)
+        if parent_height is None:
+            return False
+
+        height = parent_height + 1
+        self._index[block_hash] = (block, height)
+
+        if block.previous_hash == self.tip_hash:
+            self._main.append(block_hash)
+        elif height > self.height:
+            self._reorganize(block_hash, height)
+        return True
+
+    def _reorganize(self, block_hash: str, height: int) -> None:
+        # Walk back from the new tip until we meet the best chain, then splice the branch in
+        branch = []
+        while block_hash != GENESIS_HASH and (height >= len(self._main) or self._main[height] != block_hash):
+            branch.append(block_hash)
+            block_hash = self._index[block_hash][0].previous_hash
+            height -= 1
+
+        del self._main[height + 1:]
+        self._main.extend(reversed(branch))
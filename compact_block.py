@@ -0,0 +1,108 @@
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ipv8.messaging.payload_dataclass import dataclass
+from ipv8.messaging.serialization import default_serializer
+
+from block import Block
+from transaction import Transaction
+
+# Bytes of a transaction hash that identify it in a compact block
+SHORT_ID_SIZE = 6
+INDEX = struct.Struct('>H')
+
+
+@dataclass(msg_id=11)
+class CompactBlock:
+    """
+    A block announced by the short ids of its transactions, signed like the full ``BlockMessage``.
+    """
+    previous_hash: str
+    hash: str
+    short_ids: bytes  # SHORT_ID_SIZE bytes per transaction, in block order
+    ttl: int = 3
+    signature: bytes = b''
+    public_key: bytes = b''
+
+
+@dataclass(msg_id=12)
+class BlockTransactionsRequest:
+    hash: str
+    indexes: bytes  # INDEX per transaction we are missing
+
+
+@dataclass(msg_id=13)
+class BlockTransactionsResponse:
+    hash: str
+    transactions: List[Transaction]
+
+
+def short_id(tx_hash: str) -> bytes:
+    return bytes.fromhex(tx_hash[:2 * SHORT_ID_SIZE])
+
+
+def compact_ids(block: Block) -> bytes:
+    return b''.join(short_id(tx_hash) for tx_hash in block.tx_hashes())
+
+
+def mempool_index(txs: Iterable[Tuple[str, Transaction]]) -> Dict[bytes, Optional[Transaction]]:
+    """
+    Map the short ids of (tx hash, transaction) pairs to their transactions, colliding short ids map to None.
+    """
+    index = {}
+    for tx_hash, tx in txs:
+        sid = short_id(tx_hash)
+        index[sid] = None if sid in index else tx
+    return index
+
+
+def pack_indexes(indexes: List[int]) -> bytes:
+    return b''.join(INDEX.pack(index) for index in indexes)
+
+
+def unpack_indexes(data: bytes) -> List[int]:
+    return [index for index, in INDEX.iter_unpack(data[:len(data) - len(data) % INDEX.size])]
+
+
+def block_transactions(block: Block, indexes: List[int]) -> List[Transaction]:
+    """
+    The transactions of a block at the given indexes, with their signature and public key.
+    """
+    txs = []
+    for index in indexes:
+        if 0 <= index < len(block.transactions):
+            tx = default_serializer.unpack_serializable(Transaction, block.transactions[index])[0]
+            tx.signature = block.signatures[index]
+            tx.public_key = block.public_keys[index]
+            txs.append(tx)
+    return txs
+
+
+class PartialBlock:
+    """
+    A compact block that is being filled in with transactions from the mempool and from the sender.
+    """
+
+    def __init__(self, compact: CompactBlock, mempool: Dict[bytes, Optional[Transaction]]):
+        self.compact = compact
+        ids = compact.short_ids
+        self.short_ids = [ids[i:i + SHORT_ID_SIZE] for i in range(0, len(ids) - len(ids) % SHORT_ID_SIZE,
+                                                                 SHORT_ID_SIZE)]
+        # A short id that matches two mempool transactions maps to None and is asked for like a missing one
+        self.transactions: List[Optional[Transaction]] = [mempool.get(sid) for sid in self.short_ids]
+
+    @property
+    def missing(self) -> List[int]:
+        return [i for i, tx in enumerate(self.transactions) if tx is None]
+
+    def fill(self, txs: List[Transaction]) -> None:
+        by_id = {short_id(tx.get_tx_hash()): tx for tx in txs}
+        for i, tx in enumerate(self.transactions):
+            if tx is None:
+                self.transactions[i] = by_id.get(self.short_ids[i])
+
+    def to_block(self) -> Block:
+        block = Block(self.compact.previous_hash, self.compact.hash)
+        for tx in self.transactions:
+            block.add_transaction(tx)
+        return block
@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.keyvault.keys import PublicKey
+
+
+class KeyCache:
+    """
+    Bounded LRU cache of parsed public keys, keyed by their binary encoding.
+
+    Parsing a public key is a large part of a signature check and the same voter keys arrive over and
+    over, so every verify site looks keys up here instead of calling ``key_from_public_bin``.
+    The cache is shared with the verification threads, hence the lock.
+    """
+
+    def __init__(self, maxsize: int = 4096, crypto=default_eccrypto):
+        self.maxsize = maxsize
+        self.crypto = crypto
+        self.hits = 0
+        self.misses = 0
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, public_key: bytes) -> PublicKey:
+        with self._lock:
+            key = self._keys.get(public_key)
+            if key is not None:
+                self._keys.move_to_end(public_key)
+                self.hits += 1
+                return key
+
+        # Parse outside of the lock, two threads parsing the same key at once is harmless
+        key = self.crypto.key_from_public_bin(public_key)
+        with self._lock:
+            self.misses += 1
+            self._keys[public_key] = key
+            if len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+        return key
+
+    def is_valid_signature(self, public_key: bytes, message: bytes, signature: bytes) -> bool:
+        try:
+            key = self.get(public_key)
+        except Exception:
+            return False
+        return self.crypto.is_valid_signature(key, message, signature)
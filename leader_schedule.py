@@ -0,0 +1,77 @@
+from bisect import bisect_left, insort
+from hashlib import sha256
+from typing import Callable, List, Optional, Tuple
+
+
+class LeaderSchedule:
+    """
+    Deterministic block leaders, computed one epoch of ``epoch_length`` heights at a time.
+
+    The leader of every height in an epoch is drawn from the sorted membership with a seed made of the
+    hashes of the last ``seed_blocks`` blocks before the epoch (genesis for the first epoch), so every node
+    with the same chain and membership picks the same leaders.
+    A schedule is computed once per epoch and kept until the membership or the seed blocks change,
+    after which ``leader_for`` is a list lookup.
+
+    Members are never dropped for being unreachable, connectivity differs between nodes. Instead a height whose
+    leader does not seal passes to the next member in sorted order on every further ``attempt``, see
+    ``MyCommunitySettings.leader_timeout``.
+
+    ``members`` is a sorted copy of ``MyCommunity.membership`` for the draws. Both only grow, and
+    ``MyCommunity.add_member`` is the one place that adds to them, so they hold the same members.
+    """
+
+    def __init__(self, epoch_length: int = 100, seed_blocks: int = 3):
+        self.epoch_length = epoch_length
+        self.seed_blocks = seed_blocks
+        self.members: List[bytes] = []  # sorted
+        self.rebuilds = 0
+        self._key: Optional[Tuple[int, str]] = None  # epoch and last block hash before it
+        self._leaders: List[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, member: bytes) -> bool:
+        i = bisect_left(self.members, member)
+        return i < len(self.members) and self.members[i] == member
+
+    def add_member(self, member: bytes) -> bool:
+        if member in self:
+            return False
+        insort(self.members, member)
+        self._key = None
+        return True
+
+    def seed(self, epoch: int, hash_at: Callable[[int], str]) -> bytes:
+        start = epoch * self.epoch_length
+        hashes = [hash_at(height) for height in range(start - 1, max(start - 1 - self.seed_blocks, -2), -1)]
+        return sha256(epoch.to_bytes(8, 'big') + ''.join(hashes).encode()).digest()
+
+    def leader_for(self, height: int, hash_at: Callable[[int], str], attempt: int = 0) -> Optional[bytes]:
+        """
+        The member that seals the block at the given height.
+
+        ``hash_at`` gives the hash of the best chain block at a height, see ``ChainStore.hash_at``.
+        ``attempt`` counts the leaders of the height that did not seal before, so every member gets a turn.
+        """
+        if not self.members:
+            return None
+
+        epoch = height // self.epoch_length
+        key = (epoch, hash_at(epoch * self.epoch_length - 1))
+        if key != self._key:
+            self._rebuild(epoch, hash_at)
+            self._key = key
+        leader = self._leaders[height % self.epoch_length]
+        if attempt:
+            leader = self.members[(bisect_left(self.members, leader) + attempt) % len(self.members)]
+        return leader
+
+    def _rebuild(self, epoch: int, hash_at: Callable[[int], str]) -> None:
+        seed = self.seed(epoch, hash_at)
+        self._leaders = []
+        for i in range(self.epoch_length):
+            draw = int.from_bytes(sha256(seed + i.to_bytes(4, 'big')).digest()[:8], 'big')
+            self._leaders.append(self.members[draw % len(self.members)])
+        self.rebuilds += 1
@@ -0,0 +1,246 @@
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+except ImportError:
+    pa = pa_json = None
+
+# Fields of the trace events, see MyCommunity.trace
+EVENT_COLUMNS = ['time', 'event', 'node', 'tx', 'block', 'peer', 'height', 'txs']
+EVENT_SCHEMA = pa and pa.schema([('time', pa.float64()), ('event', pa.string()), ('node', pa.string()),
+                                 ('tx', pa.string()), ('block', pa.string()), ('peer', pa.string()),
+                                 ('height', pa.int64()), ('txs', pa.int64())])
+EVENT_MARKER = b'"event": "'
+CHUNK_BYTES = 4 * 1024 * 1024
+PART_BYTES = 256 * 1024 * 1024
+# Partial aggregates are merged once they hold this many rows, and twice as many as after the last merge, which
+# bounds the memory of a run to the transactions and blocks it saw instead of the events it read
+COMPACT_ROWS = 1_000_000
+
+TX_AGGREGATES = {'created': 'min', 'first': 'min', 'last': 'max', 'receipts': 'sum'}
+BLOCK_AGGREGATES = {'sealed': 'min', 'first': 'min', 'last': 'max', 'accepts': 'sum', 'txs': 'max'}
+NODE_AGGREGATES = {'tx_created': 'sum', 'tx_received': 'sum', 'block_sealed': 'sum', 'block_accepted': 'sum',
+                   'start': 'min', 'end': 'max'}
+WINDOW_AGGREGATES = {'created': 'sum', 'received': 'sum', 'committed': 'sum'}
+
+
+def split_file(path: str, part_bytes: int = PART_BYTES) -> List[Tuple[str, int, int]]:
+    """
+    Byte ranges of about ``part_bytes`` that cover a file, each starting and ending at a line boundary.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        while bounds[-1] + part_bytes < size:
+            f.seek(bounds[-1] + part_bytes)
+            f.readline()
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(path, start, end) for start, end in zip(bounds, bounds[1:])]
+
+
+def parse_events(data: bytes, use_arrow: bool = True) -> pd.DataFrame:
+    """
+    The trace events in some lines of a JSON log.
+
+    pyarrow, when it is installed, parses the lines straight into columns and skips the fields the analysis
+    does not use, which is about three times as fast as ``json.loads`` per line.
+    """
+    if use_arrow and pa_json is not None:
+        options = pa_json.ParseOptions(explicit_schema=EVENT_SCHEMA, unexpected_field_behavior='ignore')
+        events = pa_json.read_json(io.BytesIO(data), parse_options=options).to_pandas()
+        return events[events['event'].notna()].reset_index(drop=True)
+    loads = json.loads
+    records = [loads(line) for line in data.splitlines() if EVENT_MARKER in line]
+    return pd.DataFrame.from_records(records, columns=EVENT_COLUMNS)
+
+
+def read_events(path: str, start: int = 0, end: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES,
+                use_arrow: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Trace events between two line boundaries of a JSON log, as frames of about ``chunk_bytes`` of log each.
+    """
+    if end is None:
+        end = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            data = f.read(min(chunk_bytes, end - position))
+            if not data:
+                break
+            if not data.endswith(b'\n'):
+                data += f.readline()
+            position += len(data)
+            events = parse_events(data, use_arrow)
+            if len(events):
+                yield events
+
+
+def hash_ids(ids: pd.Series) -> np.ndarray:
+    """
+    64 bit keys for hex ids, a quarter of the memory of the strings and much faster to group by.
+    """
+    return pd.util.hash_array(ids.to_numpy(dtype=object))
+
+
+class LogStats:
+    """
+    Aggregates of trace events, built one frame at a time and mergeable with the aggregates of other parts.
+
+    Per transaction (keyed by a hash of its id) the time it was created, and the first and last time a node
+    received it. Per block when it was sealed and first and last accepted. Per node how many events of each
+    kind it logged, and per window of ``window`` seconds how many transactions were created, received and
+    committed in sealed blocks. Memory grows with the number of transactions, not with the size of the logs.
+    """
+
+    def __init__(self, window: float = 1.0, compact_rows: int = COMPACT_ROWS):
+        self.window = window
+        self.compact_rows = compact_rows
+        self._parts: Dict[str, List[pd.DataFrame]] = {'txs': [], 'blocks': [], 'nodes': [], 'windows': []}
+        self._rows = 0
+        self._compacted_rows = 0
+
+    def add(self, events: pd.DataFrame) -> None:
+        event = events['event']
+        time = events['time'].astype('float64')
+        created, received = event == 'tx_created', event == 'tx_received'
+        sealed, accepted = event == 'block_sealed', event == 'block_accepted'
+        txs = pd.to_numeric(events['txs'], errors='coerce').fillna(0)
+
+        is_tx = created | received
+        if is_tx.any():
+            self._add('txs', pd.DataFrame({'created': time.where(created), 'first': time.where(received),
+                                           'last': time.where(received), 'receipts': received.astype('int64')}
+                                          )[is_tx].groupby(hash_ids(events['tx'][is_tx])).agg(TX_AGGREGATES))
+
+        is_block = sealed | accepted
+        if is_block.any():
+            self._add('blocks', pd.DataFrame({'sealed': time.where(sealed), 'first': time.where(accepted),
+                                              'last': time.where(accepted), 'accepts': accepted.astype('int64'),
+                                              'txs': txs}
+                                             )[is_block].groupby(hash_ids(events['block'][is_block]))
+                      .agg(BLOCK_AGGREGATES))
+
+        nodes = pd.get_dummies(event).reindex(columns=['tx_created', 'tx_received', 'block_sealed',
+                                                       'block_accepted'], fill_value=0).astype('int64')
+        nodes['start'] = nodes['end'] = time
+        self._add('nodes', nodes.groupby(events['node'].to_numpy()).agg(NODE_AGGREGATES))
+
+        windows = pd.DataFrame({'created': created.astype('int64'), 'received': received.astype('int64'),
+                                'committed': txs.where(sealed, 0).astype('int64')})
+        self._add('windows', windows.groupby(np.floor_divide(time.to_numpy(), self.window).astype('int64'))
+                  .sum())
+
+    def _add(self, kind: str, frame: pd.DataFrame) -> None:
+        self._parts[kind].append(frame)
+        self._rows += len(frame)
+        if self._rows > max(self.compact_rows, 2 * self._compacted_rows):
+            self.compact()
+
+    def merge(self, other: 'LogStats') -> None:
+        for kind, parts in other._parts.items():
+            for part in parts:
+                self._add(kind, part)
+
+    def compact(self) -> None:
+        """
+        Merge the partial aggregates of each kind into one.
+        """
+        for kind, aggregates in (('txs', TX_AGGREGATES), ('blocks', BLOCK_AGGREGATES),
+                                 ('nodes', NODE_AGGREGATES), ('windows', WINDOW_AGGREGATES)):
+            parts = self._parts[kind]
+            if len(parts) > 1:
+                self._parts[kind] = [pd.concat(parts).groupby(level=0).agg(aggregates)]
+        self._rows = self._compacted_rows = sum(len(part) for parts in self._parts.values() for part in parts)
+
+    def _frame(self, kind: str, aggregates: Dict[str, str]) -> pd.DataFrame:
+        self.compact()
+        parts = self._parts[kind]
+        return parts[0] if parts else pd.DataFrame(columns=list(aggregates))
+
+    @property
+    def txs(self) -> pd.DataFrame:
+        return self._frame('txs', TX_AGGREGATES)
+
+    @property
+    def blocks(self) -> pd.DataFrame:
+        return self._frame('blocks', BLOCK_AGGREGATES)
+
+    def latencies(self) -> Dict[str, np.ndarray]:
+        """
+        Seconds until a transaction reached the first and the last other node, counted from its creation,
+        or from its first receipt if the log of its creator is missing. Also the seconds until a sealed
+        block was accepted by every node that accepted it.
+        """
+        txs, blocks = self.txs.astype('float64'), self.blocks.astype('float64')
+        return {'first': (txs['first'] - txs['created']).dropna().to_numpy(),
+                'all': (txs['last'] - txs['created'].fillna(txs['first'])).dropna().to_numpy(),
+                'block': (blocks['last'] - blocks['sealed']).dropna().to_numpy()}
+
+    def throughput(self) -> pd.DataFrame:
+        """
+        Transactions per second created, received and committed, per window since the first one.
+        """
+        windows = self._frame('windows', WINDOW_AGGREGATES).sort_index()
+        if windows.empty:
+            return windows.astype('float64')
+        windows = windows.reindex(range(windows.index[0], windows.index[-1] + 1), fill_value=0)
+        windows.index = (windows.index - windows.index[0]) * self.window
+        windows.index.name = 'seconds'
+        return windows / self.window
+
+    def nodes(self) -> pd.DataFrame:
+        """
+        Events per node, with the rate of transactions it received while it was logging.
+        """
+        nodes = self._frame('nodes', NODE_AGGREGATES)
+        nodes = nodes.assign(received_per_second=nodes['tx_received'] / (nodes['end'] - nodes['start']))
+        return nodes.drop(columns=['start', 'end'])
+
+
+def percentiles(values: np.ndarray, points: Iterable[float] = (50, 90, 99)) -> Dict[str, float]:
+    if not len(values):
+        return {}
+    stats = {f'p{point:g}': float(value) for point, value in zip(points, np.percentile(values, list(points)))}
+    stats['max'] = float(values.max())
+    return stats
+
+
+def analyze_part(part: Tuple[str, int, int], window: float, chunk_bytes: int) -> LogStats:
+    stats = LogStats(window)
+    for events in read_events(*part, chunk_bytes=chunk_bytes):
+        stats.add(events)
+    stats.compact()
+    return stats
+
+
+def analyze(paths: Iterable[str], window: float = 1.0, workers: Optional[int] = None,
+            chunk_bytes: int = CHUNK_BYTES, part_bytes: int = PART_BYTES) -> LogStats:
+    """
+    Aggregate the trace events of any number of logs, for example one per node.
+
+    Logs are split in parts of about ``part_bytes`` that ``workers`` processes read ``chunk_bytes`` at a time,
+    by default one process per CPU. With one worker everything is read in this process.
+    """
+    parts = [part for path in paths for part in split_file(path, part_bytes)]
+    stats = LogStats(window)
+    if workers == 1 or len(parts) <= 1:
+        for part in parts:
+            stats.merge(analyze_part(part, window, chunk_bytes))
+        return stats
+
+    with ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(parts))) as executor:
+        for future in as_completed([executor.submit(analyze_part, part, window, chunk_bytes) for part in parts]):
+            stats.merge(future.result())
+    return stats
@@ -0,0 +1,128 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Dict, Optional
+
+# Attributes every LogRecord has, anything else on a record was passed in ``extra``
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record with the time, level, logger, message and the ``extra`` fields of the record.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': record.created, 'level': record.levelname, 'logger': record.name,
+                 'message': record.getMessage()}
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue as they are, the listener thread formats their message.
+
+    The stock QueueHandler formats every record before queueing it, which would keep that work on the
+    event loop. The arguments of a record must not change after it is logged, which holds for the
+    strings and numbers the node logs.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Putting a record on a queue is thread safe, so skip the handler lock and the emit wrapper
+        rv = self.filter(record)
+        if rv:
+            self.enqueue(record)
+        return rv
+
+
+class LogListener(logging.handlers.QueueListener):
+    """
+    QueueListener that knows whether it is running, so stopping it twice is harmless.
+    """
+
+    running = False
+
+    def start(self) -> None:
+        super().start()
+        self.running = True
+
+    def stop(self) -> None:
+        if self.running:
+            self.running = False
+            super().stop()
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """
+    Levels per logger from a spec like ``voting=WARNING,voting.trace=INFO``.
+    """
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(logfile: Optional[str] = 'logfile.log', level: str = 'INFO',
+                  levels: Optional[Dict[str, str]] = None, console: bool = True,
+                  process_info: bool = False, skip_source_lookup: bool = False) -> LogListener:
+    """
+    Log through a queue to a thread that writes JSON lines to ``logfile`` and plain text to the console.
+
+    ``levels`` sets the level of single subsystems, on top of ``level`` for the rest. The ``VOTING_LOG_LEVELS``
+    environment variable overrides both, with the format of ``parse_levels``. Set ``voting`` to WARNING and
+    ``voting.trace`` to INFO to keep only the trace events the metrics scripts read.
+    Records leave out the thread and process they were logged from unless ``process_info`` is set, neither
+    output shows them. This sets ``logging.logThreads``, ``logProcesses`` and ``logMultiprocessing``, which
+    hold for every logger in the process.
+    ``skip_source_lookup`` also stops records from looking up the file and line they were logged from, which is
+    most of the cost of a log call. It does so through ``logging._srcfile``, an undocumented CPython internal,
+    and also for every logger in the process, so it is off unless asked for.
+    """
+    if not process_info:
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+    if skip_source_lookup:
+        logging._srcfile = None
+
+    handlers = []
+    if logfile:
+        file_handler = logging.FileHandler(logfile, mode='w')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        handlers.append(console_handler)
+
+    records = queue.SimpleQueue()
+    listener = LogListener(records, *handlers, respect_handler_level=True)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(records))
+    root.setLevel(level)
+
+    levels = {**(levels or {}), **parse_levels(os.environ.get('VOTING_LOG_LEVELS', ''))}
+    for name, subsystem_level in levels.items():
+        logging.getLogger(name).setLevel(subsystem_level)
+
+    listener.start()
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener: LogListener) -> None:
+    """
+    Write out the queued records, unless the listener was stopped already.
+    """
+    listener.stop()
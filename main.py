@@ -5,9 +5,10 @@ from ipv8_service import IPv8
 from ipv8.util import run_forever
 
 from blockchain import MyCommunity
+from log_setup import setup_logging
 
 async def start_communities() -> None:
-    # We create 7 peers
+    # We create 2 peers
     for i in range(1, 3):
         builder = ConfigBuilder().clear_keys().clear_overlays()
         builder.add_key("my peer", "medium", f"ec{i}.pem")
@@ -20,4 +21,5 @@ async def start_communities() -> None:
     await run_forever()
 
 
+setup_logging()
 run(start_communities())
\ No newline at end of file
@@ -0,0 +1,107 @@
+import struct
+from hashlib import sha256
+from typing import Iterable, Iterator, List, Set
+
+from ipv8.messaging.payload_dataclass import dataclass, type_from_format
+
+from packing import split_by_size
+
+BUCKET_DIGEST = struct.Struct('>Q')
+
+
+@dataclass(msg_id=14)
+class MembershipDigest:
+    digests: bytes  # BUCKET_DIGEST per bucket
+
+
+@dataclass(msg_id=15)
+class MembershipBuckets:
+    buckets: bytes  # one byte per bucket id
+    members: type_from_format('varlenH-list')  # every member the sender knows in those buckets
+
+
+@dataclass(msg_id=16)
+class MembershipMembers:
+    members: type_from_format('varlenH-list')
+
+
+class Membership:
+    """
+    Set of known member ids that can be reconciled with a peer by exchanging digests.
+
+    Members are spread over ``buckets`` buckets by their hash, and every bucket keeps the XOR of the hashes
+    of its members, so adding a member updates its bucket digest in O(1).
+    One anti-entropy exchange with a peer goes:
+
+    1. we send our bucket digests (``MembershipDigest``),
+    2. the peer sends back all its members in the buckets whose digest differs (``MembershipBuckets``),
+    3. we add those and send back only our members in those buckets that the peer lacks (``MembershipMembers``).
+
+    When both sides already agree the exchange ends after the first message.
+    """
+
+    def __init__(self, buckets: int = 64):
+        if not 0 < buckets <= 256:
+            raise ValueError('the number of buckets must be between 1 and 256')
+        self.members: Set[bytes] = set()
+        self._buckets: List[Set[bytes]] = [set() for _ in range(buckets)]
+        self._digests: List[int] = [0] * buckets
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, member: bytes) -> bool:
+        return member in self.members
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self.members)
+
+    def _hash(self, member: bytes) -> int:
+        return BUCKET_DIGEST.unpack_from(sha256(member).digest())[0]
+
+    def bucket_of(self, member: bytes) -> int:
+        return self._hash(member) % len(self._buckets)
+
+    def add(self, member: bytes) -> bool:
+        if member in self.members:
+            return False
+        member_hash = self._hash(member)
+        bucket = member_hash % len(self._buckets)
+        self.members.add(member)
+        self._buckets[bucket].add(member)
+        self._digests[bucket] ^= member_hash
+        return True
+
+    def digest(self) -> bytes:
+        return b''.join(BUCKET_DIGEST.pack(digest) for digest in self._digests)
+
+    def differing_buckets(self, digest: bytes) -> List[int]:
+        """
+        Buckets in which the digest of a peer differs from ours.
+        """
+        if len(digest) != BUCKET_DIGEST.size * len(self._buckets):
+            return list(range(len(self._buckets)))
+        return [bucket for bucket, (theirs,) in enumerate(BUCKET_DIGEST.iter_unpack(digest))
+                if theirs != self._digests[bucket]]
+
+    def bucket_members(self, bucket: int) -> List[bytes]:
+        return list(self._buckets[bucket])
+
+    def bucket_updates(self, buckets: Iterable[int]) -> Iterator['MembershipBuckets']:
+        """
+        Our members in the given buckets, split over as many messages as it takes to fit their size and
+        member count. A bucket split over two messages makes the peer send back members we already have.
+        """
+        entries = [(bucket, member) for bucket in buckets for member in (self._buckets[bucket] or [None])]
+        sizes = [1 if member is None else len(member) + 3 for _, member in entries]
+        for chunk in split_by_size(entries, sizes, overhead=4):
+            yield MembershipBuckets(bytes(dict.fromkeys(bucket for bucket, _ in chunk)),
+                                    [member for _, member in chunk if member is not None])
+
+    def missing_from(self, buckets: Iterable[int], members: Iterable[bytes]) -> List[bytes]:
+        """
+        Our members in the given buckets that are not among the members a peer has there.
+        """
+        theirs = set(members)
+        return [member for bucket in buckets if 0 <= bucket < len(self._buckets)
+                for member in self._buckets[bucket] if member not in theirs]
@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from transaction import Transaction
+
+
+class Mempool:
+    """
+    Bounded pool of verified transactions that are not in a block yet, in arrival order.
+
+    Transactions are indexed by hash, by sender and topic (a sender has at most one pending vote per topic)
+    and by topic, so lookups, double vote checks and removals are O(1).
+    Once more than ``capacity`` transactions are pending the oldest ones are evicted, and transactions that
+    waited longer than ``max_age`` seconds are dropped by ``expire``. Both return what they removed, so the
+    caller can undo the votes it counted for them.
+    """
+
+    def __init__(self, capacity: int = 10_000, max_age: float = 600.0):
+        self.capacity = capacity
+        self.max_age = max_age
+        self._txs: OrderedDict[str, Tuple[Transaction, float]] = OrderedDict()  # tx hash -> (tx, arrival)
+        self._by_sender: Dict[bytes, Dict[str, str]] = {}  # sender -> topic -> tx hash
+        self._by_topic: Dict[str, Set[str]] = {}  # topic -> tx hashes
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._txs)
+
+    def __contains__(self, tx_hash: str) -> bool:
+        return tx_hash in self._txs
+
+    def __iter__(self) -> Iterator[Transaction]:
+        """
+        Pending transactions, oldest first.
+        """
+        return (tx for tx, _ in self._txs.values())
+
+    def items(self) -> Iterator[Tuple[str, Transaction]]:
+        return ((tx_hash, tx) for tx_hash, (tx, _) in self._txs.items())
+
+    def get(self, tx_hash: str) -> Optional[Transaction]:
+        entry = self._txs.get(tx_hash)
+        return entry[0] if entry else None
+
+    def vote_of(self, sender: bytes, topic: str) -> Optional[str]:
+        """
+        Hash of the pending vote of a sender on a topic.
+        """
+        return self._by_sender.get(sender, {}).get(topic)
+
+    def topic_hashes(self, topic: str) -> Set[str]:
+        return self._by_topic.get(topic, set())
+
+    def add(self, tx: Transaction, now: Optional[float] = None) -> List[Transaction]:
+        """
+        Add a transaction and return the transactions evicted to make room for it.
+
+        The caller makes sure the sender has no other pending vote on the topic.
+        """
+        now = time.time() if now is None else now
+        tx_hash = tx.get_tx_hash()
+        if tx_hash in self._txs:
+            return []
+
+        self._txs[tx_hash] = (tx, now)
+        self._by_sender.setdefault(tx.sender, {})[tx.topic] = tx_hash
+        self._by_topic.setdefault(tx.topic, set()).add(tx_hash)
+
+        evicted = []
+        while len(self._txs) > self.capacity:
+            evicted.append(self.remove(next(iter(self._txs))))
+        self.evicted += len(evicted)
+        return evicted
+
+    def remove(self, tx_hash: str) -> Optional[Transaction]:
+        entry = self._txs.pop(tx_hash, None)
+        if entry is None:
+            return None
+
+        tx = entry[0]
+        topics = self._by_sender[tx.sender]
+        if topics.get(tx.topic) == tx_hash:
+            del topics[tx.topic]
+            if not topics:
+                del self._by_sender[tx.sender]
+        hashes = self._by_topic[tx.topic]
+        hashes.discard(tx_hash)
+        if not hashes:
+            del self._by_topic[tx.topic]
+        return tx
+
+    def peek_oldest(self) -> Tuple[str, Transaction]:
+        tx_hash, (tx, _) = next(iter(self._txs.items()))
+        return tx_hash, tx
+
+    def pop_oldest(self) -> Tuple[str, Transaction]:
+        tx_hash = next(iter(self._txs))
+        return tx_hash, self.remove(tx_hash)
+
+    def expire(self, now: Optional[float] = None) -> List[Transaction]:
+        """
+        Drop the transactions that waited longer than max_age and return them.
+        """
+        now = time.time() if now is None else now
+        expired = []
+        for tx_hash, (_, arrival) in self._txs.items():
+            if now - arrival <= self.max_age:
+                break
+            expired.append(tx_hash)
+        self.expired += len(expired)
+        return [self.remove(tx_hash) for tx_hash in expired]
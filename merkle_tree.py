@@ -1,4 +1,24 @@
 import hashlib
+from typing import List, Tuple
+
+Proof = List[Tuple[str, bool]]
+
+
+def verify_proof(leaf_hash: str, proof: Proof, root_hash: str, hex_compat: bool = True) -> bool:
+    """
+    Check an audit path produced by ``get_proof`` against a root hash.
+
+    Every proof step is a sibling hash and whether that sibling is the left child.
+    """
+    node = leaf_hash if hex_compat else bytes.fromhex(leaf_hash)
+    for sibling, sibling_is_left in proof:
+        if hex_compat:
+            pair = sibling + node if sibling_is_left else node + sibling
+            node = hashlib.sha256(pair.encode('utf-8')).hexdigest()
+        else:
+            sibling = bytes.fromhex(sibling)
+            node = hashlib.sha256(sibling + node if sibling_is_left else node + sibling).digest()
+    return (node if hex_compat else node.hex()) == root_hash
 
 
 class MerkleNode:
@@ -39,3 +59,100 @@ class MerkleTree:
 
     def get_root_hash(self) -> str:
         return self.root.hash if self.root else ''
+
+    def get_proof(self, index: int) -> Proof:
+        """
+        Audit path of the leaf at the given index, call recalculate_tree first.
+        """
+        proof = []
+        node = self.leaves[index]
+        while node.parent is not None:
+            parent = node.parent
+            if parent.left_child is node:
+                proof.append((parent.right_child.hash, False))
+            else:
+                proof.append((parent.left_child.hash, True))
+            node = parent
+        return proof
+
+
+class IncrementalMerkleTree:
+    """
+    Merkle tree with O(log n) appends and root lookups.
+
+    Nodes are stored as one list per level, without node objects. A level only holds the nodes whose
+    subtree is complete, so ``add_leaf`` hashes each pair once, when it is completed. The unpaired nodes on
+    the right edge are folded into the root when it is asked for. Like ``MerkleTree`` an unpaired node is
+    promoted to the next level unchanged, so both classes produce the same root for the same leaves.
+
+    In ``hex_compat`` mode (the default) nodes are hex strings and a parent is the sha256 of the two
+    children's hex strings, which is the hash that ``MerkleTree`` and therefore existing chains use.
+    Otherwise nodes are raw 32 byte digests and a parent is the sha256 of the two concatenated digests.
+    ``get_root_hash`` returns a hex string in both modes.
+    """
+    __slots__ = ('hex_compat', 'levels', '_root')
+
+    def __init__(self, hex_compat: bool = True):
+        self.hex_compat = hex_compat
+        self.levels = [[]]
+        self._root = ''
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def hash_pair(self, left, right):
+        if self.hex_compat:
+            return hashlib.sha256((left + right).encode('utf-8')).hexdigest()
+        return hashlib.sha256(left + right).digest()
+
+    def add_leaf(self, leaf_hash: str):
+        node = leaf_hash if self.hex_compat else bytes.fromhex(leaf_hash)
+        levels = self.levels
+        levels[0].append(node)
+        self._root = None
+
+        level = 0
+        while not len(levels[level]) & 1:
+            node = self.hash_pair(levels[level][-2], node)
+            if level + 1 == len(levels):
+                levels.append([])
+            levels[level + 1].append(node)
+            level += 1
+
+    def recalculate_tree(self):
+        # Appends never leave the tree stale, this only exists to be a drop-in for MerkleTree
+        pass
+
+    def get_root_hash(self) -> str:
+        if self._root is None:
+            carry = None
+            for level in self.levels:
+                if len(level) & 1:
+                    carry = level[-1] if carry is None else self.hash_pair(level[-1], carry)
+            self._root = carry if self.hex_compat else carry.hex()
+        return self._root
+
+    def get_proof(self, index: int) -> Proof:
+        """
+        Audit path of the leaf at the given index, in O(log n).
+        """
+        # edges[h] is the unfinished node on the right edge of level h, if there is one
+        edges = []
+        carry = None
+        for level in self.levels:
+            edges.append(carry)
+            if len(level) & 1:
+                carry = level[-1] if carry is None else self.hash_pair(level[-1], carry)
+
+        proof = []
+        width = len(self.levels[0])
+        for height, level in enumerate(self.levels):
+            if width <= 1:
+                break
+            sibling = index ^ 1
+            if sibling < width:
+                node = level[sibling] if sibling < len(level) else edges[height]
+                proof.append((node if self.hex_compat else node.hex(), sibling < index))
+            index >>= 1
+            width = (width + 1) >> 1
+        return proof
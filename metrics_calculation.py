@@ -1,44 +1,27 @@
-from datetime import datetime
-from collections import defaultdict
+import argparse
 
-def parse_log(log_file):
-    transactions = defaultdict(list)
-    with open(log_file, 'r') as file:
-        for line in file:
-            if "received transaction" in line:  # Check if the line contains the phrase
-                parts = line.strip().split()
-                timestamp = datetime.strptime(parts[0] + ' ' + parts[1], '%Y-%m-%d %H:%M:%S,%f')
-                transaction_num = parts[7]
-                node_id = parts[4][1:-1]
-                transactions[transaction_num].append((node_id, timestamp))
-    return transactions
+from log_analysis import analyze, percentiles
 
-def calculate_latency(transactions):
-    latencies = []
-    for _, transaction_events in transactions.items():
-        min_time = min(event[1] for event in transaction_events)
-        max_time = max(event[1] for event in transaction_events)
-        latency = (max_time - min_time).total_seconds()
-        latencies.append(latency)
-    return latencies
 
-def calculate_throughput(transactions, window_size=10):
-    throughputs = []
-    for _, transaction_events in transactions.items():
-        timestamps = [event[1] for event in transaction_events]
-        timestamps.sort()
-        if len(timestamps) >= 2:
-            time_diff = (timestamps[-1] - timestamps[0]).total_seconds()
-            throughput = len(transaction_events) / time_diff
-            throughputs.append(throughput)
-    return throughputs
+def report(stats):
+    for name, label in (('first', 'until the first node'), ('all', 'until every node'), ('block', 'of blocks')):
+        latency = percentiles(stats.latencies()[name])
+        if latency:
+            print(f"Latency {label}: " + "  ".join(f"{point} {value:.4f} s" for point, value in latency.items()))
+
+    throughput = stats.throughput()
+    if not throughput.empty:
+        print(f"Throughput over {throughput.index[-1] + stats.window:.0f} seconds, in transactions per second:")
+        print(throughput.agg(['mean', 'max']).to_string(float_format='{:.1f}'.format))
+
+    print("Events per node:")
+    print(stats.nodes().to_string(float_format='{:.1f}'.format))
+
 
 if __name__ == "__main__":
-    log_file = "logfile.log"
-    transactions = parse_log(log_file)
-    latencies = calculate_latency(transactions)
-    throughputs = calculate_throughput(transactions)
-    avg_latency = sum(latencies) / len(latencies)
-    avg_throughput = sum(throughputs) / len(throughputs)
-    print(f"Average Latency: {avg_latency:.4f} seconds")
-    print(f"Average Throughput: {avg_throughput:.4f} transactions per second")
+    parser = argparse.ArgumentParser(description="Latency and throughput from the trace events of node logs")
+    parser.add_argument("logs", nargs="*", default=["logfile.log"], help="JSON logs, for example one per node")
+    parser.add_argument("--window", type=float, default=1.0, help="seconds per throughput window")
+    parser.add_argument("--workers", type=int, help="processes that read the logs, one per CPU by default")
+    args = parser.parse_args()
+    report(analyze(args.logs, window=args.window, workers=args.workers))
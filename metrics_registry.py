@@ -0,0 +1,160 @@
+import time
+from bisect import bisect_left
+from inspect import iscoroutine
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+# Seconds, from a fraction of a millisecond for a duplicate to seconds for a block that waits for its parent
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    A count that only goes up, or the value of ``fn`` if the count is already kept elsewhere.
+    """
+    kind = 'counter'
+    __slots__ = ('labels', 'value', 'fn')
+
+    def __init__(self, labels: Dict[str, str], fn: Optional[Callable[[], float]] = None):
+        self.labels = labels
+        self.value = 0
+        self.fn = fn
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def samples(self, name: str) -> List[str]:
+        value = self.fn() if self.fn is not None else self.value
+        return [f'{name}{format_labels(self.labels)} {format_value(value)}']
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down, usually read from ``fn`` when the metrics are collected.
+    """
+    kind = 'gauge'
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, with their sum.
+
+    Observing is a binary search over the bucket bounds and two additions, the cumulative counts Prometheus
+    expects are only computed when the metrics are collected.
+    """
+    kind = 'histogram'
+    __slots__ = ('labels', 'bounds', 'counts', 'sum')
+
+    def __init__(self, labels: Dict[str, str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.labels = labels
+        self.bounds = sorted(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last one is +Inf
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            cumulative += count
+            labels = format_labels({**self.labels, 'le': format_value(float(bound))})
+            lines.append(f'{name}_bucket{labels} {cumulative}')
+        labels = format_labels(self.labels)
+        lines.append(f'{name}_sum{labels} {format_value(self.sum)}')
+        lines.append(f'{name}_count{labels} {cumulative}')
+        return lines
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    """
+    Metrics of one node, rendered in the Prometheus text format.
+
+    Metrics are created once, up front, and the caller keeps a reference to update them, so recording an
+    event is an attribute update without any lookup. A name can have several metrics with different labels.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, Dict[str, Any]] = {}  # name -> help, kind and the metric per label set
+
+    def _add(self, name: str, help_text: str, metric: Metric) -> Metric:
+        family = self._families.setdefault(name, {'help': help_text, 'kind': metric.kind, 'metrics': {}})
+        if family['kind'] != metric.kind:
+            raise ValueError(f'{name} is already a {family["kind"]}')
+        key = format_labels(metric.labels)
+        if key in family['metrics']:
+            raise ValueError(f'{name}{key} already exists')
+        family['metrics'][key] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                fn: Optional[Callable[[], float]] = None) -> Counter:
+        return self._add(name, help_text, Counter(labels or {}, fn))
+
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+              fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._add(name, help_text, Gauge(labels or {}, fn))
+
+    def histogram(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(name, help_text, Histogram(labels or {}, buckets))
+
+    def get(self, name: str, **labels: str) -> Optional[Metric]:
+        family = self._families.get(name)
+        return family['metrics'].get(format_labels(labels)) if family else None
+
+    def render(self) -> str:
+        lines = []
+        for name, family in self._families.items():
+            lines.append(f'# HELP {name} {family["help"]}')
+            lines.append(f'# TYPE {name} {family["kind"]}')
+            for metric in family['metrics'].values():
+                lines.extend(metric.samples(name))
+        return '\n'.join(lines) + '\n'
+
+
+def timed_handler(histogram: Histogram, handler: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a message handler so the time until it finished, including what it awaits, goes into a histogram.
+    """
+
+    async def finish(result: Awaitable, start: float) -> Any:
+        try:
+            return await result
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def timed(*args: Any) -> Any:
+        start = time.perf_counter()
+        result = handler(*args)
+        if iscoroutine(result):
+            return finish(result, start)
+        histogram.observe(time.perf_counter() - start)
+        return result
+
+    return timed
@@ -0,0 +1,142 @@
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_ENDPOINTS = ["http://127.0.0.1:8000"]
+
+
+class NodeUnavailable(requests.ConnectionError):
+    """
+    None of the configured nodes could be reached.
+    """
+
+
+class NodeClient:
+    """
+    Client of the node API for the dashboard.
+
+    Requests go over one pooled session to the first of ``endpoints`` that answers. A node that cannot be
+    reached is skipped for ``retry_after`` seconds, unless no node is left. The endpoints default to the
+    comma separated ``NODE_ENDPOINTS`` environment variable, or the local node.
+    Votes are cached per topic for ``cache_ttl`` seconds, so pages that render many proposals, or rerun
+    often, do not ask the node for the same tallies again and again.
+    """
+
+    def __init__(self, endpoints: Optional[List[str]] = None, timeout: float = 5.0, cache_ttl: float = 2.0,
+                 retry_after: float = 10.0, session: Optional[requests.Session] = None):
+        if endpoints is None:
+            endpoints = [endpoint.strip() for endpoint in os.environ.get("NODE_ENDPOINTS", "").split(",")
+                         if endpoint.strip()] or DEFAULT_ENDPOINTS
+        self.endpoints = [endpoint.rstrip("/") for endpoint in endpoints]
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.retry_after = retry_after
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=10)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self._preferred = 0
+        self._down: Dict[str, float] = {}  # endpoint -> time after which it is tried again
+        self._cache: Dict[str, Tuple[float, Dict[str, int]]] = {}  # topic -> (expiry, votes)
+
+    def _candidates(self) -> List[str]:
+        now = time.monotonic()
+        ordered = self.endpoints[self._preferred:] + self.endpoints[:self._preferred]
+        up = [endpoint for endpoint in ordered if self._down.get(endpoint, 0) <= now]
+        return up or ordered
+
+    def _send(self, path: str, method: str = "GET", stream: bool = False, **kwargs) -> requests.Response:
+        for endpoint in self._candidates():
+            try:
+                # A stream waits for the next event as long as it takes, the node sends keepalives meanwhile
+                timeout = (self.timeout, None) if stream else self.timeout
+                response = self.session.request(method, endpoint + path, timeout=timeout, stream=stream, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._down[endpoint] = time.monotonic() + self.retry_after
+                continue
+            self._down.pop(endpoint, None)
+            self._preferred = self.endpoints.index(endpoint)
+            return response
+        raise NodeUnavailable(f"No node reachable at {', '.join(self.endpoints)}")
+
+    def get(self, path: str, **kwargs) -> Dict:
+        return self._send(path, **kwargs).json()
+
+    def get_from_others(self, path: str, **kwargs) -> Iterator[Dict]:
+        """
+        Responses of the reachable nodes other than the one that answered last, to check its answer against.
+        """
+        answered = self.endpoints[self._preferred]
+        for endpoint in self._candidates():
+            if endpoint == answered:
+                continue
+            try:
+                response = self.session.request("GET", endpoint + path, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._down[endpoint] = time.monotonic() + self.retry_after
+                continue
+            self._down.pop(endpoint, None)
+            yield response.json()
+
+    def _cached(self, topic: str) -> Optional[Dict[str, int]]:
+        entry = self._cache.get(topic)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def _store(self, topic: str, votes: Dict[str, int]) -> None:
+        self._cache[topic] = (time.monotonic() + self.cache_ttl, votes)
+
+    def vote(self, topic: str, vote: str) -> Dict:
+        response = self.get(f"/vote/{topic}/{vote}")
+        if "response" in response.keys():
+            self._store(topic, response["response"])
+        return response
+
+    def votes(self, topic: str) -> Dict[str, int]:
+        """
+        Votes of a topic, empty if nobody voted on it.
+        """
+        votes = self._cached(topic)
+        if votes is None:
+            response = self.get(f"/votes/{topic}")
+            votes = response.get("response", {})
+            self._store(topic, votes)
+        return votes
+
+    def tallies(self, topics: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Votes of many topics, the ones that are not cached are fetched in one request.
+        """
+        tallies = {topic: self._cached(topic) for topic in topics}
+        missing = [topic for topic, votes in tallies.items() if votes is None]
+        if missing:
+            response = self.get("/tallies", params={"topics": ",".join(missing)})
+            for topic in missing:
+                tallies[topic] = response.get("response", {}).get(topic, {})
+                self._store(topic, tallies[topic])
+        return tallies
+
+    def proof(self, tx_hash: str) -> Dict:
+        return self.get(f"/proof/{tx_hash}")
+
+    def stream_tallies(self, topic: str) -> Iterator[Dict[str, int]]:
+        """
+        Votes of a topic, first the current ones and then every time they change, over one long-lived connection.
+        A keepalive of the node repeats the last votes, so the caller gets control back while the topic is idle.
+        """
+        votes = None
+        with self._send("/tallies/stream", stream=True, params={"topics": topic}) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    votes = json.loads(line[len("data: "):]).get(topic, {})
+                    self._store(topic, votes)
+                    yield votes
+                elif line and line.startswith(":") and votes is not None:
+                    yield votes
@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from block import Block
+
+
+class OrphanPool:
+    """
+    Bounded pool of blocks whose parent is not known yet, indexed by the hash of that missing parent.
+
+    Orphans are evicted oldest first once there are more than ``max_size`` of them or they have waited
+    longer than ``max_age`` seconds.
+    """
+
+    def __init__(self, max_size: int = 256, max_age: float = 120.0):
+        self.max_size = max_size
+        self.max_age = max_age
+        self._orphans: OrderedDict[str, Tuple[Block, float]] = OrderedDict()  # block hash -> (block, arrival)
+        self._by_parent: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._orphans)
+
+    def __contains__(self, block_hash: str) -> bool:
+        return block_hash in self._orphans
+
+    def add(self, block: Block, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        block_hash = block.get_merkle_hash()
+        if block_hash in self._orphans:
+            return False
+
+        self._orphans[block_hash] = (block, now)
+        self._by_parent.setdefault(block.previous_hash, set()).add(block_hash)
+        self.expire(now)
+        while len(self._orphans) > self.max_size:
+            self._remove(next(iter(self._orphans)))
+        return block_hash in self._orphans
+
+    def pop_children(self, parent_hash: str) -> List[Block]:
+        """
+        Remove and return the orphans waiting for the given parent, oldest first.
+        """
+        children = self._by_parent.pop(parent_hash, set())
+        blocks = [self._orphans.pop(block_hash) for block_hash in children]
+        return [block for block, _ in sorted(blocks, key=lambda entry: entry[1])]
+
+    def root_parent(self, block_hash: str) -> str:
+        """
+        Follow a chain of orphans down to the first ancestor that is missing from the pool.
+        """
+        while block_hash in self._orphans:
+            block_hash = self._orphans[block_hash][0].previous_hash
+        return block_hash
+
+    def expire(self, now: Optional[float] = None) -> None:
+        deadline = (time.time() if now is None else now) - self.max_age
+        while self._orphans:
+            block_hash, (_, arrival) = next(iter(self._orphans.items()))
+            if arrival >= deadline:
+                break
+            self._remove(block_hash)
+
+    def _remove(self, block_hash: str) -> None:
+        block, _ = self._orphans.pop(block_hash)
+        siblings = self._by_parent.get(block.previous_hash)
+        if siblings is not None:
+            siblings.discard(block_hash)
+            if not siblings:
+                del self._by_parent[block.previous_hash]
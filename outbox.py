@@ -0,0 +1,76 @@
+import asyncio
+from typing import Callable, Dict, List, Optional
+
+from ipv8.types import Peer
+
+from packing import MAX_MESSAGE_SIZE
+from transaction import BATCH_ITEM_OVERHEAD, BATCH_OVERHEAD, Transaction
+
+# The count of a TransactionBatch is a single byte
+MAX_BATCH_LENGTH = 255
+
+
+class TransactionOutbox:
+    """
+    Per peer queues of outbound transactions that are sent together.
+
+    A peer's queue is handed to ``send`` once the next transaction would no longer fit in ``max_size``
+    bytes, and otherwise at the latest ``window`` seconds after it got its first transaction.
+    With a window of 0 every transaction is sent right away.
+    ``send`` decides how to put the transactions on the wire, a queue of one is best sent as a plain
+    ``Transaction`` and anything longer as a ``TransactionBatch``.
+    """
+
+    def __init__(self, send: Callable[[Peer, List[Transaction]], None], window: float = 0.01,
+                 max_size: int = MAX_MESSAGE_SIZE):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self._queues: Dict[Peer, List[Transaction]] = {}
+        self._sizes: Dict[Peer, int] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def add(self, peer: Peer, tx: Transaction) -> None:
+        if self.window <= 0:
+            self.send(peer, [tx])
+            return
+
+        size = tx.get_size() + BATCH_ITEM_OVERHEAD
+        queue = self._queues.get(peer)
+        if queue and (self._sizes[peer] + size > self.max_size or len(queue) >= MAX_BATCH_LENGTH):
+            self.flush_peer(peer)
+            queue = None
+        if not queue:
+            queue = self._queues[peer] = []
+            self._sizes[peer] = BATCH_OVERHEAD
+        queue.append(tx)
+        self._sizes[peer] += size
+
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush_peer(self, peer: Peer) -> None:
+        queue = self._queues.pop(peer, None)
+        self._sizes.pop(peer, None)
+        if queue:
+            self.send(peer, queue)
+
+    def flush(self) -> None:
+        """
+        Send everything that is queued.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for peer in list(self._queues):
+            self.flush_peer(peer)
+
+    def clear(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._queues.clear()
+        self._sizes.clear()
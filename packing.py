@@ -0,0 +1,28 @@
+from typing import Iterator, List, Sequence, TypeVar
+
+T = TypeVar('T')
+
+# Payload bytes we put in one message, so that with the ipv8 header and signature it fits a 1500 byte MTU
+MAX_MESSAGE_SIZE = 1200
+# Entries in one ipv8 list field, such as varlenH-list, which stores its length in a single byte
+MAX_LIST_ITEMS = 255
+
+
+def split_by_size(items: Sequence[T], sizes: Sequence[int], max_size: int = MAX_MESSAGE_SIZE,
+                  overhead: int = 0, max_items: int = MAX_LIST_ITEMS) -> Iterator[List[T]]:
+    """
+    Split items into consecutive groups whose sizes add up to at most max_size, of at most max_items each.
+
+    An item that does not fit on its own still gets a group of its own.
+    """
+    group = []
+    total = overhead
+    for item, size in zip(items, sizes):
+        if group and (total + size > max_size or len(group) >= max_items):
+            yield group
+            group = []
+            total = overhead
+        group.append(item)
+        total += size
+    if group:
+        yield group
@@ -1,66 +1,62 @@
-from datetime import datetime
-from collections import defaultdict
-import matplotlib.pyplot as plt
-
-def parse_log(log_file):
-    transactions = defaultdict(list)
-    with open(log_file, 'r') as file:
-        for line in file:
-            if "received transaction" in line:
-                parts = line.strip().split()
-                timestamp = datetime.strptime(parts[0] + ' ' + parts[1], '%Y-%m-%d %H:%M:%S,%f')
-                node_id = parts[7][1:-1]  # Extract node ID
-                transactions[parts[7]].append((node_id, timestamp))
-    return transactions
+import argparse
+import os
 
-def calculate_latency(transactions):
-    latency = []
-    for tx_list in transactions.values():
-        for i in range(len(tx_list) - 1):
-            latency.append((tx_list[i + 1][1] - tx_list[i][1]).total_seconds())
-    return latency
+import matplotlib.pyplot as plt
 
-def calculate_throughput(transactions, experiment_time):
-    total_transactions = sum(len(tx_list) for tx_list in transactions.values())
-    return total_transactions / experiment_time
+from log_analysis import analyze
 
 '''The x-axis represents the latency in seconds, and the y-axis represents the frequency of occurrence of each latency value.
 Each bar in the histogram represents a range of latency values, and the height of the bar indicates how many transactions fall within that range.
 For example, if a bar is taller, it means there are more transactions with that particular latency value.'''
 
-def plot_latency(latency, output_file):
-    plt.hist(latency, bins=50, color='blue', alpha=0.7)
+def plot_latency(latencies, output_file):
+    for name, label in (('first', 'first node'), ('all', 'every node')):
+        if len(latencies[name]):
+            plt.hist(latencies[name], bins=50, alpha=0.6, label=f'Until {label}')
     plt.xlabel('Latency (seconds)')
-    plt.ylabel('Frequency')
+    plt.ylabel('Transactions')
     plt.title('Latency Histogram')
+    plt.legend()
     plt.grid(True)
     plt.savefig(output_file)
     plt.close()
 
-'''x-axis represents time, timestamps.
-y-axis represents the number of transactions processed per second (TPS).
-Each data point on the plot represents the throughput (TPS) at a specific timestamp.
+'''x-axis represents time since the first event, in seconds.
+y-axis represents the number of transactions per second (TPS) in each window.
+Created transactions are the offered load, committed ones were sealed in a block.
 It insights into how transaction processing fluctuates.'''
 
-def plot_throughput(transactions, experiment_time, output_file):
-    transaction_counts = [sum(len(tx_list) for tx_list in transactions.values() if len(tx_list) >= i) for i in range(1, len(transactions))]
-    throughput = [transaction_count / experiment_time for transaction_count in transaction_counts]
-    plt.plot(range(1, len(transactions)), throughput, marker='o', linestyle='-')
-    plt.xlabel('Number of Transactions')
+def plot_throughput(throughput, output_file):
+    for column in ('created', 'committed'):
+        plt.plot(throughput.index, throughput[column], linestyle='-', label=column.capitalize())
+    plt.xlabel('Time (seconds)')
     plt.ylabel('Throughput (Transactions per Second)')
-    plt.title('Throughput vs. Number of Transactions')
+    plt.title('Throughput over Time')
+    plt.legend()
     plt.grid(True)
     plt.savefig(output_file)
     plt.close()
 
+def plot_nodes(nodes, output_file):
+    plt.bar([node[:8] for node in nodes.index], nodes['received_per_second'])
+    plt.xlabel('Node')
+    plt.ylabel('Received Transactions per Second')
+    plt.title('Transactions Received per Node')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    plt.savefig(output_file)
+    plt.close()
+
 if __name__ == "__main__":
-    log_file = "logfile.log"
-    output_latency = "metrics/latency_plot.png"
-    output_throughput = "metrics/throughput_plot.png"
-    transactions = parse_log(log_file)
-    latency = calculate_latency(transactions)
-    experiment_time = (max(timestamp for tx_list in transactions.values() for _, timestamp in tx_list) -
-                       min(timestamp for tx_list in transactions.values() for _, timestamp in tx_list)).total_seconds()
-    throughput = calculate_throughput(transactions, experiment_time)
-    plot_latency(latency, output_latency)
-    plot_throughput(transactions, experiment_time, output_throughput)
+    parser = argparse.ArgumentParser(description="Plot latency and throughput from the trace events of node logs")
+    parser.add_argument("logs", nargs="*", default=["logfile.log"], help="JSON logs, for example one per node")
+    parser.add_argument("--window", type=float, default=1.0, help="seconds per throughput window")
+    parser.add_argument("--workers", type=int, help="processes that read the logs, one per CPU by default")
+    parser.add_argument("--output-dir", default="metrics")
+    args = parser.parse_args()
+
+    stats = analyze(args.logs, window=args.window, workers=args.workers)
+    os.makedirs(args.output_dir, exist_ok=True)
+    plot_latency(stats.latencies(), os.path.join(args.output_dir, "latency_plot.png"))
+    plot_throughput(stats.throughput(), os.path.join(args.output_dir, "throughput_plot.png"))
+    plot_nodes(stats.nodes(), os.path.join(args.output_dir, "nodes_plot.png"))
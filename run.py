@@ -1,13 +1,18 @@
-import threading
-
-from asyncio import run
+import logging
+from asyncio import ensure_future, run
 
 from ipv8.configuration import ConfigBuilder, Strategy, WalkerDefinition, default_bootstrap_defs
 from ipv8_service import IPv8
 from ipv8.util import run_forever
 
 from blockchain import MyCommunity
-from server import run_web_server
+from log_setup import setup_logging
+from server import serve
+
+def log_web_server_exit(task):
+    # Without this an exception of the server, such as a port it cannot bind, is only reported at exit
+    if not task.cancelled() and task.exception() is not None:
+        logging.getLogger('voting').error('Web server stopped', exc_info=task.exception())
 
 async def start_community():
     builder = ConfigBuilder().clear_keys().clear_overlays()
@@ -20,9 +25,10 @@ async def start_community():
                          extra_communities={'MyCommunity': MyCommunity})
 
     await ipv8_instance.start()
-    fastapi_thread = threading.Thread(target=lambda: run_web_server(ipv8_instance))
-    fastapi_thread.start()
+    web_server = ensure_future(serve(ipv8_instance))
+    web_server.add_done_callback(log_web_server_exit)
     await run_forever()
 
 
+setup_logging()
 run(start_community())
@@ -0,0 +1,56 @@
+import time
+from typing import Optional
+
+from block import Block, ENTRY_OVERHEAD
+from packing import MAX_LIST_ITEMS
+from transaction import Transaction
+
+
+class SealingPolicy:
+    """
+    Decides when the leader seals its working block.
+
+    A block is sealed as soon as it holds ``max_txs`` transactions or the next transaction would take it
+    past ``max_bytes``, and otherwise once it has been open for ``max_latency`` seconds.
+    With ``adaptive`` the transaction limit follows a moving average of the mempool depth, between
+    ``min_txs`` and ``max_txs``: a quiet network gets small blocks right away, a busy one full blocks.
+    ``max_txs`` is at most 255, the number of entries a block can serialize.
+    """
+
+    def __init__(self, max_txs: int = 200, max_bytes: int = 60_000, max_latency: float = 2.0,
+                 adaptive: bool = False, min_txs: int = 1, smoothing: float = 0.3):
+        if not 0 < max_txs <= MAX_LIST_ITEMS:
+            raise ValueError(f'the number of transactions in a block must be between 1 and {MAX_LIST_ITEMS}')
+        self.max_txs = max_txs
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.adaptive = adaptive
+        self.min_txs = min_txs
+        self.smoothing = smoothing
+        self.depth: Optional[float] = None  # moving average of the mempool depth
+
+    def observe(self, mempool_depth: int) -> None:
+        if self.depth is None:
+            self.depth = float(mempool_depth)
+        else:
+            self.depth += self.smoothing * (mempool_depth - self.depth)
+
+    @property
+    def target_txs(self) -> int:
+        if not self.adaptive or self.depth is None:
+            return self.max_txs
+        return max(self.min_txs, min(self.max_txs, round(self.depth)))
+
+    def fits(self, block: Block, tx: Transaction) -> bool:
+        """
+        Whether a transaction still fits in the block, an empty block takes any transaction.
+        """
+        size = len(tx.get_tx_bytes()) + len(tx.signature) + len(tx.public_key) + ENTRY_OVERHEAD
+        return not block.transactions or block.size + size <= self.max_bytes
+
+    def is_full(self, block: Block) -> bool:
+        return len(block.transactions) >= self.target_txs or block.size >= self.max_bytes
+
+    def is_due(self, opened_at: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - opened_at >= self.max_latency
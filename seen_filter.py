@@ -0,0 +1,102 @@
+import math
+import time
+from hashlib import blake2b
+from typing import List, Optional
+
+
+class BloomFilter:
+    """
+    Fixed size Bloom filter over byte strings.
+
+    The bit positions come from one 128 bit blake2b digest split in two halves (double hashing),
+    so a lookup costs a single hash no matter how many bits are set per key.
+    """
+
+    __slots__ = ('size', 'hash_count', 'bits', 'count')
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: bytes) -> List[int]:
+        digest = blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, key: bytes) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key: bytes) -> None:
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class SeenFilter:
+    """
+    Remembers which gossip messages were seen recently, in bounded memory.
+
+    Keys go into the newest of ``generations`` Bloom filters. Once that filter holds ``capacity`` keys or
+    is ``window`` seconds old, the oldest filter is dropped and an empty one takes its place, so a key is
+    remembered for at least one full window and memory never exceeds ``generations`` filters.
+    Lookups can return false positives at roughly ``error_rate`` per generation, never false negatives
+    within the window.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001, window: float = 60.0,
+                 generations: int = 2):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window = window
+        self.filters = [BloomFilter(capacity, error_rate) for _ in range(generations)]
+        self.rotated_at: Optional[float] = None  # set by the first key
+        self.checked = 0
+        self.duplicates = 0
+
+    def __contains__(self, key: bytes) -> bool:
+        return any(key in bloom for bloom in self.filters)
+
+    @property
+    def memory(self) -> int:
+        """
+        Bytes taken by the filter bits.
+        """
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+    def rotate(self, now: Optional[float] = None) -> None:
+        self.filters.pop()
+        self.filters.insert(0, BloomFilter(self.capacity, self.error_rate))
+        self.rotated_at = time.time() if now is None else now
+
+    def check(self, key: bytes) -> bool:
+        """
+        Return True if the key was seen before. Unlike ``check_and_add`` this does not remember the key, for
+        messages that should only count as seen once their signature checked out.
+        """
+        self.checked += 1
+        if key in self:
+            self.duplicates += 1
+            return True
+        return False
+
+    def add(self, key: bytes, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        if self.rotated_at is None:
+            self.rotated_at = now
+        elif self.filters[0].count >= self.capacity or now - self.rotated_at >= self.window:
+            self.rotate(now)
+        self.filters[0].add(key)
+
+    def check_and_add(self, key: bytes, now: Optional[float] = None) -> bool:
+        """
+        Return True if the key was seen before, otherwise remember it and return False.
+        """
+        if self.check(key):
+            return True
+        self.add(key, now)
+        return False
@@ -1,6 +1,20 @@
+import asyncio
+import errno
+import json
+import socket
+
+from typing import List
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
 import uvicorn
 
+MAX_BATCH_VOTES = 1000
+# Seconds between two comments on an idle tally stream, so proxies keep the connection open and clients that
+# loop over the stream, like the Streamlit app, regularly get control back
+KEEPALIVE_INTERVAL = 1.0
+
 # Create web server
 app = FastAPI()
 
@@ -31,7 +45,7 @@ async def send_vote(topic: str, vote: str):
     if "error" in reponse.keys():
         return {"status_code": 401, "error": reponse["error"], "reponse": {}}
 
-    return {"status_code": 200, "status": "OK", "response": reponse}
+    return {"status_code": 200, "status": "OK", "response": reponse["votes"], "tx_hash": reponse["tx_hash"]}
 
 @app.get("/votes/{topic}")
 async def get_topic_votes(topic: str):
@@ -52,20 +66,167 @@ async def get_topic_votes(topic: str):
 
     return {"status_code": 200, "status": "OK", "response": reponse}
 
-def run_web_server(ipv8_instance):
+class Vote(BaseModel):
+    topic: str
+    vote: str
+
+class VoteBatch(BaseModel):
+    votes: List[Vote]
+
+@app.post("/votes/batch")
+async def send_votes(batch: VoteBatch):
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    if len(batch.votes) > MAX_BATCH_VOTES:
+        return {"status_code": 413, "error": f"At most {MAX_BATCH_VOTES} votes per batch", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    results = node.create_transactions([(vote.topic, vote.vote) for vote in batch.votes])
+
+    reponse = []
+    for vote, result in zip(batch.votes, results):
+        if result is None or "error" in result.keys():
+            error = result["error"] if result else "There was a problem sending the vote. Please try again later."
+            reponse.append({"topic": vote.topic, "vote": vote.vote, "error": error})
+        else:
+            reponse.append({"topic": vote.topic, "vote": vote.vote, "status": "OK", "votes": dict(result["votes"]),
+                            "tx_hash": result["tx_hash"]})
+
+    return {"status_code": 200, "status": "OK", "response": reponse}
+
+@app.get("/tallies")
+async def get_tallies(topics: str = ""):
+    """
+    Votes of many topics at once, ``topics`` is a comma separated list.
+    """
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    names = [topic for topic in topics.split(",") if topic]
+    if not names:
+        return {"status_code": 401, "error": "Missing information", "reponse": {}}
+
+    return {"status_code": 200, "status": "OK", "response": node.get_tallies(names)}
+
+@app.get("/tallies/stream")
+async def stream_tallies(topics: str = ""):
+    """
+    Server-sent events with the votes of the topics that changed, all topics unless ``topics`` lists some.
+    The first event has the current votes of the requested topics.
+    """
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    names = [topic for topic in topics.split(",") if topic]
+
+    async def events():
+        subscription = node.tally_feed.subscribe(names)
+        try:
+            yield f"data: {json.dumps(node.get_tallies(names) if names else node.votes)}\n\n"
+            while True:
+                try:
+                    update = await asyncio.wait_for(subscription.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(update)}\n\n"
+        finally:
+            node.tally_feed.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/proof/{tx_hash}")
+async def get_tx_proof(tx_hash: str):
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    reponse = node.get_proof(tx_hash)
+
+    if "error" in reponse.keys():
+        return {"status_code": 404, "error": reponse["error"], "reponse": {}}
+
+    return {"status_code": 200, "status": "OK", "response": reponse}
+
+@app.get("/sync")
+async def get_sync_status():
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    return {"status_code": 200, "status": "OK", "response": node.get_sync_status()}
+
+@app.get("/gossip")
+async def get_gossip_stats():
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    return {"status_code": 200, "status": "OK", "response": node.get_gossip_stats()}
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Metrics of the node in the Prometheus text format.
+    """
+    ipv8_instance = app.ipv8_instance
+
+    if not ipv8_instance:
+        return {"status_code": 404, "error": "IPv8 instance not found", "reponse": {}}
+
+    node = ipv8_instance.overlays[0]
+
+    return PlainTextResponse(node.metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def serve(ipv8_instance, host="127.0.0.1", port=8000):
+    """
+    Serve the API on the running event loop, the one ipv8 runs on, so endpoints can call into the
+    community directly. Moves on to the next port while the port is in use.
+    """
     app.ipv8_instance = ipv8_instance
-    port = 8000
+    sock = bind_socket(host, port)
+    server = uvicorn.Server(uvicorn.Config(app))
+    await server.serve(sockets=[sock])
 
+def bind_socket(host, port):
     while True:
+        # With the protocol set asyncio turns on TCP_NODELAY for every connection, as when uvicorn binds itself
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
-            uvicorn.run(app, host="127.0.0.1", port=port)
-            break  # If the server starts successfully, break the loop
+            sock.bind((host, port))
+            return sock
         except OSError as e:
-            if e.errno == 98:  # Error code for address already in use
+            sock.close()
+            if e.errno == errno.EADDRINUSE:
                 port += 1
             else:
-                raise  # Reraises any other exception
+                raise
+
+def run_web_server(ipv8_instance=None):
+    asyncio.run(serve(ipv8_instance))
 
 
 if __name__ == "__main__":
-    run_web_server()
\ No newline at end of file
+    run_web_server()
@@ -0,0 +1,164 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from ipv8.types import Peer
+
+
+class ChainSync:
+    """
+    Download state of headers-first chain synchronization.
+
+    Peers answer a ``HeadersRequest`` with the hashes of the blocks that follow our chain. Those hashes are
+    queued in chain order and their bodies are fetched in batches of ``blocks_per_request``, with up to
+    ``requests_per_peer`` batches in flight to every peer that sent us headers. Bodies can arrive in any
+    order, the community parks the ones whose parent is missing in its orphan pool.
+
+    This class only keeps the bookkeeping, sending the messages is left to the community.
+    """
+
+    def __init__(self, blocks_per_request: int = 16, requests_per_peer: int = 4, request_timeout: float = 5.0):
+        self.blocks_per_request = blocks_per_request
+        self.requests_per_peer = requests_per_peer
+        self.request_timeout = request_timeout
+
+        self.queue: Deque[str] = deque()  # block hashes still to request, parents first
+        self.queued: Set[str] = set()  # hashes in the queue that still need to be requested
+        self.in_flight: Dict[str, Tuple[Peer, float]] = {}  # block hash -> (peer, request time)
+        self.headers: Dict[Peer, int] = {}  # peers that sent us headers -> tip height they reported
+        self.header_heights: Dict[str, int] = {}  # heights of the headers we learned while syncing
+        self.last_header: Optional[str] = None  # last header hash we learned, to continue from
+        self.header_height = -1
+        self.target_height = -1
+        self.headers_requested_at = 0.0
+        self._stashed: Dict[str, Tuple[Peer, List[str], int]] = {}  # chunks that arrived before their start
+
+    @property
+    def syncing(self) -> bool:
+        return bool(self.queued or self.in_flight)
+
+    def add_headers(self, peer: Peer, start_hash: str, hashes: List[str], tip_height: int,
+                    height_of: Callable[[str], Optional[int]], is_known: Callable[[str], bool]) -> int:
+        """
+        Queue the blocks of a header chunk that we do not have yet and return how many were new.
+
+        ``height_of`` gives the height of a block in our chain, ``is_known`` tells if we already have a block
+        anywhere (chain or orphan pool). Chunks that do not connect to anything we know are kept until they do.
+        """
+        self.headers[peer] = max(tip_height, self.headers.get(peer, -1))
+        self.target_height = max(self.target_height, tip_height)
+
+        start_height = self.header_heights.get(start_hash)
+        if start_height is None:
+            start_height = height_of(start_hash)
+        if start_height is None:
+            if len(self._stashed) < 64:
+                self._stashed[start_hash] = (peer, hashes, tip_height)
+            return 0
+
+        added = 0
+        for height, block_hash in enumerate(hashes, start_height + 1):
+            self.header_heights[block_hash] = height
+            if block_hash not in self.queued and block_hash not in self.in_flight and not is_known(block_hash):
+                self.queue.append(block_hash)
+                self.queued.add(block_hash)
+                added += 1
+            if height > self.header_height:
+                self.header_height = height
+                self.last_header = block_hash
+
+        if hashes and hashes[-1] in self._stashed:
+            stashed_peer, stashed_hashes, stashed_tip = self._stashed.pop(hashes[-1])
+            added += self.add_headers(stashed_peer, hashes[-1], stashed_hashes, stashed_tip, height_of, is_known)
+        return added
+
+    def wants_headers(self, height: int, now: Optional[float] = None) -> bool:
+        """
+        Whether we should ask for headers: some peer reported a longer chain than the headers we have, or the
+        downloads finished below the target height (blocks that failed or got evicted from the orphan pool).
+        """
+        now = time.time() if now is None else now
+        if now - self.headers_requested_at < self.request_timeout:
+            return False
+        return self.target_height > self.header_height or (not self.syncing and self.target_height > height)
+
+    def next_requests(self, peers: List[Peer], now: Optional[float] = None,
+                      limit: Optional[int] = None) -> List[Tuple[Peer, List[str]]]:
+        """
+        Hand out queued blocks to the given peers, round robin, as long as they have request slots free.
+        At most ``limit`` blocks are handed out, if given.
+        """
+        now = time.time() if now is None else now
+        limit = len(self.queue) if limit is None else limit
+        load = {peer: 0 for peer in peers}
+        for peer, _ in self.in_flight.values():
+            if peer in load:
+                load[peer] += 1
+        slots = {peer: self.requests_per_peer * self.blocks_per_request - load[peer] for peer in peers}
+
+        requests = []
+        while self.queue and limit > 0:
+            progress = False
+            for peer in peers:
+                if not self.queue or limit <= 0:
+                    break
+                count = min(self.blocks_per_request, slots[peer], limit)
+                if count <= 0:
+                    continue
+                batch = []
+                while self.queue and len(batch) < count:
+                    block_hash = self.queue.popleft()
+                    # Blocks that reached us some other way were dropped from queued, skip them here
+                    if block_hash in self.queued:
+                        self.queued.discard(block_hash)
+                        self.in_flight[block_hash] = (peer, now)
+                        batch.append(block_hash)
+                if not batch:
+                    continue
+                slots[peer] -= len(batch)
+                limit -= len(batch)
+                requests.append((peer, batch))
+                progress = True
+            if not progress:
+                break
+        return requests
+
+    def block_received(self, block_hash: str) -> None:
+        self.in_flight.pop(block_hash, None)
+        self.queued.discard(block_hash)
+        if not self.syncing:
+            self.header_heights.clear()
+            self._stashed.clear()
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """
+        Put blocks that were requested too long ago back at the front of the queue.
+        """
+        now = time.time() if now is None else now
+        expired = [block_hash for block_hash, (_, requested_at) in self.in_flight.items()
+                   if now - requested_at > self.request_timeout]
+        for block_hash in reversed(expired):
+            del self.in_flight[block_hash]
+            self.queue.appendleft(block_hash)
+            self.queued.add(block_hash)
+
+    def remove_peer(self, peer: Peer) -> None:
+        """
+        Forget a peer that left, the blocks requested from it go back to the front of the queue.
+        """
+        self.headers.pop(peer, None)
+        requested = [block_hash for block_hash, (requested_from, _) in self.in_flight.items() if requested_from == peer]
+        for block_hash in reversed(requested):
+            del self.in_flight[block_hash]
+            self.queue.appendleft(block_hash)
+            self.queued.add(block_hash)
+        self._stashed = {start_hash: chunk for start_hash, chunk in self._stashed.items() if chunk[0] != peer}
+
+    def progress(self, height: int) -> Dict:
+        target = max(self.target_height, height)
+        return {"height": height,
+                "target_height": target,
+                "queued": len(self.queued),
+                "in_flight": len(self.in_flight),
+                "syncing": self.syncing,
+                "progress": 1.0 if target < 0 else round((height + 1) / (target + 1), 4)}
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+Tallies = Dict[str, Dict[str, int]]
+
+
+class Subscription:
+    """
+    Tally updates for one client, optionally limited to some topics.
+
+    Updates the client has not picked up yet are merged, so a slow client gets the latest counts of every
+    changed topic at once instead of a growing backlog.
+    """
+
+    def __init__(self, topics: Optional[Iterable[str]] = None):
+        self.topics: Optional[Set[str]] = set(topics) if topics else None
+        self._pending: Tallies = {}
+        self._ready = asyncio.Event()
+
+    def push(self, tallies: Tallies) -> None:
+        update = {topic: counts for topic, counts in tallies.items() if self.topics is None or topic in self.topics}
+        if update:
+            self._pending.update(update)
+            self._ready.set()
+
+    async def get(self) -> Tallies:
+        """
+        Wait for and return the topics that changed since the last call, with their current counts.
+        """
+        await self._ready.wait()
+        self._ready.clear()
+        update, self._pending = self._pending, {}
+        return update
+
+
+class TallyFeed:
+    """
+    Pushes the counts of changed topics to subscriptions.
+
+    ``changed`` only marks a topic, the counts are read through ``tallies`` once the topics that changed
+    within ``window`` seconds are published together, so a burst of votes becomes a single update.
+    With a window of 0 every change is published right away. Nothing is tracked without subscribers.
+    """
+
+    def __init__(self, tallies: Callable[[List[str]], Tallies], window: float = 0.1):
+        self.tallies = tallies
+        self.window = window
+        self.subscriptions: List[Subscription] = []
+        self.published = 0
+        self._changed: Set[str] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscription:
+        subscription = Subscription(topics)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def changed(self, topic: str) -> None:
+        if not self.subscriptions:
+            return
+        self._changed.add(topic)
+        if self.window <= 0:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self) -> None:
+        """
+        Publish the counts of every topic that changed.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._changed:
+            return
+
+        tallies = {topic: dict(counts) for topic, counts in self.tallies(list(self._changed)).items()}
+        self._changed.clear()
+        for subscription in self.subscriptions:
+            subscription.push(tallies)
+        self.published += 1
+
+    def clear(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._changed.clear()
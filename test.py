@@ -1,8 +1,57 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import tempfile
+import time
 import unittest
+from hashlib import sha256
+import pandas as pd
+import requests
+from ipv8.keyvault.crypto import default_eccrypto
+from ipv8.messaging.serialization import default_serializer
+from ipv8.peer import Peer
 from ipv8.test.base import TestBase
+from ipv8.test.mocking.endpoint import internet
+from ipv8.test.mocking.ipv8 import MockIPv8
 from block import Block
-from blockchain import MyCommunity, BlockMessage
-from transaction import Transaction
+from block_log import BlockLog
+from blockchain import MyCommunity, MyCommunitySettings, BlockMessage
+from chain_store import ChainStore, GENESIS_HASH
+from compact_block import CompactBlock, PartialBlock, compact_ids, mempool_index
+from key_cache import KeyCache
+from log_analysis import EVENT_COLUMNS, LogStats, analyze, read_events
+from log_setup import JsonFormatter, LazyQueueHandler, parse_levels
+from membership import Membership
+from leader_schedule import LeaderSchedule
+from mempool import Mempool
+from node_client import NodeClient, NodeUnavailable
+from metrics_registry import MetricsRegistry
+from merkle_tree import IncrementalMerkleTree, MerkleTree, verify_proof
+from orphan_pool import OrphanPool
+from outbox import TransactionOutbox
+from packing import split_by_size
+from sealing import SealingPolicy
+from seen_filter import SeenFilter
+from sync import ChainSync
+from tally_feed import TallyFeed
+from transaction import Transaction, TransactionBatch
+from verification import SignatureVerifier
+
+
+def make_tx(i, signature=bytes(64), sender=bytes(20), vote='yes', key=None):
+    """
+    A vote of a fixed sender on topic ``i``, with a placeholder signature and public key of the real sizes.
+
+    With a ``key`` the vote is cast and signed by that key instead.
+    """
+    if key is None:
+        return Transaction(sender, f'topic{i}', vote, signature=signature, public_key=bytes(74))
+    public_key = key.pub().key_to_bin()
+    tx = Transaction(public_key[-20:], f'topic{i}', vote, public_key=public_key)
+    tx.signature = default_eccrypto.create_signature(key, tx.get_tx_bytes())
+    return tx
 
 
 class TestBlockchain(unittest.TestCase):
@@ -28,7 +77,7 @@ class TestBlockchain(unittest.TestCase):
         await self.community.on_transaction(None, transaction)
 
         # Check if the transaction is added to the pending transactions
-        self.assertEqual(len(self.community.pending_txs), 1)
+        self.assertEqual(len(self.community.mempool), 1)
 
     async def test_block_creation_and_propagation(self):
         block = Block('block_hash')
@@ -47,5 +96,1015 @@ class TestBlockchain(unittest.TestCase):
         self.assertEqual(received_block.get_hash(), block.get_hash())
 
 
+def make_nodes(count):
+    """
+    MockIPv8 nodes with an in-memory chain that all know each other.
+    """
+    nodes = [MockIPv8('curve25519', MyCommunity, MyCommunitySettings(block_log_dir=None)) for _ in range(count)]
+    for node in nodes:
+        for other in nodes:
+            if other is not node:
+                peer = Peer(other.my_peer.public_key.key_to_bin(), other.endpoint.wan_address)
+                node.network.add_verified_peer(peer)
+                node.network.discover_services(peer, [MyCommunity.community_id])
+    return nodes
+
+
+class TestVoteBatch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.nodes = make_nodes(2)
+
+    async def asyncTearDown(self):
+        for node in self.nodes:
+            await node.stop()
+        internet.clear()
+
+    async def test_votes_are_cast_and_tallied_together(self):
+        sender, receiver = (node.overlay for node in self.nodes)
+        results = sender.create_transactions([('a', 'yes'), ('b', 'no'), ('a', 'no'), ('c', '')])
+
+        self.assertEqual([{'yes': 1}, {'no': 1}], [result['votes'] for result in results[:2]])
+        self.assertEqual({tx.get_tx_hash() for tx in sender.mempool}, {result['tx_hash'] for result in results[:2]})
+        self.assertEqual([{'error': 'Already voted for this topic'}, {'error': 'Missing information'}], results[2:])
+        self.assertEqual(2, len(sender.mempool))
+        self.assertEqual(0, len(sender.outbox))
+        await asyncio.sleep(0.1)
+        self.assertEqual({'a': {'yes': 1}, 'b': {'no': 1}, 'c': {}}, receiver.get_tallies(['a', 'b', 'c']))
+
+
+class TestDuplicateGossip(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.nodes = make_nodes(2)
+        # A valid key that did not sign anything, for copies of a message with a swapped public key
+        self.other_key = default_eccrypto.generate_key('curve25519').pub().key_to_bin()
+
+    async def asyncTearDown(self):
+        for node in self.nodes:
+            await node.stop()
+        internet.clear()
+
+    async def test_tampered_tx_does_not_mask_the_real_one(self):
+        community = self.nodes[0].overlay
+        genuine = make_tx(0, key=default_eccrypto.generate_key('curve25519'))
+        tampered = Transaction(genuine.sender, genuine.topic, genuine.vote, signature=genuine.signature,
+                               public_key=self.other_key)
+
+        await community.process_transactions(community.my_peer, [tampered])
+        self.assertEqual(0, len(community.mempool))
+        await community.process_transactions(community.my_peer, [genuine])
+        self.assertEqual([genuine.get_tx_hash()], [tx.get_tx_hash() for tx in community.mempool])
+
+    async def test_tampered_block_does_not_mask_the_real_one(self):
+        sender, receiver = (node.overlay for node in self.nodes)
+        block = Block(GENESIS_HASH)
+        block.add_transaction(make_tx(0, key=default_eccrypto.generate_key('curve25519')))
+        block.update_tree()
+        genuine = BlockMessage(block.merkle_hash, block, public_key=sender.my_public_key_bin)
+        genuine.signature = sender.crypto.create_signature(sender.my_peer.key, genuine.get_block_bytes())
+        tampered = BlockMessage(genuine.hash, block, signature=genuine.signature, public_key=self.other_key)
+
+        peer = sender.get_peers()[0]
+        sender.ez_send(peer, tampered)
+        sender.ez_send(peer, genuine)
+        await asyncio.sleep(0.1)
+        self.assertEqual(block.merkle_hash, receiver.chain.tip_hash)
+
+
+class TestPeerChurn(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.nodes = make_nodes(2)
+
+    async def asyncTearDown(self):
+        for node in self.nodes:
+            await node.stop()
+        internet.clear()
+
+    async def test_departed_leader_is_skipped_after_a_timeout(self):
+        community, other = self.nodes[0].overlay, self.nodes[1].my_peer
+        community.add_member(community.my_peer.mid)
+        community.exchange_membership()
+        community.network.remove_peer(community.get_peers()[0])
+        # Leaving does not change the schedule, every node keeps drawing from the same members
+        self.assertIn(other.mid, community.leaders)
+
+        height = next(height for height in range(community.leaders.epoch_length)
+                      if community.leaders.leader_for(height, community.chain.hash_at) == other.mid)
+        for _ in range(height):
+            community.chain.add(Block(community.chain.tip_hash, f'{community.chain.height + 1}'))
+        community.sealing.max_latency = 0
+        community.add_to_mempool(make_tx(0))
+        community.block_creation()
+        self.assertEqual(height - 1, community.chain.height)
+
+        community.tip_changed_at -= community.leader_timeout
+        community.block_creation()
+        self.assertEqual(height, community.chain.height)
+
+
+class TestBlockValidation(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.node = MockIPv8('curve25519', MyCommunity, MyCommunitySettings(block_log_dir=None))
+        self.community = self.node.overlay
+        self.keys = [default_eccrypto.generate_key('curve25519') for _ in range(2)]
+
+    async def asyncTearDown(self):
+        await self.node.stop()
+        internet.clear()
+
+    def make_block(self, previous_hash, txs):
+        block = Block(previous_hash)
+        for tx in txs:
+            block.add_transaction(tx)
+        block.update_tree()
+        return block
+
+    def rejected(self, reason):
+        return self.community.metrics.get('voting_blocks_rejected_total', reason=reason).value
+
+    async def test_invalid_blocks_are_rejected(self):
+        finalized = make_tx(0, key=self.keys[0])
+        self.assertTrue(await self.community.accept_block(self.make_block(GENESIS_HASH, [finalized])))
+        tip = self.community.chain.tip_hash
+
+        wrong_root = self.make_block(tip, [make_tx(0, key=self.keys[1])])
+        wrong_root.merkle_hash = self.make_block(tip, [make_tx(1, key=self.keys[1])]).merkle_hash
+        forged = make_tx(0, key=self.keys[1])
+        forged.signature = bytes(len(forged.signature))
+        pending = make_tx(2, key=self.keys[1])
+        self.community.add_to_mempool(pending)
+
+        for block, reason in [(wrong_root, 'merkle_root'),
+                              (self.make_block(tip, [forged]), 'invalid_signature'),
+                              (self.make_block(tip, [make_tx(0, key=self.keys[0], vote='no')]), 'double_vote'),
+                              (self.make_block(tip, [make_tx(1, key=self.keys[1]),
+                                                     make_tx(1, key=self.keys[1], vote='no')]), 'double_vote'),
+                              (self.make_block(tip, [finalized]), 'finalized_tx'),
+                              (self.make_block(tip, [pending, pending]), 'repeated_tx')]:
+            rejected = self.rejected(reason)
+            self.assertFalse(await self.community.accept_block(block), reason)
+            self.assertEqual(rejected + 1, self.rejected(reason), reason)
+        self.assertEqual(0, self.community.chain.height)
+
+    async def test_sealed_block_brings_its_own_txs(self):
+        # Like the block relay benchmark, which fills the open block without going through block_txs
+        self.community.current_block.add_transaction(make_tx(0, key=self.keys[0]))
+        self.community.finalize_and_broadcast_block()
+
+        self.assertEqual(0, self.community.chain.height)
+        self.assertEqual({'yes': 1}, self.community.votes['topic0'])
+
+    async def test_chain_blocks_do_not_keep_merkle_trees(self):
+        self.community.proof_cache_size = 1
+        received = make_tx(0, key=self.keys[0])
+        self.assertTrue(await self.community.accept_block(self.make_block(GENESIS_HASH, [received])))
+        self.community.reopen_block()
+        self.community.current_block.add_transaction(make_tx(0, key=self.keys[1]))
+        self.community.finalize_and_broadcast_block()
+
+        self.assertEqual([None, None], [block.merkle_tree for block in self.community.chain])
+        self.assertEqual(1, len(self.community.merkle_trees))
+        self.assertEqual(0, self.community.get_proof(received.get_tx_hash())['height'])
+
+    async def test_pending_votes_are_reused(self):
+        pending = make_tx(0, key=self.keys[0])
+        self.community.add_to_mempool(pending)
+        self.community.count_vote(pending)
+
+        block = self.make_block(GENESIS_HASH, [pending, make_tx(0, key=self.keys[1])])
+        self.assertTrue(await self.community.accept_block(block))
+        self.assertEqual({'blocks': 1, 'txs': 2, 'mempool_hits': 1, 'verified': 1},
+                         self.community.block_validation_stats)
+        self.assertEqual(0, len(self.community.mempool))
+        self.assertEqual({'yes': 2}, self.community.get_votes('topic0'))
+        self.assertIn('voting_block_transactions_validated_total{source="mempool"} 1', self.community.metrics.render())
+
+    async def test_longer_branch_takes_over_votes(self):
+        shared, only_x = make_tx(0, key=self.keys[0]), make_tx(0, key=self.keys[1])
+        only_y = make_tx(0, key=self.keys[1], vote='no')
+        x = self.make_block(GENESIS_HASH, [shared, only_x])
+        y = self.make_block(GENESIS_HASH, [shared, only_y])
+
+        self.assertTrue(await self.community.accept_block(x))
+        self.assertTrue(await self.community.accept_block(y))
+        self.assertEqual(x.merkle_hash, self.community.chain.tip_hash)
+        self.assertEqual({'yes': 2}, self.community.get_votes('topic0'))
+
+        z = self.make_block(y.merkle_hash, [make_tx(1, key=self.keys[0])])
+        self.assertTrue(await self.community.accept_block(z))
+        self.assertEqual(z.merkle_hash, self.community.chain.tip_hash)
+        self.assertEqual({'yes': 1, 'no': 1}, self.community.get_votes('topic0'))
+        self.assertEqual(y.merkle_hash, self.community.get_proof(shared.get_tx_hash())['block_hash'])
+        self.assertNotIn(only_x.get_tx_hash(), self.community.finalized_txs)
+        self.assertEqual(0, len(self.community.mempool))
+
+    async def test_open_block_follows_tip_and_leadership(self):
+        community = self.community
+        community.add_member(community.my_peer.mid)
+        shared, own = make_tx(0, key=self.keys[0]), make_tx(0, key=self.keys[1])
+        for tx in (shared, own):
+            community.add_to_mempool(tx)
+            community.count_vote(tx)
+        community.block_creation()
+        self.assertEqual(2, len(community.current_block.transactions))
+
+        peer_block = self.make_block(GENESIS_HASH, [shared])
+        self.assertTrue(await community.accept_block(peer_block))
+        community.sealing.max_latency = 0
+        community.block_creation()
+
+        self.assertEqual(1, community.chain.height)
+        self.assertEqual(peer_block.merkle_hash, community.chain.tip.previous_hash)
+        self.assertEqual([own.get_tx_bytes()], community.chain.tip.transactions)
+        self.assertEqual(0, len(community.block_txs))
+
+        late = make_tx(1, key=self.keys[0])
+        community.add_to_mempool(late)
+        community.sealing.max_latency = 60
+        community.block_creation()
+        community.leaders.leader_for = lambda height, hash_at, attempt: b'someone else'
+        community.block_creation()
+        self.assertEqual([late], list(community.mempool))
+        self.assertEqual([], community.current_block.transactions)
+
+    async def test_forged_copy_does_not_hold_up_the_real_tx(self):
+        genuine = make_tx(0, key=self.keys[0])
+        forged = Transaction(genuine.sender, genuine.topic, 'yes', signature=bytes(len(genuine.signature)),
+                             public_key=genuine.public_key)
+        peer = self.community.my_peer
+
+        await asyncio.gather(self.community.process_transactions(peer, [forged]),
+                             self.community.process_transactions(peer, [genuine]))
+        self.assertEqual([genuine.signature], [tx.signature for tx in self.community.mempool])
+        self.assertEqual(set(), self.community.verifying_txs)
+
+
+class TestChainStore(unittest.TestCase):
+
+    def test_append_and_lookup(self):
+        chain = ChainStore()
+        first = Block(GENESIS_HASH, 'a')
+        second = Block('a', 'b')
+
+        self.assertTrue(chain.add(first))
+        self.assertTrue(chain.add(second))
+        self.assertFalse(chain.add(second))
+
+        self.assertEqual(chain.tip_hash, 'b')
+        self.assertEqual(chain.height_of('b'), 1)
+        self.assertIs(chain.get_parent(second), first)
+        self.assertIs(chain.block_at(0), first)
+
+    def test_unknown_parent_is_rejected(self):
+        chain = ChainStore()
+
+        self.assertFalse(chain.add(Block('missing', 'a')))
+        self.assertEqual(len(chain), 0)
+
+    def test_longer_branch_becomes_best_chain(self):
+        chain = ChainStore()
+        for block in [Block(GENESIS_HASH, 'a'), Block('a', 'b'), Block('a', 'c'), Block('c', 'd')]:
+            chain.add(block)
+
+        self.assertEqual([block.merkle_hash for block in chain.blocks], ['a', 'c', 'd'])
+        self.assertEqual(chain.tip_hash, 'd')
+        self.assertEqual(len(chain), 4)
+        self.assertEqual(chain.branch('b'), ['b'])
+        self.assertEqual(chain.branch('d'), [])
+
+    def test_locator_steps_back_to_genesis(self):
+        chain = ChainStore()
+        previous_hash = GENESIS_HASH
+        for i in range(100):
+            chain.add(Block(previous_hash, f'b{i}'))
+            previous_hash = f'b{i}'
+
+        locator = chain.locator()
+        self.assertEqual(locator[:11], [f'b{i}' for i in range(99, 89, -1)] + ['b88'])
+        self.assertEqual(locator[-1], GENESIS_HASH)
+        self.assertLess(len(locator), 20)
+        self.assertTrue(all(chain.is_on_main_chain(block_hash) for block_hash in locator))
+
+
+class TestLeaderSchedule(unittest.TestCase):
+
+    def test_leaders_are_deterministic_and_cached_per_epoch(self):
+        chain = ChainStore()
+        schedules = [LeaderSchedule(epoch_length=10), LeaderSchedule(epoch_length=10)]
+        for member in [b'c', b'a', b'b']:
+            schedules[0].add_member(member)
+        for member in [b'b', b'c', b'a']:
+            schedules[1].add_member(member)
+
+        leaders = [schedules[0].leader_for(height, chain.hash_at) for height in range(10)]
+        self.assertEqual(leaders, [schedules[1].leader_for(height, chain.hash_at) for height in range(10)])
+        self.assertEqual(set(leaders), {b'a', b'b', b'c'})
+        self.assertEqual({schedules[0].leader_for(0, chain.hash_at, attempt) for attempt in range(3)},
+                         {b'a', b'b', b'c'})
+        self.assertEqual(schedules[0].rebuilds, 1)
+
+        schedules[0].add_member(b'a')
+        schedules[0].leader_for(0, chain.hash_at)
+        self.assertEqual(schedules[0].rebuilds, 1)
+        schedules[0].add_member(b'd')
+        schedules[0].leader_for(0, chain.hash_at)
+        self.assertEqual(schedules[0].rebuilds, 2)
+
+    def test_next_epoch_is_seeded_by_the_chain(self):
+        chains = [ChainStore(), ChainStore()]
+        for chain, name in zip(chains, ['x', 'y']):
+            previous_hash = GENESIS_HASH
+            for i in range(10):
+                chain.add(Block(previous_hash, f'{name}{i}'))
+                previous_hash = f'{name}{i}'
+        schedule = LeaderSchedule(epoch_length=10)
+        for member in range(100):
+            schedule.add_member(bytes([member]))
+
+        first = [schedule.leader_for(height, chains[0].hash_at) for height in range(10, 20)]
+        second = [schedule.leader_for(height, chains[1].hash_at) for height in range(10, 20)]
+        self.assertNotEqual(first, second)
+
+
+class TestMembership(unittest.TestCase):
+
+    def test_exchange_transfers_only_the_differences(self):
+        ours, theirs = Membership(buckets=16), Membership(buckets=16)
+        shared = [bytes([i]) * 20 for i in range(50)]
+        for member in shared:
+            ours.add(member)
+            theirs.add(member)
+        self.assertEqual(ours.differing_buckets(theirs.digest()), [])
+
+        ours.add(b'o' * 20)
+        theirs.add(b't' * 20)
+        buckets = theirs.differing_buckets(ours.digest())
+        self.assertEqual(set(buckets), {ours.bucket_of(b'o' * 20), theirs.bucket_of(b't' * 20)})
+
+        sent = [member for bucket in buckets for member in theirs.bucket_members(bucket)]
+        self.assertEqual(ours.missing_from(buckets, sent), [b'o' * 20])
+        for member in sent + [b'o' * 20]:
+            ours.add(member)
+            theirs.add(member)
+        self.assertEqual(ours.digest(), theirs.digest())
+
+    def test_bucket_updates_fit_a_message(self):
+        membership = Membership(buckets=2)
+        for i in range(600):
+            membership.add(i.to_bytes(20, 'big'))
+
+        sent = []
+        for update in membership.bucket_updates([0, 1]):
+            self.assertLessEqual(len(update.members), 255)
+            default_serializer.pack_serializable(update)
+            sent.extend(update.members)
+        self.assertEqual(sorted(sent), sorted(membership))
+        self.assertEqual([bytes([0])], [update.buckets for update in Membership(buckets=2).bucket_updates([0])])
+
+
+class TestMempool(unittest.TestCase):
+
+    def test_indexes_follow_adds_and_removals(self):
+        mempool = Mempool()
+        first, second, third = make_tx(1, sender=b'a'), make_tx(2, sender=b'a'), make_tx(1, sender=b'b')
+        for tx in [first, second, third]:
+            mempool.add(tx)
+
+        self.assertEqual(list(mempool), [first, second, third])
+        self.assertEqual(mempool.vote_of(b'a', 'topic2'), second.get_tx_hash())
+        self.assertEqual(mempool.topic_hashes('topic1'), {first.get_tx_hash(), third.get_tx_hash()})
+
+        self.assertIs(mempool.remove(first.get_tx_hash()), first)
+        self.assertIsNone(mempool.vote_of(b'a', 'topic1'))
+        self.assertEqual(mempool.topic_hashes('topic1'), {third.get_tx_hash()})
+        self.assertEqual(mempool.pop_oldest(), (second.get_tx_hash(), second))
+
+    def test_capacity_and_expiry_drop_the_oldest(self):
+        mempool = Mempool(capacity=2, max_age=10)
+        txs = [make_tx(i, sender=b'a') for i in range(4)]
+        mempool.add(txs[0], now=0)
+        mempool.add(txs[1], now=5)
+
+        self.assertEqual(mempool.add(txs[2], now=6), [txs[0]])
+        self.assertEqual(mempool.expire(now=15.5), [txs[1]])
+        self.assertEqual(list(mempool), [txs[2]])
+        self.assertEqual((mempool.evicted, mempool.expired), (1, 1))
+
+
+class TestSealingPolicy(unittest.TestCase):
+
+    def test_block_is_sealed_by_count_bytes_or_age(self):
+        block = Block(GENESIS_HASH)
+        policy = SealingPolicy(max_txs=3, max_bytes=block.size + 500, max_latency=2)
+        block.add_transaction(make_tx(0))
+        block.add_transaction(make_tx(1))
+
+        self.assertFalse(policy.is_full(block))
+        self.assertFalse(policy.fits(block, make_tx(2)))
+        self.assertFalse(policy.is_due(opened_at=10, now=11))
+        self.assertTrue(policy.is_due(opened_at=10, now=12))
+
+        policy.max_bytes = 10_000
+        block.add_transaction(make_tx(2))
+        self.assertTrue(policy.is_full(block))
+
+    def test_limit_fits_the_block_format(self):
+        block = Block(GENESIS_HASH)
+        policy = SealingPolicy(max_txs=255, max_bytes=10 ** 6)
+        for i in range(255):
+            block.add_transaction(make_tx(i))
+        self.assertTrue(policy.is_full(block))
+        default_serializer.pack_serializable(block)
+
+        with self.assertRaises(ValueError):
+            SealingPolicy(max_txs=256)
+        self.assertEqual([255, 45], [len(group) for group in split_by_size(range(300), [1] * 300)])
+
+    def test_adaptive_limit_follows_mempool_depth(self):
+        policy = SealingPolicy(max_txs=100, adaptive=True, smoothing=0.5)
+        policy.observe(10)
+        self.assertEqual(policy.target_txs, 10)
+        policy.observe(1000)
+        self.assertEqual(policy.target_txs, 100)
+        for _ in range(10):
+            policy.observe(0)
+        self.assertEqual(policy.target_txs, 1)
+
+
+class TestOrphanPool(unittest.TestCase):
+
+    def test_children_are_indexed_by_missing_parent(self):
+        pool = OrphanPool()
+        pool.add(Block('a', 'b'), now=1)
+        pool.add(Block('b', 'c'), now=2)
+        pool.add(Block('a', 'd'), now=3)
+
+        self.assertEqual(pool.root_parent('c'), 'a')
+        self.assertEqual([block.merkle_hash for block in pool.pop_children('a')], ['b', 'd'])
+        self.assertEqual([block.merkle_hash for block in pool.pop_children('b')], ['c'])
+        self.assertEqual(len(pool), 0)
+
+    def test_eviction_by_size_and_age(self):
+        pool = OrphanPool(max_size=2, max_age=10)
+        pool.add(Block('x', 'a'), now=0)
+        pool.add(Block('x', 'b'), now=1)
+        pool.add(Block('x', 'c'), now=2)
+        self.assertNotIn('a', pool)
+
+        pool.add(Block('y', 'd'), now=11.5)
+        self.assertEqual(len(pool), 2)
+        self.assertNotIn('b', pool)
+        self.assertEqual([block.merkle_hash for block in pool.pop_children('x')], ['c'])
+
+
+class TestChainSync(unittest.TestCase):
+
+    def test_downloads_are_spread_over_peers(self):
+        sync = ChainSync(blocks_per_request=2, requests_per_peer=1, request_timeout=5)
+        heights = {GENESIS_HASH: -1}
+        added = sync.add_headers('p1', GENESIS_HASH, ['a', 'b', 'c', 'd', 'e'], 4, heights.get, lambda h: False)
+
+        self.assertEqual(added, 5)
+        self.assertEqual(sync.next_requests(['p1', 'p2'], now=0), [('p1', ['a', 'b']), ('p2', ['c', 'd'])])
+        self.assertEqual(sync.next_requests(['p1', 'p2'], now=0), [])
+
+        sync.block_received('a')
+        self.assertEqual(sync.next_requests(['p1', 'p2'], now=1), [('p1', ['e'])])
+
+        sync.expire(now=10)
+        self.assertEqual(sync.next_requests(['p1', 'p2'], now=10), [('p1', ['b', 'c']), ('p2', ['d', 'e'])])
+
+    def test_requests_of_a_removed_peer_are_queued_again(self):
+        sync = ChainSync(blocks_per_request=2, requests_per_peer=1)
+        sync.add_headers('p1', GENESIS_HASH, ['a', 'b', 'c'], 2, {GENESIS_HASH: -1}.get, lambda h: False)
+        sync.next_requests(['p1', 'p2'], now=0)
+
+        sync.remove_peer('p1')
+        self.assertNotIn('p1', sync.headers)
+        self.assertEqual(list(sync.in_flight), ['c'])
+        self.assertEqual(list(sync.queue), ['a', 'b'])
+        sync.block_received('c')
+        self.assertEqual(sync.next_requests(['p2'], now=1), [('p2', ['a', 'b'])])
+
+    def test_chunks_are_stashed_until_they_connect(self):
+        sync = ChainSync()
+        heights = {GENESIS_HASH: -1}
+
+        self.assertEqual(sync.add_headers('p1', 'b', ['c', 'd'], 3, heights.get, lambda h: False), 0)
+        self.assertEqual(sync.add_headers('p1', GENESIS_HASH, ['a', 'b'], 3, heights.get, lambda h: False), 4)
+        self.assertEqual(list(sync.queue), ['a', 'b', 'c', 'd'])
+        self.assertEqual(sync.header_height, 3)
+
+
+class TestCompactBlock(unittest.TestCase):
+
+    def test_block_is_rebuilt_from_mempool_and_missing_txs(self):
+        txs = [make_tx(i, signature=bytes([i]) * 64) for i in range(4)]
+        block = Block(GENESIS_HASH)
+        for tx in txs:
+            block.add_transaction(tx)
+        block.update_tree()
+
+        compact = CompactBlock(block.previous_hash, block.merkle_hash, compact_ids(block))
+        partial = PartialBlock(compact, mempool_index((tx.get_tx_hash(), tx) for tx in txs[1:3]))
+        self.assertEqual(partial.missing, [0, 3])
+
+        partial.fill([txs[3], txs[0]])
+        self.assertEqual(partial.missing, [])
+        rebuilt = partial.to_block()
+        self.assertEqual(default_serializer.pack_serializable(rebuilt), default_serializer.pack_serializable(block))
+
+
+class TestBlockLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'node.blocks')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_blocks_survive_reopen(self):
+        log = BlockLog(self.path)
+        log.append(Block('0', 'a', [b'tx1']))
+        log.append(Block('a', 'b', [b'tx2', b'tx3']))
+        log.close()
+
+        log = BlockLog(self.path)
+        self.assertEqual(len(log), 2)
+        self.assertEqual(log.read(1).transactions, [b'tx2', b'tx3'])
+        self.assertEqual([block.merkle_hash for block in log], ['a', 'b'])
+        log.close()
+
+    def test_torn_tail_is_truncated(self):
+        log = BlockLog(self.path)
+        log.append(Block('0', 'a'))
+        log.append(Block('a', 'b'))
+        log.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+
+        log = BlockLog(self.path)
+        self.assertEqual(len(log), 1)
+        log.append(Block('a', 'c'))
+        log.close()
+
+        log = BlockLog(self.path)
+        self.assertEqual([block.merkle_hash for block in log], ['a', 'c'])
+        log.close()
+
+
+class TestChainReload(unittest.IsolatedAsyncioTestCase):
+
+    async def test_proofs_survive_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings = MyCommunitySettings(block_log_dir=directory, block_max_txs=1)
+            node = MockIPv8('curve25519', MyCommunity, settings)
+            community = node.overlay
+            community.add_member(community.my_peer.mid)
+            community.cast_vote('topic', 'yes', community.my_peer)
+            tx_hash = community.mempool.peek_oldest()[0]
+            community.block_creation()
+            proof = community.get_proof(tx_hash)
+            self.assertNotIn('error', proof)
+            await node.stop()
+
+            node = MockIPv8(community.my_peer, MyCommunity, settings)
+            self.assertEqual(proof, node.overlay.get_proof(tx_hash))
+            self.assertEqual({'yes': 1}, node.overlay.get_votes('topic'))
+            await node.stop()
+            internet.clear()
+
+    async def test_old_block_log_does_not_stop_the_node(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings = MyCommunitySettings(block_log_dir=directory)
+            node = MockIPv8('curve25519', MyCommunity, settings)
+            path = node.overlay.block_log.path
+            await node.stop()
+            with open(path, 'wb') as f:
+                f.write(b'VBLK\x01')
+
+            with self.assertLogs('voting.block', logging.ERROR) as logs:
+                node = MockIPv8(node.overlay.my_peer, MyCommunity, settings)
+            self.assertIn('version 1 block log', logs.output[0])
+            self.assertIsNone(node.overlay.block_log)
+            self.assertTrue(node.overlay.store_block(Block(GENESIS_HASH, 'a')))
+            await node.stop()
+            with open(path, 'rb') as f:
+                self.assertEqual(b'VBLK\x01', f.read())
+            internet.clear()
+
+
+class TestIncrementalMerkleTree(unittest.TestCase):
+
+    def test_root_matches_merkle_tree(self):
+        for size in range(1, 40):
+            leaves = [Transaction(b'sender', f'topic{i}', 'yes').get_tx_hash() for i in range(size)]
+            old, new = MerkleTree(), IncrementalMerkleTree()
+            for leaf in leaves:
+                old.add_leaf(leaf)
+                new.add_leaf(leaf)
+            old.recalculate_tree()
+
+            self.assertEqual(old.get_root_hash(), new.get_root_hash())
+
+    def test_binary_mode_hashes_digests(self):
+        tree = IncrementalMerkleTree(hex_compat=False)
+        tree.add_leaf('00' * 32)
+        tree.add_leaf('11' * 32)
+
+        self.assertEqual(tree.get_root_hash(), sha256(bytes(32) + b'\x11' * 32).hexdigest())
+
+    def test_proofs_verify_against_root(self):
+        leaves = [Transaction(b'sender', f'topic{i}', 'yes').get_tx_hash() for i in range(11)]
+        tree = IncrementalMerkleTree()
+        for leaf in leaves:
+            tree.add_leaf(leaf)
+
+        for i, leaf in enumerate(leaves):
+            self.assertTrue(verify_proof(leaf, tree.get_proof(i), tree.get_root_hash()))
+        self.assertFalse(verify_proof(leaves[0], tree.get_proof(1), tree.get_root_hash()))
+
+
+class TestSeenFilter(unittest.TestCase):
+
+    def test_duplicates_are_reported(self):
+        seen = SeenFilter(capacity=100, window=10)
+
+        self.assertFalse(seen.check_and_add(b'a', now=0))
+        self.assertFalse(seen.check_and_add(b'b', now=0))
+        self.assertTrue(seen.check_and_add(b'a', now=1))
+        self.assertEqual((seen.checked, seen.duplicates), (3, 1))
+
+    def test_keys_are_forgotten_after_two_windows(self):
+        seen = SeenFilter(capacity=100, window=10)
+        seen.check_and_add(b'a', now=0)
+
+        seen.check_and_add(b'b', now=10)
+        self.assertIn(b'a', seen)
+        seen.check_and_add(b'c', now=20)
+        self.assertNotIn(b'a', seen)
+        self.assertIn(b'b', seen)
+
+    def test_memory_is_bounded_by_capacity(self):
+        seen = SeenFilter(capacity=1000, window=60)
+        memory = seen.memory
+        for i in range(10_000):
+            seen.check_and_add(i.to_bytes(4, 'big'), now=0)
+
+        self.assertEqual(seen.memory, memory)
+        self.assertLess(seen.duplicates, 50)
+
+
+class TestTransactionOutbox(unittest.IsolatedAsyncioTestCase):
+
+    async def test_transactions_are_sent_per_peer_after_the_window(self):
+        sent = []
+        outbox = TransactionOutbox(lambda peer, txs: sent.append((peer, len(txs))), window=0.01)
+        for i in range(3):
+            outbox.add('p1', make_tx(i))
+        outbox.add('p2', make_tx(3))
+
+        self.assertEqual(sent, [])
+        await asyncio.sleep(0.05)
+        self.assertEqual(sent, [('p1', 3), ('p2', 1)])
+
+    async def test_full_batches_are_sent_right_away_and_fit_the_size_cap(self):
+        sent = []
+        outbox = TransactionOutbox(lambda peer, txs: sent.append(txs), window=10, max_size=1200)
+        for i in range(20):
+            outbox.add('p1', make_tx(i))
+        outbox.flush()
+
+        self.assertEqual(sum(len(txs) for txs in sent), 20)
+        for txs in sent:
+            self.assertLessEqual(len(default_serializer.pack_serializable(TransactionBatch(txs))), 1200)
+        self.assertEqual(len(sent), 4)
+
+
+class TestTallyFeed(unittest.IsolatedAsyncioTestCase):
+
+    async def test_changes_within_the_window_are_pushed_once(self):
+        votes = {'a': {'yes': 0}, 'b': {'no': 0}}
+        feed = TallyFeed(lambda topics: {topic: votes[topic] for topic in topics}, window=0.01)
+        everything, only_b = feed.subscribe(), feed.subscribe(['b'])
+        for _ in range(3):
+            votes['a']['yes'] += 1
+            feed.changed('a')
+        votes['b']['no'] += 1
+        feed.changed('b')
+
+        self.assertEqual({'a': {'yes': 3}, 'b': {'no': 1}}, await everything.get())
+        self.assertEqual({'b': {'no': 1}}, await only_b.get())
+        self.assertEqual(1, feed.published)
+
+    async def test_slow_subscribers_get_the_latest_counts(self):
+        votes = {'a': {'yes': 0}}
+        feed = TallyFeed(lambda topics: {topic: votes[topic] for topic in topics}, window=0)
+        subscription = feed.subscribe()
+        for _ in range(5):
+            votes['a']['yes'] += 1
+            feed.changed('a')
+
+        self.assertEqual({'a': {'yes': 5}}, await subscription.get())
+        feed.unsubscribe(subscription)
+        feed.changed('a')
+        self.assertEqual(5, feed.published)
+
+
+class TestNodeClient(unittest.TestCase):
+
+    class Session:
+        def __init__(self, down):
+            self.down = down
+            self.requests = []
+
+        def request(self, method, url, **kwargs):
+            self.requests.append(url)
+            if url.startswith(self.down):
+                raise requests.ConnectionError(url)
+            response = requests.Response()
+            response._content = json.dumps({"status_code": 200, "status": "OK",
+                                            "response": {"a": {"yes": 1}, "b": {}}}).encode()
+            return response
+
+    def test_unreachable_nodes_are_skipped(self):
+        session = self.Session(down='http://one')
+        client = NodeClient(['http://one', 'http://two'], session=session)
+
+        client.get('/sync')
+        client.get('/sync')
+        self.assertEqual(['http://one/sync', 'http://two/sync', 'http://two/sync'], session.requests)
+
+        session.down = 'http://'
+        with self.assertRaises(NodeUnavailable):
+            client.get('/sync')
+
+    def test_answers_are_checked_with_the_other_nodes(self):
+        session = self.Session(down='http://three')
+        client = NodeClient(['http://one', 'http://two', 'http://three'], session=session)
+
+        client.get('/proof/ab')
+        self.assertEqual(1, len(list(client.get_from_others('/proof/ab'))))
+        self.assertEqual(['http://one/proof/ab', 'http://two/proof/ab', 'http://three/proof/ab'], session.requests)
+
+    def test_tallies_are_cached_per_topic(self):
+        session = self.Session(down='http://none')
+        client = NodeClient(['http://one'], cache_ttl=60, session=session)
+
+        self.assertEqual({'a': {'yes': 1}, 'b': {}}, client.tallies(['a', 'b']))
+        self.assertEqual({'yes': 1}, client.votes('a'))
+        self.assertEqual(1, len(session.requests))
+
+    def test_stream_yields_on_keepalives(self):
+        session = self.Session(down='http://none')
+        events = b'data: {"a": {"yes": 1}}\n\n: keepalive\n\ndata: {"a": {"yes": 2}}\n\n'
+
+        def request(method, url, **kwargs):
+            response = requests.Response()
+            response._content, response._content_consumed, response.encoding = events, True, 'utf-8'
+            return response
+
+        session.request = request
+        client = NodeClient(['http://one'], cache_ttl=60, session=session)
+
+        self.assertEqual([{'yes': 1}, {'yes': 1}, {'yes': 2}], list(client.stream_tallies('a')))
+        self.assertEqual({'yes': 2}, client.votes('a'))
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_prometheus_text_format(self):
+        registry = MetricsRegistry()
+        received = registry.counter('txs_total', 'Transactions.', {'reason': 'ok'})
+        registry.counter('txs_total', 'Transactions.', {'reason': 'late'}, fn=lambda: 7)
+        registry.gauge('depth', 'Mempool depth.', fn=lambda: 3)
+        latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1.0))
+        received.inc(2)
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+
+        self.assertEqual(['# HELP txs_total Transactions.',
+                          '# TYPE txs_total counter',
+                          'txs_total{reason="ok"} 2',
+                          'txs_total{reason="late"} 7',
+                          '# HELP depth Mempool depth.',
+                          '# TYPE depth gauge',
+                          'depth 3',
+                          '# HELP latency_seconds Latency.',
+                          '# TYPE latency_seconds histogram',
+                          'latency_seconds_bucket{le="0.1"} 1',
+                          'latency_seconds_bucket{le="1.0"} 2',
+                          'latency_seconds_bucket{le="+Inf"} 3',
+                          'latency_seconds_sum 5.55',
+                          'latency_seconds_count 3'], registry.render().splitlines())
+        with self.assertRaises(ValueError):
+            registry.counter('txs_total', 'Transactions.', {'reason': 'ok'})
+
+
+class FakeKeyCache:
+    """
+    Signature checks that pass for the signature b'ok', and are slow or fail for some messages.
+    """
+
+    def is_valid_signature(self, public_key, message, signature):
+        if message == b'boom':
+            raise ValueError('boom')
+        if message == b'slow':
+            time.sleep(0.2)
+        return signature == b'ok'
+
+
+class TestSignatureVerifier(unittest.IsolatedAsyncioTestCase):
+
+    def make_verifier(self, workers=1, batch_size=32, batch_delay=0.002):
+        verifier = SignatureVerifier(workers, 'thread', batch_size, batch_delay, FakeKeyCache())
+        self.addCleanup(verifier.shutdown)
+        return verifier
+
+    async def test_results_are_delivered_in_order_across_batches(self):
+        verifier = self.make_verifier(workers=2, batch_size=2)
+        done = []
+
+        async def verify(i, message, signature):
+            valid = await verifier.verify(b'key', message, signature)
+            done.append(i)
+            return valid
+
+        # The first batch is slow, the second one finishes first but has to wait for it
+        results = await asyncio.gather(verify(0, b'slow', b'ok'), verify(1, b'slow', b'bad'),
+                                       verify(2, b'fast', b'ok'), verify(3, b'fast', b'bad'),
+                                       verify(4, b'fast', b'ok'))
+        self.assertEqual([True, False, True, False, True], results)
+        self.assertEqual([0, 1, 2, 3, 4], done)
+
+    async def test_batches_flush_on_size_and_delay(self):
+        verifier = self.make_verifier(workers=1, batch_size=3, batch_delay=0.05)
+        slow = asyncio.ensure_future(verifier.verify(b'key', b'slow', b'ok'))
+        await asyncio.sleep(0.01)
+        self.assertEqual(1, verifier._busy)
+
+        # The worker is busy, a full batch is handed to the pool right away anyway
+        full = [asyncio.ensure_future(verifier.verify(b'key', b'fast', b'ok')) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.assertEqual((2, []), (verifier._busy, verifier._batch))
+
+        # A batch that does not fill up waits for batch_delay
+        waiting = asyncio.ensure_future(verifier.verify(b'key', b'fast', b'ok'))
+        await asyncio.sleep(0.01)
+        self.assertEqual(1, len(verifier._batch))
+        await asyncio.sleep(0.06)
+        self.assertEqual([], verifier._batch)
+        self.assertTrue(all(await asyncio.gather(slow, waiting, *full)))
+
+    async def test_exceptions_reach_the_callers_of_their_batch(self):
+        verifier = self.make_verifier(workers=1, batch_size=2)
+        first = asyncio.ensure_future(verifier.verify(b'key', b'boom', b'ok'))
+        second = asyncio.ensure_future(verifier.verify(b'key', b'fast', b'ok'))
+        await asyncio.sleep(0.1)
+        third = verifier.verify(b'key', b'fast', b'ok')
+
+        with self.assertRaises(ValueError):
+            await first
+        with self.assertRaises(ValueError):
+            await second
+        self.assertTrue(await third)
+
+
+class TestKeyCache(unittest.TestCase):
+
+    def test_hits_misses_and_eviction(self):
+        cache = KeyCache(maxsize=2)
+        keys = [default_eccrypto.key_to_bin(default_eccrypto.generate_key('curve25519').pub()) for _ in range(3)]
+
+        cache.get(keys[0])
+        cache.get(keys[0])
+        cache.get(keys[1])
+        cache.get(keys[2])
+
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(len(cache), 2)
+        self.assertFalse(cache.is_valid_signature(b'not a key', b'message', b'signature'))
+
+
+class TestLogSetup(unittest.TestCase):
+
+    def test_json_lines_with_extra_fields(self):
+        record = logging.makeLogRecord({'name': 'voting.trace', 'levelname': 'INFO', 'created': 12.5,
+                                        'msg': 'received transaction from %s', 'args': ('ab',),
+                                        'event': 'tx_received', 'node': 'cd', 'tx': 'ef'})
+
+        self.assertEqual({'time': 12.5, 'level': 'INFO', 'logger': 'voting.trace',
+                          'message': 'received transaction from ab', 'event': 'tx_received',
+                          'node': 'cd', 'tx': 'ef'}, json.loads(JsonFormatter().format(record)))
+
+    def test_parse_levels(self):
+        self.assertEqual({'voting': 'WARNING', 'voting.trace': 'INFO'},
+                         parse_levels('voting=warning, voting.trace=INFO,,broken'))
+
+    def test_records_are_queued_as_they_are(self):
+        records = queue.SimpleQueue()
+        handler = LazyQueueHandler(records)
+        handler.addFilter(lambda record: record.name != 'voting.sync')
+        record = logging.makeLogRecord({'name': 'voting.tx', 'msg': 'received from %s', 'args': ('ab',)})
+
+        self.assertTrue(handler.handle(record))
+        self.assertFalse(handler.handle(logging.makeLogRecord({'name': 'voting.sync'})))
+        self.assertIs(record, records.get_nowait())
+        self.assertEqual(('ab',), record.args)
+        self.assertTrue(records.empty())
+
+
+class TestLogAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        events = {'a': [{'time': 10.0, 'event': 'tx_created', 'node': 'a', 'tx': 't1'},
+                        {'time': 10.5, 'event': 'block_sealed', 'node': 'a', 'block': 'b1', 'height': 1, 'txs': 2},
+                        {'time': 11.2, 'event': 'tx_received', 'node': 'a', 'peer': 'b', 'tx': 't2'}],
+                  'b': [{'time': 10.1, 'event': 'tx_received', 'node': 'b', 'peer': 'a', 'tx': 't1'},
+                        {'time': 10.7, 'event': 'block_accepted', 'node': 'b', 'block': 'b1', 'height': 1, 'txs': 2},
+                        {'time': 11.0, 'event': 'tx_created', 'node': 'b', 'tx': 't2'}],
+                  'c': [{'time': 10.4, 'event': 'tx_received', 'node': 'c', 'peer': 'a', 'tx': 't1'},
+                        {'time': 10.9, 'event': 'block_accepted', 'node': 'c', 'block': 'b1', 'height': 1, 'txs': 2}]}
+        self.paths = []
+        for node, node_events in events.items():
+            path = os.path.join(self.directory.name, f'{node}.log')
+            with open(path, 'w') as f:
+                for event in node_events:
+                    f.write(json.dumps({'level': 'INFO', 'message': 'other line', 'time': event['time']}) + '\n')
+                    f.write(json.dumps({'level': 'INFO', 'logger': 'voting.trace', **event}) + '\n')
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parsers_agree(self):
+        with_arrow = pd.concat(read_events(self.paths[0], chunk_bytes=100))
+        without_arrow = pd.concat(read_events(self.paths[0], chunk_bytes=100, use_arrow=False))
+
+        self.assertEqual(['tx_created', 'block_sealed', 'tx_received'], list(with_arrow['event']))
+        self.assertEqual(list(with_arrow['time']), list(without_arrow['time']))
+
+    def test_latency_throughput_and_nodes(self):
+        stats = analyze(self.paths, window=0.5, workers=1, chunk_bytes=150, part_bytes=200)
+        latencies = stats.latencies()
+
+        self.assertEqual([0.1, 0.2], sorted(round(latency, 6) for latency in latencies['first']))
+        self.assertEqual([0.2, 0.4], sorted(round(latency, 6) for latency in latencies['all']))
+        self.assertEqual([0.4], [round(latency, 6) for latency in latencies['block']])
+        throughput = stats.throughput()
+        self.assertEqual([0.0, 0.5, 1.0], list(throughput.index))
+        self.assertEqual([2, 0, 2], list(throughput['created']))
+        self.assertEqual([0, 4, 0], list(throughput['committed']))
+        self.assertEqual({'a': 1, 'b': 1, 'c': 1}, stats.nodes()['tx_received'].to_dict())
+        self.assertEqual({'a': 1, 'b': 0, 'c': 0}, stats.nodes()['block_sealed'].to_dict())
+
+    def test_merging_parts_compacts_a_bounded_number_of_times(self):
+        compactions = []
+
+        class CountingStats(LogStats):
+            def compact(self):
+                compactions.append(self._rows)
+                super().compact()
+
+        stats = CountingStats(compact_rows=10)
+        for part in range(64):
+            events = pd.DataFrame({'time': [float(part)] * 4, 'event': ['tx_created'] * 4, 'node': ['a'] * 4,
+                                   'tx': [f'{part}-{tx}' for tx in range(4)]}, columns=EVENT_COLUMNS)
+            other = LogStats()
+            other.add(events)
+            stats.merge(other)
+
+        self.assertEqual(256, len(stats.txs))
+        # The trigger doubles with the aggregates, so the number of compactions grows with log(rows)
+        self.assertLessEqual(len(compactions), 12)
+
+
+class TestTransaction(unittest.TestCase):
+
+    def test_signed_fields_invalidate_the_cached_bytes_and_hash(self):
+        tx = Transaction(bytes(20), 'topic', 'yes')
+        for name, value in [('sender', bytes([1]) * 20), ('topic', 'other'), ('vote', 'no')]:
+            tx_bytes, tx_hash = tx.get_tx_bytes(), tx.get_tx_hash()
+            setattr(tx, name, value)
+            self.assertNotEqual(tx_bytes, tx.get_tx_bytes(), name)
+            self.assertNotEqual(tx_hash, tx.get_tx_hash(), name)
+            self.assertEqual(Transaction(tx.sender, tx.topic, tx.vote).get_tx_hash(), tx.get_tx_hash(), name)
+
+    def test_other_fields_keep_the_cached_bytes_and_hash(self):
+        tx = Transaction(bytes(20), 'topic', 'yes')
+        tx_bytes, tx_hash = tx.get_tx_bytes(), tx.get_tx_hash()
+        tx.ttl -= 1
+        tx.signature = bytes(64)
+        tx.public_key = bytes(74)
+
+        self.assertIs(tx_bytes, tx.get_tx_bytes())
+        self.assertEqual(tx_hash, tx.get_tx_hash())
+
+
 if __name__ == '__main__':
     unittest.main()
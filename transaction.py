@@ -1,8 +1,18 @@
 from hashlib import sha256
+from typing import List
 
 from ipv8.messaging.payload_dataclass import dataclass
 from ipv8.messaging.serialization import default_serializer
 
+# Fields covered by the signature and the hash, ttl and the signature itself are not
+SIGNED_FIELDS = ('sender', 'topic', 'vote')
+
+# Serialized size of a transaction besides its variable length fields: five 2 byte length prefixes and the ttl
+TX_FIXED_SIZE = 5 * 2 + 8
+# A TransactionBatch starts with a 1 byte count and every transaction in it gets a 2 byte length prefix
+BATCH_OVERHEAD = 1
+BATCH_ITEM_OVERHEAD = 2
+
 
 @dataclass(msg_id=1)  # The value 1 identifies this message and must be unique per community
 class Transaction:
@@ -13,9 +23,34 @@ class Transaction:
     signature: bytes = b''
     public_key: bytes = b''
 
+    def __setattr__(self, name, value):
+        # The canonical bytes and hash are cached, so forget them when a signed field changes
+        if name in SIGNED_FIELDS:
+            self.__dict__.pop('_tx_bytes', None)
+            self.__dict__.pop('_tx_hash', None)
+        super().__setattr__(name, value)
+
     def get_tx_bytes(self) -> bytes:
-        tx_copy = Transaction(self.sender, self.topic, self.vote)
-        return default_serializer.pack_serializable(tx_copy)
+        tx_bytes = self.__dict__.get('_tx_bytes')
+        if tx_bytes is None:
+            tx_copy = Transaction(self.sender, self.topic, self.vote)
+            tx_bytes = self._tx_bytes = default_serializer.pack_serializable(tx_copy)
+        return tx_bytes
 
     def get_tx_hash(self) -> str:
-        return sha256(self.get_tx_bytes()).hexdigest()
+        tx_hash = self.__dict__.get('_tx_hash')
+        if tx_hash is None:
+            tx_hash = self._tx_hash = sha256(self.get_tx_bytes()).hexdigest()
+        return tx_hash
+
+    def get_size(self) -> int:
+        """
+        Size of the serialized transaction, without serializing it.
+        """
+        return (TX_FIXED_SIZE + len(self.sender) + len(self.topic.encode()) + len(self.vote.encode())
+                + len(self.signature) + len(self.public_key))
+
+
+@dataclass(msg_id=10)
+class TransactionBatch:
+    transactions: List[Transaction]  # at most 255
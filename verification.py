@@ -0,0 +1,118 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from key_cache import KeyCache
+
+# (public key, signed message, signature)
+SignatureCheck = Tuple[bytes, bytes, bytes]
+
+# Used when no cache is passed in, which includes every process pool worker
+default_key_cache = KeyCache()
+
+
+def verify_signature(public_key: bytes, message: bytes, signature: bytes, key_cache: KeyCache = None) -> bool:
+    if key_cache is None:
+        key_cache = default_key_cache
+    return key_cache.is_valid_signature(public_key, message, signature)
+
+
+def verify_batch(checks: List[SignatureCheck], key_cache: KeyCache = None) -> List[bool]:
+    # Module level so it can be shipped to a process pool
+    return [verify_signature(*check, key_cache) for check in checks]
+
+
+class SignatureVerifier:
+    """
+    Verify signatures in micro-batches on a thread or process pool.
+
+    While a worker is idle, the checks submitted in one event loop iteration are verified together right away.
+    Once all workers are busy, checks are collected until ``batch_size`` of them are waiting, a worker frees up
+    or ``batch_delay`` seconds have passed, and every batch is verified in one pool call. Batches may finish in
+    any order, but the results are handed back in submission order, so callers awaiting ``verify`` resume in the
+    order they called it.
+    With zero workers every check runs inline on the event loop. Inline and thread checks share ``key_cache``,
+    process workers each keep their own.
+    """
+
+    def __init__(self, workers: int = 0, executor: str = 'thread', batch_size: int = 32,
+                 batch_delay: float = 0.002, key_cache: KeyCache = None):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.key_cache = default_key_cache if key_cache is None else key_cache
+
+        self.executor: Optional[Executor] = None
+        self.uses_processes = executor == 'process'
+        if workers > 0:
+            pool_class = ProcessPoolExecutor if self.uses_processes else ThreadPoolExecutor
+            self.executor = pool_class(max_workers=workers)
+
+        self._batch: List[Tuple[SignatureCheck, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._delivery: Optional[asyncio.Future] = None
+        self._busy = 0  # batches handed to the pool that did not finish yet
+
+    async def verify(self, public_key: bytes, message: bytes, signature: bytes) -> bool:
+        if self.executor is None:
+            return verify_signature(public_key, message, signature, self.key_cache)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append(((public_key, message, signature), future))
+
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            if self._busy < self.workers:
+                self._flush_handle = loop.call_soon(self._flush)
+            else:
+                self._flush_handle = loop.call_later(self.batch_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._batch:
+            return
+
+        batch, self._batch = self._batch, []
+        self._busy += 1
+        loop = asyncio.get_running_loop()
+        checks = [check for check, _ in batch]
+        if self.uses_processes:
+            work = loop.run_in_executor(self.executor, verify_batch, checks)
+        else:
+            work = loop.run_in_executor(self.executor, verify_batch, checks, self.key_cache)
+        self._delivery = asyncio.ensure_future(self._deliver(self._delivery, work, [f for _, f in batch]))
+
+    async def _deliver(self, previous: Optional[asyncio.Future], work: asyncio.Future,
+                       futures: List[asyncio.Future]) -> None:
+        try:
+            results = await work
+        except Exception as e:
+            results = e
+        self._busy -= 1
+        if self._batch:
+            self._flush()
+        if previous is not None:
+            await previous
+
+        for i, future in enumerate(futures):
+            if future.done():
+                continue
+            if isinstance(results, Exception):
+                future.set_exception(results)
+            else:
+                future.set_result(results[i])
+
+    def shutdown(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for _, future in self._batch:
+            future.cancel()
+        self._batch = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)